@@ -0,0 +1,268 @@
+import argparse
+import errno
+import fcntl
+import hashlib
+import mmap
+import os
+import stat
+import struct
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Iterator, Optional
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 8 * 1024 * 1024  # Bytes read, checked, hashed and copied at a time
+PROGRESS_INTERVAL = 2.0  # Seconds between progress reports
+
+BLKGETSIZE64 = 0x80081272  # ioctl: size of a block device in bytes
+BLKZEROOUT = 0x127F  # ioctl: zero a byte range of a block device, offloaded where supported
+
+_ZEROS = bytes(CHUNK_SIZE)
+
+
+class ImagingError(Exception):
+    """Raised when an image cannot be written, or does not verify."""
+
+
+@dataclass
+class Progress:
+    done: int  # Bytes of the source handled so far, copied or skipped
+    total: int
+    copied: int
+    elapsed: float  # Seconds
+
+    @property
+    def throughput(self) -> float:
+        """Bytes per second."""
+        return self.done / self.elapsed if self.elapsed else 0.0
+
+    @property
+    def eta(self) -> Optional[float]:
+        """Seconds left at the current throughput."""
+        return (self.total - self.done) / self.throughput if self.throughput else None
+
+    def __str__(self) -> str:
+        eta = f"{self.eta:.0f}s" if self.eta is not None else '?'
+        return (f"{self.done / self.total * 100 if self.total else 100:5.1f}% "
+                f"{self.done / 1024 ** 2:.0f}/{self.total / 1024 ** 2:.0f} MiB, "
+                f"{self.throughput / 1024 ** 2:.0f} MiB/s, ETA {eta}")
+
+
+@dataclass
+class ImageResult:
+    size: int
+    copied: int  # Bytes actually written, the rest were holes or zeros
+    seconds: float
+    digest: str  # Over the copied chunks and their offsets
+    verified: bool = False
+    chunks: dict[int, tuple[int, bytes]] = field(default_factory=dict, repr=False)  # Offset -> (length, digest)
+
+
+def _size(fd: int) -> int:
+    mode = os.fstat(fd).st_mode
+    if stat.S_ISBLK(mode):
+        return struct.unpack('Q', fcntl.ioctl(fd, BLKGETSIZE64, b'\0' * 8))[0]
+    return os.fstat(fd).st_size
+
+
+def data_extents(fd: int, size: int) -> Iterator[tuple[int, int]]:
+    """
+    The (start, end) byte ranges of `fd` that hold data, found with
+    SEEK_DATA/SEEK_HOLE. Without support for them the whole file is data.
+    """
+    offset = 0
+    while offset < size:
+        try:
+            start = os.lseek(fd, offset, os.SEEK_DATA)
+            end = min(os.lseek(fd, start, os.SEEK_HOLE), size)
+        except OSError as e:
+            if e.errno == errno.ENXIO:  # No data after `offset`
+                return
+            if e.errno in (errno.EINVAL, errno.EOPNOTSUPP):
+                yield offset, size
+                return
+            raise
+        yield start, end
+        offset = end
+
+
+def _copy_range(source: int, target: int, offset: int, length: int, data: bytes) -> None:
+    """
+    Copy a range in the kernel with copy_file_range, or sendfile where that
+    is not possible (e.g. across filesystems on older kernels), or write the
+    chunk that was already read as the last resort.
+    """
+    done = 0
+    try:
+        while done < length:
+            copied = os.copy_file_range(source, target, length - done, offset + done, offset + done)
+            if copied == 0:
+                raise ImagingError(f"Unexpected end of the source at byte {offset + done}")
+            done += copied
+        return
+    except OSError as e:
+        if e.errno not in (errno.EXDEV, errno.EINVAL, errno.ENOSYS, errno.EOPNOTSUPP):
+            raise
+
+    try:
+        os.lseek(target, offset + done, os.SEEK_SET)
+        while done < length:
+            sent = os.sendfile(target, source, offset + done, length - done)
+            if sent == 0:
+                raise ImagingError(f"Unexpected end of the source at byte {offset + done}")
+            done += sent
+        return
+    except OSError as e:
+        if e.errno not in (errno.EINVAL, errno.ENOSYS):
+            raise
+
+    view = memoryview(data)
+    while done < length:
+        done += os.pwrite(target, view[done:], offset + done)
+
+
+class BlockImager:
+    """
+    Writes a disk or partition image (or a device) onto a target device or file.
+
+    Holes in the source are found with SEEK_DATA/SEEK_HOLE and never read.
+    Data ranges are mapped with mmap and copied chunk by chunk in the kernel,
+    skipping chunks that are all zeros. On a block device target, skipped
+    ranges are zeroed with BLKZEROOUT unless the target is known to be zeroed
+    already (e.g. right after blkdiscard); a regular file target keeps them
+    as holes. Each copied chunk is hashed on the way, and verification reads
+    the written chunks back from the target, bypassing the page cache, and
+    compares their hashes.
+
+    Progress, throughput and an ETA are logged every PROGRESS_INTERVAL
+    seconds, and passed to `on_progress` when given.
+
+    This is a standalone tool for cloning whole disks, see main(). Golden
+    images (GoldenImage.py) are file-level archives instead, as they are
+    restored onto targets of different sizes and partition layouts.
+    """
+
+    def __init__(self, source: Path, target: Path, verify: bool = True, skip_zeros: bool = True,
+                 assume_zeroed: bool = False, on_progress: Optional[Callable[[Progress], None]] = None):
+        self.source = source
+        self.target = target
+        self.verify = verify
+        self.skip_zeros = skip_zeros
+        self.assume_zeroed = assume_zeroed
+        self.on_progress = on_progress
+
+    def _report(self, progress: Progress) -> None:
+        logger.info(f"Imaging {self.source} to {self.target}: {progress}")
+        if self.on_progress is not None:
+            self.on_progress(progress)
+
+    def _zero(self, target: int, target_is_block: bool, offset: int, length: int) -> None:
+        if target_is_block and not self.assume_zeroed:
+            fcntl.ioctl(target, BLKZEROOUT, struct.pack('QQ', offset, length))
+
+    def run(self) -> ImageResult:
+        source = os.open(self.source, os.O_RDONLY)
+        try:
+            size = _size(source)
+            target_is_block = self.target.exists() and stat.S_ISBLK(self.target.stat().st_mode)
+            if target_is_block:
+                target = os.open(self.target, os.O_WRONLY | os.O_EXCL)  # O_EXCL: fail if it is mounted
+            else:
+                target = os.open(self.target, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+            try:
+                result = self._copy(source, target, size, target_is_block)
+            finally:
+                os.close(target)
+
+            if self.verify:
+                self._verify(result)
+            return result
+        finally:
+            os.close(source)
+
+    def _copy(self, source: int, target: int, size: int, target_is_block: bool) -> ImageResult:
+        if target_is_block:
+            if _size(target) < size:
+                raise ImagingError(f"{self.target} is smaller than the {size} byte image")
+        else:
+            os.ftruncate(target, size)  # Everything not written stays a hole
+
+        digest = hashlib.blake2b()
+        result = ImageResult(size=size, copied=0, seconds=0.0, digest=digest.hexdigest())
+        if size == 0:
+            return result  # mmap refuses empty files
+        start = last_report = time.perf_counter()
+        zeroed_until = 0  # Block device targets: end of the range known to be zeroed or written
+
+        with mmap.mmap(source, size, prot=mmap.PROT_READ) as mapped:
+            for extent_start, extent_end in data_extents(source, size):
+                if extent_start > zeroed_until:
+                    self._zero(target, target_is_block, zeroed_until, extent_start - zeroed_until)
+
+                for offset in range(extent_start, extent_end, CHUNK_SIZE):
+                    length = min(CHUNK_SIZE, extent_end - offset)
+                    data = mapped[offset:offset + length]
+
+                    if self.skip_zeros and data == _ZEROS[:length]:
+                        self._zero(target, target_is_block, offset, length)
+                    else:
+                        _copy_range(source, target, offset, length, data)
+                        chunk_digest = hashlib.blake2b(data, digest_size=16).digest()
+                        result.chunks[offset] = (length, chunk_digest)
+                        digest.update(offset.to_bytes(8, 'little') + chunk_digest)
+                        result.copied += length
+
+                    if (now := time.perf_counter()) - last_report >= PROGRESS_INTERVAL:
+                        last_report = now
+                        self._report(Progress(offset + length, size, result.copied, now - start))
+                zeroed_until = extent_end
+
+            if size > zeroed_until:
+                self._zero(target, target_is_block, zeroed_until, size - zeroed_until)
+
+        os.fsync(target)
+        result.seconds = time.perf_counter() - start
+        result.digest = digest.hexdigest()
+        self._report(Progress(size, size, result.copied, result.seconds))
+        return result
+
+    def _verify(self, result: ImageResult) -> None:
+        target = os.open(self.target, os.O_RDONLY)
+        try:
+            # Drop the cached pages, so the data is read back from the device
+            os.posix_fadvise(target, 0, 0, os.POSIX_FADV_DONTNEED)
+            for offset, (length, expected) in result.chunks.items():
+                data = os.pread(target, length, offset)
+                if hashlib.blake2b(data, digest_size=16).digest() != expected:
+                    raise ImagingError(f"{self.target} does not match {self.source} at byte {offset}")
+        finally:
+            os.close(target)
+
+        result.verified = True
+        logger.info(f"Verified {result.copied / 1024 ** 2:.0f} MiB written to {self.target}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Write a disk or partition image onto a device or file.')
+    parser.add_argument('source', type=Path, help='Image file or device to copy from')
+    parser.add_argument('target', type=Path, help='Device or file to write to')
+    parser.add_argument('--no-verify', action='store_true', help="Don't read the written data back")
+    parser.add_argument('--assume-zeroed', action='store_true',
+                        help="The target device is already zeroed (e.g. after blkdiscard), don't zero skipped ranges")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    try:
+        result = BlockImager(args.source, args.target, not args.no_verify, assume_zeroed=args.assume_zeroed).run()
+    except (ImagingError, OSError) as e:
+        logger.error(str(e))
+        exit(1)
+    logger.info(f"Wrote {result.copied} of {result.size} bytes in {result.seconds:.1f}s, blake2b {result.digest}")
+
+
+if __name__ == '__main__':
+    main()
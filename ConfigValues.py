@@ -0,0 +1,6 @@
+from typing import Any
+
+
+def plain_value(item: Any) -> Any:
+    """Unwrap archinstall enum members to their plain value, anything else is returned as is."""
+    return getattr(item, 'value', item)
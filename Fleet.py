@@ -0,0 +1,316 @@
+import argparse
+import json
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Any, Optional
+
+import logging
+
+from HardwareInventory import HardwareInventory, probe, use
+from Installer import ARG_GOLDEN_IMAGE, ARG_IMAGE_DIR, ARG_PACKAGE_CACHE, ARG_SKIP_MIRROR_RANKING, ARG_SKIP_POST_INSTALL
+
+logger = logging.getLogger(__name__)
+
+FLEET_DIR = Path('/var/lib/maiarch/fleet')  # One working directory per target
+MOUNT_ROOT = Path('/mnt/fleet')  # One mountpoint per target
+CACHE_DIR = Path('/var/cache/maiarch/fleet-pkg')  # Package cache shared by all targets
+DEFAULT_MAX_PARALLEL = 4
+
+SPEC_FILE = 'target.json'
+CONFIG_FILE = 'user_configuration.json'
+PLAN_FILE = 'plan.json'
+INVENTORY_FILE = 'inventory.json'
+
+
+class FleetError(Exception):
+    """Raised for an invalid fleet file, or when one or more targets failed."""
+
+
+@dataclass
+class Target:
+    """
+    One machine to install: a block device, or a disk image that is attached
+    as a loop device for the duration of the run (handy for testing).
+    """
+    name: str
+    config: Path
+    device: Optional[str] = None
+    image: Optional[Path] = None
+    size: Optional[str] = None  # Created with this size when the image does not exist yet
+    creds: Optional[Path] = None
+    status: str = 'pending'
+    error: Optional[str] = None
+    seconds: float = 0.0
+
+
+def load_targets(fleet_file: Path) -> list[Target]:
+    """Read a JSON list of {"name", "device" or "image", "config", "creds"} objects."""
+    targets = []
+    for entry in json.loads(fleet_file.read_text()):
+        if bool(entry.get('device')) == bool(entry.get('image')):
+            raise FleetError(f"Target {entry.get('name', '?')} needs exactly one of 'device' or 'image'")
+
+        base = fleet_file.parent
+        targets.append(Target(
+            name=entry.get('name') or Path(entry.get('device') or entry['image']).stem,
+            config=base / entry['config'],
+            device=entry.get('device'),
+            image=base / entry['image'] if entry.get('image') else None,
+            size=entry.get('size'),
+            creds=base / entry['creds'] if entry.get('creds') else None,
+        ))
+
+    for key in ('name', 'device', 'image'):
+        values = [getattr(target, key) for target in targets if getattr(target, key)]
+        if len(values) != len(set(values)):
+            raise FleetError(f"Two targets share the same {key}")
+    return targets
+
+
+def _tail(path: Path, lines: int = 5) -> str:
+    try:
+        return ' / '.join(path.read_text(errors='replace').strip().splitlines()[-lines:])
+    except OSError:
+        return ''
+
+
+class Fleet:
+    """
+    Installs onto many targets from one process. Every target is installed by
+    its own worker process (a fresh interpreter, as archinstall keeps its state
+    in module globals) with its own mountpoint, log directory and configuration,
+    at most `max_parallel` at a time.
+
+    Before installing, every worker compiles its install plan; a target whose
+    plan does not fit fails early. The union of all planned packages is then
+    downloaded once into a shared cache, which each worker bind-mounts as its
+    target's package cache, so the installs mostly read packages locally.
+    """
+
+    def __init__(self, targets: list[Target], work_dir: Path = FLEET_DIR, cache_dir: Path = CACHE_DIR,
+                 max_parallel: int = DEFAULT_MAX_PARALLEL, skip_post_install: bool = False,
+                 image_dir: Optional[Path] = None):
+        self.targets = targets
+        self.work_dir = work_dir
+        self.cache_dir = cache_dir
+        self.max_parallel = max_parallel
+        self.skip_post_install = skip_post_install
+        self.image_dir = image_dir  # Golden images are built and reused here when set
+
+    def _target_dir(self, target: Target) -> Path:
+        return self.work_dir / target.name
+
+    def _attach(self, target: Target) -> None:
+        if target.image is None:
+            return
+        if not target.image.exists():
+            if not target.size:
+                raise FleetError(f"{target.image} does not exist and target {target.name} has no size")
+            subprocess.run(['truncate', '--size', target.size, str(target.image)], check=True)
+
+        result = subprocess.run(['losetup', '--find', '--show', '--partscan', str(target.image)],
+                                stdout=subprocess.PIPE, text=True, check=True)
+        target.device = result.stdout.strip()
+        logger.info(f"Attached {target.image} to {target.device} for target {target.name}")
+
+    def _detach(self, target: Target) -> None:
+        if target.image is not None and target.device:
+            subprocess.run(['losetup', '--detach', target.device])
+
+    def _prepare(self, target: Target) -> None:
+        """Write the target's configuration, pointed at its device, and the worker's spec."""
+        config = json.loads(target.config.read_text())
+        modifications = (config.get('disk_config') or {}).get('device_modifications') or []
+        if len(modifications) == 1:
+            modifications[0]['device'] = target.device
+        elif not any(modification.get('device') == target.device for modification in modifications):
+            raise FleetError(f"The configuration of target {target.name} does not use {target.device}")
+
+        target_dir = self._target_dir(target)
+        (target_dir / 'logs').mkdir(parents=True, exist_ok=True)
+        (target_dir / CONFIG_FILE).write_text(json.dumps(config, indent=4))
+        (target_dir / SPEC_FILE).write_text(json.dumps({
+            'config': str(target_dir / CONFIG_FILE),
+            'creds': str(target.creds) if target.creds else None,
+            # Probed once by the fleet, all targets are installed from the same host
+            'inventory': str(self.work_dir / INVENTORY_FILE),
+            'mountpoint': str(MOUNT_ROOT / target.name),
+            'log_path': str(target_dir / 'logs'),
+            'arguments': {
+                ARG_PACKAGE_CACHE: str(self.cache_dir),
+                # Set up and ranked once for the whole fleet, see _rank_mirrors
+                ARG_SKIP_MIRROR_RANKING: True,
+                ARG_SKIP_POST_INSTALL: self.skip_post_install,
+                ARG_GOLDEN_IMAGE: self.image_dir is not None,
+                ARG_IMAGE_DIR: str(self.image_dir) if self.image_dir else None,
+            },
+        }, indent=4))
+
+    def _run_worker(self, target: Target, phase: str) -> None:
+        if target.status == 'failed':
+            return
+
+        log_file = self._target_dir(target) / f'{phase}.log'
+        start = time.perf_counter()
+        with log_file.open('w') as log:
+            result = subprocess.run(
+                [sys.executable, str(Path(__file__).resolve()), '--worker', phase, str(self._target_dir(target))],
+                stdout=log, stderr=subprocess.STDOUT, stdin=subprocess.DEVNULL
+            )
+        target.seconds += time.perf_counter() - start
+
+        if result.returncode != 0:
+            target.status = 'failed'
+            target.error = f"{phase} exited with {result.returncode}: {_tail(log_file)} (see {log_file})"
+            logger.error(f"Target {target.name}: {target.error}")
+        else:
+            target.status = phase
+            logger.info(f"Target {target.name}: {phase} finished")
+
+    def _phase(self, phase: str) -> None:
+        with ThreadPoolExecutor(self.max_parallel, thread_name_prefix=f'fleet-{phase}') as pool:
+            list(pool.map(lambda target: self._run_worker(target, phase), self.targets))
+
+    def _mirror_config(self) -> Any:
+        """
+        The mirror configuration of the targets, shaped like archinstall's for
+        MirrorRanking. The targets share the live mirrorlist, so they must agree.
+        """
+        configs = {
+            json.dumps(json.loads(target.config.read_text()).get('mirror_config'), sort_keys=True)
+            for target in self.targets
+        }
+        if len(configs) > 1:
+            raise FleetError("The targets' mirror_config differ, they are installed from the same mirrorlist")
+        config = json.loads(configs.pop()) if configs else None
+        if not config:
+            return None
+        return SimpleNamespace(
+            mirror_regions=config.get('mirror_regions') or {},
+            custom_servers=[SimpleNamespace(**server) if isinstance(server, dict) else server
+                            for server in config.get('custom_servers') or []],
+        )
+
+    def _rank_mirrors(self) -> None:
+        """Apply the targets' mirror configuration to the live system once, then rank it."""
+        from MirrorRanking import MirrorResult, candidate_urls, custom_urls, rank_mirrors, write_mirrorlist
+
+        mirror_config = self._mirror_config()
+        urls = candidate_urls(mirror_config)
+        if mirror_config and urls:
+            # What the workers' set_mirrors would have written, kept if no mirror passes the ranking
+            write_mirrorlist([MirrorResult(url) for url in urls])
+        if ranked := rank_mirrors(urls, keep=custom_urls(mirror_config)):
+            write_mirrorlist(ranked)
+
+    def _prefetch(self) -> None:
+        """Download the packages of every planned target once into the shared cache."""
+        packages: dict[str, None] = {}
+        for target in self.targets:
+            if target.status == 'failed':
+                continue
+            plan = json.loads((self._target_dir(target) / PLAN_FILE).read_text())
+            missing = set(plan.get('missing_packages', []))
+            packages.update(dict.fromkeys(package for package in plan['packages'] if package not in missing))
+        if not packages:
+            return
+
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        logger.info(f"Downloading {len(packages)} packages for {len(self.targets)} targets into {self.cache_dir}")
+        result = subprocess.run(['pacman', '-Syw', '--noconfirm', '--cachedir', str(self.cache_dir), *packages])
+        if result.returncode != 0:
+            # Not fatal, the workers download whatever is missing themselves
+            logger.warning(f"Pre-downloading the packages failed with exit code {result.returncode}")
+
+    def run(self) -> None:
+        try:
+            for target in self.targets:
+                self._attach(target)
+
+            # After attaching, so the inventory includes the loop devices
+            self.work_dir.mkdir(parents=True, exist_ok=True)
+            probe().save(self.work_dir / INVENTORY_FILE)
+            for target in self.targets:
+                self._prepare(target)
+
+            self._phase('plan')
+            self._rank_mirrors()
+            self._prefetch()
+            self._phase('install')
+        finally:
+            for target in self.targets:
+                self._detach(target)
+
+        logger.info(f"Fleet report:\n{self.report()}")
+        if failed := [target.name for target in self.targets if target.status == 'failed']:
+            raise FleetError(f"Installation failed on: {', '.join(failed)}")
+
+    def report(self) -> str:
+        lines = [f"{'Target':<20} {'Device':<15} {'Status':<8} {'Time (s)':>9}"]
+        for target in self.targets:
+            status = 'FAILED' if target.status == 'failed' else 'ok'
+            lines.append(f"{target.name:<20} {target.device or '-':<15} {status:<8} {target.seconds:>9.1f}")
+            if target.error:
+                lines.append(f"    {target.error}")
+        return '\n'.join(lines)
+
+
+def _worker(phase: str, target_dir: Path) -> None:
+    """Runs one phase for one target, inside its own worker process."""
+    spec: dict[str, Any] = json.loads((target_dir / SPEC_FILE).read_text())
+
+    # archinstall reads its configuration from the command line when it is first imported
+    sys.argv = [sys.argv[0], '--silent', '--config', spec['config']]
+    if spec['creds']:
+        sys.argv += ['--creds', spec['creds']]
+
+    import archinstall
+    import Installer
+
+    use(HardwareInventory.load(Path(spec['inventory'])))
+    mountpoint = Path(spec['mountpoint'])
+    mountpoint.mkdir(parents=True, exist_ok=True)
+    archinstall.storage['MOUNT_POINT'] = mountpoint
+    archinstall.storage['LOG_PATH'] = Path(spec['log_path'])
+    archinstall.arguments.update(spec['arguments'])
+    Installer.normalize_arguments(archinstall.arguments)
+
+    if phase == 'plan':
+        plan = Installer.install_plan(mountpoint)
+        (target_dir / PLAN_FILE).write_text(plan.to_json())
+        plan.check_fits()
+    else:
+        Installer.main()
+
+
+def main() -> None:
+    if len(sys.argv) == 4 and sys.argv[1] == '--worker':
+        _worker(sys.argv[2], Path(sys.argv[3]))
+        return
+
+    parser = argparse.ArgumentParser(description='Install MaiArch onto many targets concurrently.')
+    parser.add_argument('fleet_file', type=Path, help='JSON list of targets: name, device or image (+ size), config, creds')
+    parser.add_argument('--max-parallel', type=int, default=DEFAULT_MAX_PARALLEL, help='Targets installed at the same time')
+    parser.add_argument('--work-dir', type=Path, default=FLEET_DIR, help='Per-target configurations, plans and logs')
+    parser.add_argument('--cache-dir', type=Path, default=CACHE_DIR, help='Package cache shared by all targets')
+    parser.add_argument('--skip-post-install', action='store_true', help="Don't install MaiArch's components")
+    parser.add_argument('--golden-image-dir', type=Path, help='Build a golden image per configuration here and reuse it')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    fleet = Fleet(load_targets(args.fleet_file), args.work_dir, args.cache_dir, args.max_parallel,
+                  args.skip_post_install, args.golden_image_dir)
+    try:
+        fleet.run()
+    except FleetError as e:
+        logger.error(str(e))
+        exit(1)
+
+
+if __name__ == '__main__':
+    main()
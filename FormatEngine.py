@@ -0,0 +1,214 @@
+import argparse
+import subprocess
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Optional
+
+import logging
+
+from ConfigValues import plain_value
+from HardwareInventory import QueueInfo, inventory, parent_device
+from LayoutOptimizer import mkfs_options
+
+logger = logging.getLogger(__name__)
+
+FORCE_FLAGS = {'ext2': ['-F'], 'ext3': ['-F'], 'ext4': ['-F'], 'btrfs': ['-f'], 'xfs': ['-f'], 'f2fs': ['-f']}
+
+# ext4 leaves the inode tables and the journal to be zeroed after mounting, by the
+# kernel's ext4lazyinit thread, so even a multi-terabyte filesystem is created in seconds
+LAZY_INIT = {'lazy_itable_init': '1', 'lazy_journal_init': '1'}
+EAGER_INIT = {'lazy_itable_init': '0', 'lazy_journal_init': '0'}
+
+
+class FormatError(Exception):
+    """Raised when one or more partitions could not be formatted."""
+
+
+@dataclass
+class FormatJob:
+    path: Path
+    fs_type: str  # As archinstall names them: ext4, btrfs, fat32, linux-swap, ...
+    options: list[str] = field(default_factory=list)  # Extra mkfs options
+
+
+@dataclass
+class FormatResult:
+    job: FormatJob
+    command: list[str]
+    seconds: float
+    error: Optional[str] = None
+
+
+def with_extended_options(options: list[str], extended: dict[str, str]) -> list[str]:
+    """Merge `extended` into the -E option of mke2fs options, overriding keys set already."""
+    merged: dict[str, Optional[str]] = {}
+    rest = []
+    it = iter(options)
+    for option in it:
+        if option == '-E':
+            for item in next(it, '').split(','):
+                key, _, value = item.partition('=')
+                merged[key] = value or None
+        else:
+            rest.append(option)
+
+    merged.update(extended)
+    return rest + ['-E', ','.join(key if value is None else f'{key}={value}' for key, value in merged.items())]
+
+
+def mkfs_command(fs_type: str, path: Path, options: list[str]) -> list[str]:
+    if fs_type in ('linux-swap', 'swap'):
+        return ['mkswap', *options, str(path)]
+    if fs_type in ('fat12', 'fat16', 'fat32'):
+        return ['mkfs.fat', '-F', fs_type[3:], *options, str(path)]
+    if fs_type == 'ntfs':
+        return ['mkfs.ntfs', '-Q', *options, str(path)]
+    return [f'mkfs.{fs_type}', *FORCE_FLAGS.get(fs_type, []), *options, str(path)]
+
+
+class FormatEngine:
+    """
+    Formats partitions concurrently. Partitions on the same rotational disk are
+    formatted one after the other, as concurrent writes would only make its head
+    seek back and forth; partitions on solid state devices, and on different
+    disks, are formatted at the same time, at most `max_parallel` (by default
+    one per CPU) at once.
+
+    With `optimize`, each job also gets the mkfs options LayoutOptimizer picks
+    for its device. With `lazy`, ext filesystems defer their inode table and
+    journal initialization to the kernel, otherwise they initialize them while
+    formatting.
+    """
+
+    def __init__(self, jobs: list[FormatJob], lazy: bool = True, optimize: bool = True,
+                 max_parallel: Optional[int] = None):
+        self.jobs = jobs
+        self.lazy = lazy
+        self.optimize = optimize
+        self.max_parallel = max_parallel
+
+    def _queue(self, path: Path) -> QueueInfo:
+        return inventory().queue(parent_device(path))
+
+    def command(self, job: FormatJob) -> list[str]:
+        options = list(job.options)
+        if self.optimize:
+            options = mkfs_options(self._queue(job.path), job.fs_type) + options
+        if job.fs_type in ('ext2', 'ext3', 'ext4'):
+            options = with_extended_options(options, LAZY_INIT if self.lazy else EAGER_INIT)
+        return mkfs_command(job.fs_type, job.path, options)
+
+    def _groups(self) -> list[list[FormatJob]]:
+        """Jobs that must run one after the other, grouped by rotational disk."""
+        groups: dict[str, list[FormatJob]] = {}
+        for job in self.jobs:
+            queue = self._queue(job.path)
+            groups.setdefault(queue.device if queue.rotational else str(job.path), []).append(job)
+        return list(groups.values())
+
+    def _format(self, job: FormatJob) -> FormatResult:
+        command = self.command(job)
+        logger.info(f"Formatting {job.path} as {job.fs_type}: {' '.join(command)}")
+        start = time.perf_counter()
+        try:
+            result = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+        except OSError as e:  # e.g. the filesystem's tools are not installed
+            return FormatResult(job, command, time.perf_counter() - start, str(e))
+        seconds = time.perf_counter() - start
+
+        if result.returncode != 0:
+            output = ' / '.join(result.stdout.strip().splitlines()[-3:])
+            return FormatResult(job, command, seconds, f"{command[0]} exited with {result.returncode}: {output}")
+        logger.info(f"Formatted {job.path} in {seconds:.1f}s")
+        return FormatResult(job, command, seconds)
+
+    def run(self) -> list[FormatResult]:
+        groups = self._groups()
+        start = time.perf_counter()
+        # mkfs is mostly I/O bound, but checksums and zeroing still cost CPU
+        workers = min(self.max_parallel or inventory().cpu_count, len(groups)) or 1
+        with ThreadPoolExecutor(workers, thread_name_prefix='format') as pool:
+            grouped = pool.map(lambda group: [self._format(job) for job in group], groups)
+            results = [result for group in grouped for result in group]
+
+        logger.info(f"Formatted {len(results)} partitions in {time.perf_counter() - start:.1f}s")
+        if failed := [result for result in results if result.error]:
+            raise FormatError('; '.join(f"{result.job.path}: {result.error}" for result in failed))
+        return results
+
+
+def supports_layout(disk_config: Any, encryption: Any = None) -> bool:
+    """
+    Whether an archinstall layout only needs plain partitioning and mkfs. Encryption,
+    LVM and btrfs subvolumes are left to archinstall's FilesystemHandler.
+    """
+    if str(plain_value(getattr(disk_config, 'config_type', ''))) == 'pre_mounted_config':
+        return False
+    if getattr(disk_config, 'lvm_config', None):
+        return False
+    if encryption is not None and str(plain_value(getattr(encryption, 'encryption_type', 'no_encryption'))) != 'no_encryption':
+        return False
+    return not any(getattr(partition, 'btrfs_subvols', None)
+                   for modification in disk_config.device_modifications for partition in modification.partitions)
+
+
+def format_layout(disk_config: Any, lazy: bool = True, optimize: bool = True, fs_handler: Any = None) -> None:
+    """
+    Partition the devices of an archinstall layout like FilesystemHandler does,
+    then format all their new partitions at once with FormatEngine. Given the
+    FilesystemHandler, its final countdown runs first, as it would in archinstall:
+    in silent mode it is the last chance to abort before the disks are wiped.
+    """
+    from archinstall.lib.disk import PartitionTable
+    from archinstall.lib.disk.device_handler import device_handler
+
+    modifications = [modification for modification in disk_config.device_modifications if modification.partitions]
+    if fs_handler is not None and modifications:
+        device_paths = ', '.join(
+            str(getattr(getattr(modification.device, 'device_info', None), 'path', modification.device))
+            for modification in modifications
+        )
+        if fs_handler._final_warning(device_paths) is False:
+            raise FormatError(f"Formatting {device_paths} was cancelled")
+
+    partition_table = PartitionTable.GPT if inventory().uefi else PartitionTable.MBR
+    for modification in modifications:
+        device_handler.partition(modification, partition_table=partition_table)
+    device_handler.udev_sync()
+
+    partitions = [partition for modification in modifications for partition in modification.partitions
+                  if str(plain_value(partition.status)) in ('create', 'modify') and partition.fs_type]
+    FormatEngine(
+        [FormatJob(partition.safe_dev_path, str(plain_value(partition.fs_type))) for partition in partitions],
+        lazy, optimize
+    ).run()
+
+    # archinstall reads these when mounting and when writing the bootloader configuration
+    device_handler.udev_sync()
+    for partition in partitions:
+        info = device_handler.fetch_part_info(partition.safe_dev_path)
+        partition.partn = info.partn
+        partition.partuuid = info.partuuid
+        partition.uuid = info.uuid
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Format partitions concurrently.')
+    parser.add_argument('partitions', nargs='+', metavar='PATH:FS_TYPE', help='e.g. /dev/sda1:ext4 /dev/sda2:linux-swap')
+    parser.add_argument('--eager', action='store_true', help='Initialize ext inode tables and journals now')
+    parser.add_argument('--no-optimize', action='store_true', help="Don't add the device-specific mkfs options")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    jobs = [FormatJob(Path(path), fs_type) for path, _, fs_type in (item.rpartition(':') for item in args.partitions)]
+    try:
+        FormatEngine(jobs, lazy=not args.eager, optimize=not args.no_optimize).run()
+    except FormatError as e:
+        logger.error(str(e))
+        exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,115 @@
+import fcntl
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import tempfile
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Iterator
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+IMAGE_DIR = Path('/var/cache/maiarch/images')
+
+# Bump when the image contents change in a way older images do not have
+IMAGE_FORMAT = 1
+
+# Per-host or throwaway files that are not captured. They are recreated for each
+# host on restore, so no two machines share a machine-id, keyring or host keys.
+EXCLUDED = [
+    './etc/fstab',
+    './etc/hostname',
+    './etc/machine-id',
+    './etc/pacman.d/gnupg',
+    './etc/ssh/ssh_host_*',
+    './var/cache/pacman/pkg/*',
+    './var/lib/maiarch',
+    './var/log/journal/*',
+    './tmp/*',
+]
+
+TAR_OPTIONS = ['--xattrs', '--xattrs-include=*', '--acls', '--numeric-owner', '--sparse']
+COMPRESS = 'zstd -T0 -3'
+DECOMPRESS = 'zstd -d -T0'
+
+
+def config_hash(inputs: dict[str, Any]) -> str:
+    """Stable hash of the configuration values that shape the image."""
+    canonical = json.dumps({'format': IMAGE_FORMAT, **inputs}, sort_keys=True, default=str)
+    return hashlib.sha256(canonical.encode()).hexdigest()[:16]
+
+
+def image_path(image_dir: Path, digest: str) -> Path:
+    return image_dir / f'maiarch-{digest}.tar.zst'
+
+
+@contextmanager
+def build_lock(image: Path) -> Iterator[None]:
+    """
+    Exclusive lock on building `image`. Installations of the same configuration
+    take it before looking for the image, so one of them builds it while the
+    others wait, on this host and in Fleet's workers alike. Once the image
+    exists it is released, images are restored without holding it.
+    """
+    image.parent.mkdir(parents=True, exist_ok=True)
+    with open(image.with_name(image.name + '.lock'), 'w') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        yield
+
+
+def capture(target: Path, image: Path) -> None:
+    """Pack the installed system at `target` into a zstd tarball, atomically."""
+    image.parent.mkdir(parents=True, exist_ok=True)
+    fd, partial = tempfile.mkstemp(prefix=f'.{image.name}.', dir=image.parent)
+    os.close(fd)
+    start = time.perf_counter()
+
+    try:
+        subprocess.run(
+            ['tar', '--create', *TAR_OPTIONS, *(f'--exclude={pattern}' for pattern in EXCLUDED),
+             '--use-compress-program', COMPRESS, '--file', partial, '--directory', str(target), '.'],
+            check=True
+        )
+        os.chmod(partial, 0o644)
+        os.replace(partial, image)
+    except BaseException:
+        os.unlink(partial)
+        raise
+    logger.info(f"Captured {image} ({image.stat().st_size / 1024 ** 2:.0f} MiB) in {time.perf_counter() - start:.1f}s")
+
+
+def restore(image: Path, target: Path) -> None:
+    """Stream a captured image onto the mounted, freshly formatted target."""
+    start = time.perf_counter()
+    subprocess.run(
+        ['tar', '--extract', *TAR_OPTIONS, '--use-compress-program', DECOMPRESS,
+         '--file', str(image), '--directory', str(target)],
+        check=True
+    )
+    logger.info(f"Restored {image} onto {target} in {time.perf_counter() - start:.1f}s")
+
+
+def reset_host_identity(target: Path, hostname: str) -> None:
+    """Give a restored system its own hostname, machine-id and pacman keyring."""
+    (target / 'etc/hostname').write_text(hostname + '\n')
+
+    (target / 'etc/machine-id').unlink(missing_ok=True)
+    subprocess.run(['systemd-machine-id-setup', '--root', str(target)], check=True)
+
+    # The keyring's local signing key must be unique to each machine
+    shutil.rmtree(target / 'etc/pacman.d/gnupg', ignore_errors=True)
+    subprocess.run(['arch-chroot', str(target), 'pacman-key', '--init'], check=True)
+    subprocess.run(['arch-chroot', str(target), 'pacman-key', '--populate'], check=True)
+
+
+def regenerate_initramfs(target: Path) -> None:
+    """
+    The captured initramfs images were built for the image builder's hardware
+    (mkinitcpio's autodetect hook), so every restored host rebuilds its own.
+    """
+    subprocess.run(['arch-chroot', str(target), 'mkinitcpio', '-P'], check=True)
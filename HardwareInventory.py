@@ -0,0 +1,324 @@
+import argparse
+import json
+import os
+import subprocess
+import threading
+import time
+from dataclasses import asdict, dataclass, field, replace
+from pathlib import Path
+from typing import Optional, Union
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+SYS_BLOCK = Path('/sys/block')
+SYS_CLASS_BLOCK = Path('/sys/class/block')
+SYS_CLASS_NET = Path('/sys/class/net')
+SYS_PCI_DEVICES = Path('/sys/bus/pci/devices')
+SYS_EFI = Path('/sys/firmware/efi')
+CPUINFO = Path('/proc/cpuinfo')
+MEMINFO = Path('/proc/meminfo')
+SECTOR_SIZE = 512  # /sys/block/*/size is always in 512-byte sectors
+
+# Bump when fields change, recorded inventories of another format are rejected
+INVENTORY_FORMAT = 1
+
+MICROCODE = {'GenuineIntel': 'intel-ucode', 'AuthenticAMD': 'amd-ucode'}
+GPU_VENDORS = {'0x8086': 'intel', '0x10de': 'nvidia', '0x1002': 'amd', '0x1af4': 'virtio', '0x15ad': 'vmware'}
+
+
+def _read(path: Path, default: str = '') -> str:
+    try:
+        return path.read_text().strip()
+    except OSError:
+        return default
+
+
+def _read_int(path: Path, default: int = 0) -> int:
+    try:
+        return int(_read(path))
+    except ValueError:
+        return default
+
+
+@dataclass(frozen=True)
+class QueueInfo:
+    """The I/O characteristics a block device reports in /sys/block/<device>/queue."""
+    device: str
+    rotational: bool = False
+    discard_granularity: int = 0
+    discard_max_bytes: int = 0
+    minimum_io_size: int = 0  # RAID chunk size
+    optimal_io_size: int = 0  # RAID stripe width
+    physical_block_size: int = 512
+    logical_block_size: int = 512
+    zoned: str = 'none'  # host-aware or host-managed for SMR disks that report it
+
+    @classmethod
+    def read(cls, device: str, sys_block: Path = SYS_BLOCK) -> 'QueueInfo':
+        queue = sys_block / device / 'queue'
+        return cls(
+            device=device,
+            rotational=_read_int(queue / 'rotational') == 1,
+            discard_granularity=_read_int(queue / 'discard_granularity'),
+            discard_max_bytes=_read_int(queue / 'discard_max_bytes'),
+            minimum_io_size=_read_int(queue / 'minimum_io_size'),
+            optimal_io_size=_read_int(queue / 'optimal_io_size'),
+            physical_block_size=_read_int(queue / 'physical_block_size', 512),
+            logical_block_size=_read_int(queue / 'logical_block_size', 512),
+            zoned=_read(queue / 'zoned', 'none'),
+        )
+
+    @property
+    def discard(self) -> bool:
+        return self.discard_max_bytes > 0
+
+    @property
+    def smr(self) -> bool:
+        """Shingled disk. Drive-managed SMR disks don't report themselves and look like plain HDDs."""
+        return self.zoned in ('host-aware', 'host-managed')
+
+
+def parent_device(path: Union[str, Path], sys_class_block: Path = SYS_CLASS_BLOCK) -> str:
+    """The /sys/block name of the disk a device path belongs to, e.g. /dev/nvme0n1p2 -> nvme0n1."""
+    name = Path(path).resolve().name
+    if (sys_class_block / name / 'partition').exists():
+        return (sys_class_block / name).resolve().parent.name
+    return name
+
+
+@dataclass(frozen=True)
+class BlockDevice:
+    name: str
+    path: str
+    size_bytes: int
+    model: Optional[str]
+    removable: bool
+    read_only: bool
+    partitions: tuple[str, ...]
+    queue: QueueInfo
+
+
+@dataclass(frozen=True)
+class Gpu:
+    slot: str  # PCI address
+    vendor: str
+    vendor_id: str
+    device_id: str
+    driver: Optional[str]  # Kernel driver bound to it in the live environment
+
+
+@dataclass(frozen=True)
+class NetworkInterface:
+    name: str
+    mac: str
+    wireless: bool
+
+
+@dataclass(frozen=True)
+class HardwareInventory:
+    """
+    A snapshot of the hardware the installation depends on. It is probed once
+    and then shared, see inventory(), or recorded with save() and replayed with
+    load() and use(), for fleet workers on the same host and for tests.
+    """
+    uefi: bool
+    efi_bitness: Optional[int]  # 32-bit UEFI firmware needs a 32-bit bootloader
+    cpu_vendor: str
+    cpu_model: str
+    cpu_count: int
+    memory_bytes: int
+    gpus: tuple[Gpu, ...]
+    block_devices: tuple[BlockDevice, ...]
+    network_interfaces: tuple[NetworkInterface, ...]
+    accessibility: bool  # Screen reader running in the live environment
+    probed_at: float = field(default_factory=time.time)
+
+    @property
+    def microcode(self) -> Optional[str]:
+        return MICROCODE.get(self.cpu_vendor)
+
+    def block_device(self, name: str) -> Optional[BlockDevice]:
+        return next((device for device in self.block_devices if device.name == name), None)
+
+    def queue(self, device: str) -> QueueInfo:
+        """I/O characteristics of a disk, read directly when it appeared after the snapshot (e.g. loop devices)."""
+        if found := self.block_device(device):
+            return found.queue
+        return QueueInfo.read(device)
+
+    def to_json(self) -> str:
+        return json.dumps({'format': INVENTORY_FORMAT, **asdict(self)}, indent=4)
+
+    @classmethod
+    def from_json(cls, text: str) -> 'HardwareInventory':
+        data = json.loads(text)
+        if data.pop('format', None) != INVENTORY_FORMAT:
+            raise ValueError(f"Not a format {INVENTORY_FORMAT} hardware inventory")
+        return cls(**{
+            **data,
+            'gpus': tuple(Gpu(**gpu) for gpu in data['gpus']),
+            'block_devices': tuple(
+                BlockDevice(**{**device, 'partitions': tuple(device['partitions']), 'queue': QueueInfo(**device['queue'])})
+                for device in data['block_devices']
+            ),
+            'network_interfaces': tuple(NetworkInterface(**interface) for interface in data['network_interfaces']),
+        })
+
+    def save(self, path: Path) -> None:
+        path.write_text(self.to_json())
+
+    @classmethod
+    def load(cls, path: Path) -> 'HardwareInventory':
+        return cls.from_json(path.read_text())
+
+
+def _cpu() -> tuple[str, str]:
+    vendor = model = ''
+    for line in _read(CPUINFO).splitlines():
+        key, _, value = line.partition(':')
+        key = key.strip()
+        if key == 'vendor_id' and not vendor:
+            vendor = value.strip()
+        elif key == 'model name' and not model:
+            model = value.strip()
+        if vendor and model:
+            break
+    return vendor, model
+
+
+def _memory_bytes() -> int:
+    for line in _read(MEMINFO).splitlines():
+        if line.startswith('MemTotal:'):
+            return int(line.split()[1]) * 1024
+    return 0
+
+
+def _gpus() -> tuple[Gpu, ...]:
+    gpus = []
+    for device in sorted(SYS_PCI_DEVICES.glob('*')):
+        if not _read(device / 'class').startswith('0x03'):  # Display controllers
+            continue
+        vendor_id = _read(device / 'vendor')
+        driver = device / 'driver'
+        gpus.append(Gpu(
+            slot=device.name,
+            vendor=GPU_VENDORS.get(vendor_id, 'unknown'),
+            vendor_id=vendor_id,
+            device_id=_read(device / 'device'),
+            driver=driver.resolve().name if driver.exists() else None,
+        ))
+    return tuple(gpus)
+
+
+def probe_block_devices() -> tuple[BlockDevice, ...]:
+    devices = []
+    for block in sorted(SYS_BLOCK.glob('*')):
+        size = _read_int(block / 'size') * SECTOR_SIZE
+        if size == 0:  # Unused loop and ram devices
+            continue
+        devices.append(BlockDevice(
+            name=block.name,
+            # Names like cciss!c0d0 map to /dev/cciss/c0d0
+            path=f"/dev/{block.name.replace('!', '/')}",
+            size_bytes=size,
+            model=_read(block / 'device' / 'model') or None,
+            removable=_read_int(block / 'removable') == 1,
+            read_only=_read_int(block / 'ro') == 1,
+            partitions=tuple(sorted(
+                (entry.name for entry in block.iterdir() if (entry / 'partition').exists()),
+                key=lambda name: _read_int(block / name / 'partition')
+            )),
+            queue=QueueInfo.read(block.name),
+        ))
+    return tuple(devices)
+
+
+def _network_interfaces() -> tuple[NetworkInterface, ...]:
+    return tuple(
+        NetworkInterface(
+            name=interface.name,
+            mac=_read(interface / 'address'),
+            wireless=(interface / 'wireless').exists() or (interface / 'phy80211').exists(),
+        )
+        for interface in sorted(SYS_CLASS_NET.glob('*')) if interface.name != 'lo'
+    )
+
+
+def _accessibility() -> bool:
+    # What archinstall checks: the espeakup screen reader is running in the live environment
+    try:
+        return subprocess.run(['systemctl', 'is-active', '--quiet', 'espeakup.service'],
+                              stderr=subprocess.DEVNULL).returncode == 0
+    except OSError:
+        return False
+
+
+def probe() -> HardwareInventory:
+    start = time.perf_counter()
+    cpu_vendor, cpu_model = _cpu()
+    efi_bitness = _read_int(SYS_EFI / 'fw_platform_size')
+    snapshot = HardwareInventory(
+        uefi=SYS_EFI.is_dir(),
+        efi_bitness=efi_bitness or None,
+        cpu_vendor=cpu_vendor,
+        cpu_model=cpu_model,
+        cpu_count=os.cpu_count() or 1,
+        memory_bytes=_memory_bytes(),
+        gpus=_gpus(),
+        block_devices=probe_block_devices(),
+        network_interfaces=_network_interfaces(),
+        accessibility=_accessibility(),
+    )
+    logger.debug(f"Probed the hardware in {(time.perf_counter() - start) * 1000:.0f} ms")
+    return snapshot
+
+
+_snapshot: Optional[HardwareInventory] = None
+_lock = threading.Lock()
+
+
+def inventory() -> HardwareInventory:
+    """The shared snapshot, probed on first use."""
+    global _snapshot
+    with _lock:
+        if _snapshot is None:
+            _snapshot = probe()
+        return _snapshot
+
+
+def use(snapshot: HardwareInventory) -> None:
+    """Share a recorded snapshot instead of probing."""
+    global _snapshot
+    with _lock:
+        _snapshot = snapshot
+
+
+def invalidate(block_devices_only: bool = False) -> None:
+    """
+    Drop the snapshot, so it is probed again on next use, or probe just its
+    block devices again, which change when the disks are partitioned.
+    """
+    global _snapshot
+    with _lock:
+        if block_devices_only and _snapshot is not None:
+            _snapshot = replace(_snapshot, block_devices=probe_block_devices())
+        else:
+            _snapshot = None
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Record the hardware inventory as JSON.')
+    parser.add_argument('--output', type=Path, help='Write it here instead of printing it')
+    args = parser.parse_args()
+
+    snapshot = probe()
+    if args.output:
+        snapshot.save(args.output)
+    else:
+        print(snapshot.to_json())
+
+
+if __name__ == '__main__':
+    main()
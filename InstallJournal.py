@@ -0,0 +1,67 @@
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Optional
+
+# Location of the journal, relative to the target's root
+JOURNAL_PATH = Path('var/lib/maiarch/install-journal.jsonl')
+
+
+class InstallJournal:
+    """
+    Append-only record of the installation steps that finished on a target,
+    kept on the target itself so an interrupted installation can be resumed.
+    Each line is a JSON object; every write is fsync'd before returning.
+    """
+
+    def __init__(self, mountpoint: Path):
+        self.path = mountpoint / JOURNAL_PATH
+        self._lock = threading.Lock()
+
+    def completed(self) -> set[str]:
+        """Names of the steps that finished successfully."""
+        done: set[str] = set()
+        if not self.path.exists():
+            return done
+
+        for line in self.path.read_text().splitlines():
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                break  # A torn last line from a crash mid-write
+            if entry.get('status') == 'done':
+                done.add(entry['step'])
+        return done
+
+    def failed_step(self) -> Optional[str]:
+        """The step of the most recent failure, if the last run failed."""
+        if not self.path.exists():
+            return None
+
+        last = None
+        for line in self.path.read_text().splitlines():
+            try:
+                last = json.loads(line)
+            except json.JSONDecodeError:
+                break
+        if last and last.get('status') == 'failed':
+            return last.get('step')
+        return None
+
+    def record(self, step: Optional[str], status: str = 'done', error: Optional[str] = None) -> None:
+        entry = {'step': step, 'status': status, 'time': time.time()}
+        if error is not None:
+            entry['error'] = error
+
+        with self._lock:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with self.path.open('a') as journal:
+                journal.write(json.dumps(entry) + '\n')
+                journal.flush()
+                os.fsync(journal.fileno())
+
+    def reset(self) -> None:
+        with self._lock:
+            self.path.unlink(missing_ok=True)
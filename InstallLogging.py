@@ -0,0 +1,259 @@
+import atexit
+import copy
+import json
+import queue
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Optional, TextIO
+
+import logging
+import logging.handlers
+
+from StepScheduler import current_step
+
+JSON_LOG = 'maiarch-install.jsonl'  # One JSON object per record
+STEP_LOG_DIR = 'steps'  # <step>.log per installation step
+CONSOLE_FORMAT = '%(levelname)s:%(name)s:%(message)s'
+OUTPUT_LOGGER = 'maiarch.output'  # Output printed to stdout and stderr, see capture_output()
+FILE_FORMAT = '%(asctime)s %(levelname)s %(name)s: %(message)s'
+
+CONSOLE_RATE = 20.0  # Records per second a slow console keeps up with
+CONSOLE_BURST = 100  # Records shown at once before the rate applies
+
+
+class StepFilter(logging.Filter):
+    """Tags each record with the step its thread is running, before it is queued."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if not hasattr(record, 'step'):
+            record.step = current_step.get()
+        return True
+
+
+class JsonFileHandler(logging.FileHandler):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'time': record.created,
+            'level': record.levelname,
+            'logger': record.name,
+            'step': getattr(record, 'step', None),
+            'thread': record.threadName,
+            'message': record.getMessage(),
+        }
+        if record.exc_text:
+            entry['exception'] = record.exc_text
+        return json.dumps(entry)
+
+
+class StepFileHandler(logging.Handler):
+    """Routes the records of each step to a log file of its own."""
+
+    def __init__(self, directory: Path):
+        super().__init__()
+        self.directory = directory
+        self._files: dict[str, logging.FileHandler] = {}
+
+    def emit(self, record: logging.LogRecord) -> None:
+        step = getattr(record, 'step', None)
+        if not step:
+            return
+        if step not in self._files:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            handler = logging.FileHandler(self.directory / f'{step}.log')
+            handler.setFormatter(self.formatter)
+            self._files[step] = handler
+        self._files[step].emit(record)
+
+    def close(self) -> None:
+        for handler in self._files.values():
+            handler.close()
+        super().close()
+
+
+class RateLimitedConsoleHandler(logging.StreamHandler):
+    """
+    Shows at most `rate` records per second after an initial burst, so a slow
+    serial console or framebuffer shows a sample instead of falling behind.
+    Warnings and errors are always shown, and the number of records left out
+    is reported with the next record shown.
+    """
+
+    def __init__(self, stream: Optional[TextIO] = None, rate: float = CONSOLE_RATE, burst: int = CONSOLE_BURST):
+        super().__init__(stream)
+        self.rate = rate
+        self.burst = burst
+        self.suppressed = 0
+        self._tokens = float(burst)
+        self._last = time.monotonic()
+
+    def _report_suppressed(self) -> None:
+        if self.suppressed:
+            self.stream.write(f"... {self.suppressed} messages not shown, they are in the log files{self.terminator}")
+            self.suppressed = 0
+
+    def emit(self, record: logging.LogRecord) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._last) * self.rate)
+        self._last = now
+
+        if self._tokens < 1 and record.levelno < logging.WARNING:
+            self.suppressed += 1
+            return
+        self._tokens = max(0.0, self._tokens - 1)
+        self._report_suppressed()
+        super().emit(record)
+
+    def close(self) -> None:
+        self._report_suppressed()
+        self.flush()
+        super().close()
+
+
+class ConsoleFormatter(logging.Formatter):
+    """Shows captured output as it was printed, and other records with their level and logger."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        if record.name.startswith(OUTPUT_LOGGER):
+            return record.getMessage()
+        return super().format(record)
+
+
+class OutputToLog:
+    """
+    archinstall prints its output, and streams the output of the commands it
+    runs, rather than logging it. This stream forwards every complete line to a
+    logger. With `tee` it also keeps writing to `stream`, like the GUI needs;
+    without, the output only reaches the console through the logging queue, in
+    order with the log records.
+    """
+
+    def __init__(self, stream: TextIO, logger: logging.Logger, level: int = logging.INFO, tee: bool = False):
+        self.stream = stream
+        self.logger = logger
+        self.level = level
+        self.tee = tee
+        self._partial = threading.local()
+
+    def _log(self, line: str) -> None:
+        line = line.rsplit('\r', 1)[-1]  # Only the last state of a progress bar
+        if line.strip():
+            self.logger.log(self.level, line)
+
+    def write(self, text: str) -> int:
+        if self.tee:
+            self.stream.write(text)
+        buffered = getattr(self._partial, 'text', '') + text
+        *lines, self._partial.text = buffered.split('\n')
+        for line in lines:
+            self._log(line)
+        return len(text)
+
+    def flush(self) -> None:
+        # Without tee, lines are forwarded as they complete
+        if self.tee:
+            self.stream.flush()
+
+    def close(self) -> None:
+        """Forward what is left of the current thread's last line."""
+        self._log(getattr(self._partial, 'text', ''))
+        self._partial.text = ''
+
+    def __getattr__(self, name):
+        return getattr(self.stream, name)
+
+
+_traceback_formatter = logging.Formatter()
+
+
+class TracebackQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler merges a record's traceback into its message. This one keeps
+    it apart, in exc_text, so the JSON log has it in a field of its own.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        if record.exc_info and not record.exc_text:
+            record.exc_text = _traceback_formatter.formatException(record.exc_info)
+        exc_text, record.exc_info, record.exc_text = record.exc_text, None, None
+        prepared = super().prepare(record)
+        prepared.exc_text = exc_text
+        return prepared
+
+
+_listener: Optional[logging.handlers.QueueListener] = None
+_streams: Optional[tuple[TextIO, TextIO]] = None  # stdout and stderr, while they are captured
+
+
+def capture_output() -> None:
+    """
+    Forward stdout and stderr to the logging queue. Call it once nothing asks
+    the user anything anymore, prompts would only show up after they are answered.
+    """
+    global _streams
+    if _streams is None:
+        _streams = sys.stdout, sys.stderr
+        sys.stdout = OutputToLog(sys.stdout, logging.getLogger(OUTPUT_LOGGER))
+        sys.stderr = OutputToLog(sys.stderr, logging.getLogger(OUTPUT_LOGGER), logging.WARNING)
+
+
+def release_output() -> None:
+    """Write to stdout and stderr directly again."""
+    global _streams
+    if _streams is not None:
+        for stream in (sys.stdout, sys.stderr):
+            if isinstance(stream, OutputToLog):
+                stream.close()
+        sys.stdout, sys.stderr = _streams
+        _streams = None
+
+
+def stop_logging() -> None:
+    """Release stdout and stderr, write out the queued records and close the sinks."""
+    global _listener
+    release_output()
+    if _listener is not None:
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
+
+
+def setup_logging(log_dir: Path, level: int = logging.INFO) -> logging.handlers.QueueListener:
+    """
+    Route all logging through a queue: callers only enqueue records, and one
+    listener thread writes them to the JSON log, the per-step logs and the
+    console, so console speed never holds up the installation. The listener
+    is stopped, and the queue drained, when the process exits.
+    """
+    global _listener
+
+    stop_logging()  # The console writes to the real stderr, not a captured one
+    log_dir.mkdir(parents=True, exist_ok=True)
+    records: queue.SimpleQueue = queue.SimpleQueue()
+
+    queue_handler = TracebackQueueHandler(records)
+    queue_handler.addFilter(StepFilter())
+
+    console = RateLimitedConsoleHandler(sys.stderr)
+    console.setFormatter(ConsoleFormatter(CONSOLE_FORMAT))
+    steps = StepFileHandler(log_dir / STEP_LOG_DIR)
+    steps.setFormatter(logging.Formatter(FILE_FORMAT))
+    listener = logging.handlers.QueueListener(
+        records, JsonFileHandler(log_dir / JSON_LOG), steps, console, respect_handler_level=True
+    )
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    root.setLevel(level)
+
+    listener.start()
+    _listener = listener
+    return listener
+
+
+atexit.register(stop_logging)
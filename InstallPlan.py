@@ -0,0 +1,305 @@
+import json
+import shutil
+import statistics
+import tarfile
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any, Iterable, Optional
+
+import logging
+
+from ConfigValues import plain_value
+from StepScheduler import Step, StepScheduler
+
+logger = logging.getLogger(__name__)
+
+SYNC_DIR = Path('/var/lib/pacman/sync')
+
+# pacstrap keeps the downloaded packages in the target's cache, so the root
+# filesystem needs room for both, plus headroom for logs, pacman's database,
+# initramfs images and the first updates.
+SIZE_MARGIN = 1.15
+MIN_FREE = 2 * 1024 ** 3  # Bytes
+
+
+class PlanError(Exception):
+    """Raised when a configuration cannot be installed on its target."""
+
+
+@dataclass(frozen=True)
+class SyncPackage:
+    name: str
+    download_size: int
+    installed_size: int
+    depends: tuple[str, ...]
+
+
+@dataclass
+class SyncDatabase:
+    packages: dict[str, SyncPackage] = field(default_factory=dict)
+    providers: dict[str, str] = field(default_factory=dict)  # Provided name -> package
+    groups: dict[str, list[str]] = field(default_factory=dict)
+
+    def lookup(self, name: str) -> Optional[SyncPackage]:
+        name = _strip_version(name)
+        if name in self.packages:
+            return self.packages[name]
+        if name in self.providers:
+            return self.packages[self.providers[name]]
+        return None
+
+
+def _strip_version(dependency: str) -> str:
+    for operator in ('>=', '<=', '=', '<', '>'):
+        dependency = dependency.split(operator, 1)[0]
+    return dependency.strip()
+
+
+def _parse_desc(text: str) -> dict[str, list[str]]:
+    """Parse a sync database `desc` entry: %KEY% headers followed by value lines."""
+    fields: dict[str, list[str]] = {}
+    key = None
+    for line in text.splitlines():
+        if line.startswith('%') and line.endswith('%'):
+            key = line.strip('%')
+            fields[key] = []
+        elif line and key is not None:
+            fields[key].append(line)
+    return fields
+
+
+def read_sync_databases(sync_dir: Path = SYNC_DIR) -> SyncDatabase:
+    """
+    Read every repository database in `sync_dir`. Repositories listed first in
+    pacman.conf win on duplicates, which for the official ones is alphabetical
+    enough (core before extra before multilib) to not matter for size estimates.
+    """
+    database = SyncDatabase()
+
+    for db_path in sorted(sync_dir.glob('*.db')):
+        try:
+            with tarfile.open(db_path, 'r:*') as archive:
+                for member in archive:
+                    if not member.name.endswith('/desc'):
+                        continue
+                    fields = _parse_desc(archive.extractfile(member).read().decode('utf-8', 'replace'))
+                    name = fields.get('NAME', [''])[0]
+                    if not name or name in database.packages:
+                        continue
+
+                    database.packages[name] = SyncPackage(
+                        name=name,
+                        download_size=int(fields.get('CSIZE', ['0'])[0]),
+                        installed_size=int(fields.get('ISIZE', ['0'])[0]),
+                        depends=tuple(fields.get('DEPENDS', [])),
+                    )
+                    for provided in fields.get('PROVIDES', []):
+                        database.providers.setdefault(_strip_version(provided), name)
+                    for group in fields.get('GROUPS', []):
+                        database.groups.setdefault(group, []).append(name)
+        except (OSError, tarfile.TarError) as e:
+            # zstd-compressed databases need a tarfile with zstd support
+            logger.warning(f"Could not read sync database {db_path}: {e}")
+
+    return database
+
+
+def resolve(packages: Iterable[str], database: SyncDatabase) -> tuple[list[SyncPackage], list[str]]:
+    """
+    The packages with their full dependency closure, and the names that no
+    package in the sync databases provides. Groups expand to their members.
+    """
+    resolved: dict[str, SyncPackage] = {}
+    missing: list[str] = []
+    pending = list(packages)
+
+    while pending:
+        name = pending.pop()
+        if name in database.groups and name not in database.packages:
+            pending.extend(database.groups[name])
+            continue
+
+        package = database.lookup(name)
+        if package is None:
+            if name not in missing:
+                missing.append(name)
+            continue
+        if package.name in resolved:
+            continue
+
+        resolved[package.name] = package
+        pending.extend(package.depends)
+
+    return list(resolved.values()), missing
+
+
+def _trace_events(trace_paths: Iterable[Path]) -> list[dict[str, Any]]:
+    events = []
+    for path in trace_paths:
+        try:
+            events.extend(json.loads(path.read_text()).get('traceEvents', []))
+        except (OSError, ValueError) as e:
+            logger.debug(f"Skipping timing history {path}: {e}")
+    return [event for event in events if event.get('ph') == 'X']
+
+
+def load_step_timings(trace_paths: Iterable[Path]) -> dict[str, float]:
+    """Median duration in seconds of each step across earlier installation traces."""
+    durations: dict[str, list[float]] = {}
+    for event in _trace_events(trace_paths):
+        if event.get('cat') == 'step':
+            durations.setdefault(event['name'], []).append(event['dur'] / 1e6)
+    return {name: statistics.median(values) for name, values in durations.items()}
+
+
+def estimate_duration(steps: list[Step], timings: dict[str, float]) -> float:
+    """
+    Expected wall time of `steps`, given in topological order, when run by
+    StepScheduler: each step starts once its requirements have finished and
+    the exclusive resources it needs are free again.
+    """
+    finish: dict[str, float] = {}
+    free_at: dict[str, float] = {}
+    for step in steps:
+        start = max([0.0, *(finish[name] for name in step.requires), *(free_at.get(r, 0.0) for r in step.resources)])
+        finish[step.name] = start + timings.get(step.name, 0.0)
+        for resource in step.resources:
+            free_at[resource] = finish[step.name]
+
+    return max(finish.values(), default=0.0)
+
+
+def _size_bytes(size: Any) -> Optional[int]:
+    """Bytes of an archinstall Size, or None when it cannot be converted."""
+    if size is None:
+        return None
+    if isinstance(size, (int, float)):
+        return int(size)
+    try:
+        from archinstall.lib.disk import Unit
+        return int(size.convert(Unit.B).value)
+    except (ImportError, AttributeError, TypeError, ValueError):
+        return None
+
+
+def describe_partitions(disk_config: Any) -> list[dict[str, Any]]:
+    """The partitions of an archinstall disk layout configuration, as plain data."""
+    partitions = []
+    for modification in getattr(disk_config, 'device_modifications', None) or []:
+        device = getattr(getattr(modification.device, 'device_info', None), 'path', modification.device)
+        for partition in modification.partitions:
+            subvolumes = [str(subvolume.mountpoint) for subvolume in getattr(partition, 'btrfs_subvols', None) or []
+                          if getattr(subvolume, 'mountpoint', None)]
+            partitions.append({
+                'device': str(device),
+                'wipe': bool(getattr(modification, 'wipe', False)),
+                'status': str(plain_value(getattr(partition, 'status', ''))),
+                'type': str(plain_value(getattr(partition, 'type', ''))),
+                'fs_type': str(plain_value(partition.fs_type)) if getattr(partition, 'fs_type', None) else None,
+                'mountpoint': str(partition.mountpoint) if getattr(partition, 'mountpoint', None) else None,
+                'subvolumes': subvolumes,
+                'mount_options': list(getattr(partition, 'mount_options', None) or []),
+                'size_bytes': _size_bytes(getattr(partition, 'length', None)),
+                'flags': [str(plain_value(flag)) for flag in getattr(partition, 'flags', None) or []],
+            })
+    return partitions
+
+
+@dataclass
+class InstallPlan:
+    """The ordered, fully expanded installation a configuration describes."""
+    partitions: list[dict[str, Any]]
+    packages: list[str]  # Requested explicitly, in installation order
+    dependencies: list[str]  # Pulled in by the requested packages
+    missing_packages: list[str]  # Not found in the sync databases
+    services: list[str]
+    users: list[str]
+    custom_commands: list[str]
+    steps: list[dict[str, Any]]
+    download_bytes: Optional[int]
+    installed_bytes: Optional[int]
+    estimated_seconds: Optional[float]
+    root_bytes: Optional[int]  # Space available for the root filesystem
+
+    @property
+    def required_bytes(self) -> Optional[int]:
+        if self.download_bytes is None or self.installed_bytes is None:
+            return None
+        return int((self.download_bytes + self.installed_bytes) * SIZE_MARGIN) + MIN_FREE
+
+    def check_fits(self) -> None:
+        """Raise PlanError when the root filesystem is known to be too small."""
+        if self.required_bytes is None or self.root_bytes is None:
+            return
+        if self.required_bytes > self.root_bytes:
+            raise PlanError(
+                f"The installation needs about {self.required_bytes / 1024 ** 3:.1f} GiB "
+                f"but the root filesystem only has {self.root_bytes / 1024 ** 3:.1f} GiB"
+            )
+
+    def to_json(self) -> str:
+        return json.dumps({**asdict(self), 'required_bytes': self.required_bytes}, indent=2)
+
+
+def _root_bytes(partitions: list[dict[str, Any]], mountpoint: Optional[Path]) -> Optional[int]:
+    for partition in partitions:
+        if partition['mountpoint'] == '/' or '/' in partition['subvolumes']:
+            return partition['size_bytes']
+
+    # Pre-mounted layouts are not described, but the filesystem is already there
+    if mountpoint is not None and mountpoint.is_mount():
+        return shutil.disk_usage(mountpoint).free
+    return None
+
+
+def compile_plan(steps: list[Step], packages: list[str], partitions: list[dict[str, Any]],
+                 services: list[str], users: list[str], custom_commands: list[str],
+                 mountpoint: Optional[Path] = None, sync_dir: Path = SYNC_DIR,
+                 trace_paths: Iterable[Path] = ()) -> InstallPlan:
+    """
+    Turn the declared installation steps and their inputs into an InstallPlan.
+    Sizes come from the local sync databases (run `pacman -Sy` first on a fresh
+    live system) and durations from the traces of earlier installations.
+    """
+    database = read_sync_databases(sync_dir)
+    if database.packages:
+        resolved, missing = resolve(packages, database)
+        download_bytes: Optional[int] = sum(package.download_size for package in resolved)
+        installed_bytes: Optional[int] = sum(package.installed_size for package in resolved)
+        requested = {database.lookup(name).name for name in packages if database.lookup(name)}
+        dependencies = sorted(package.name for package in resolved if package.name not in requested)
+    else:
+        logger.warning(f"No sync databases in {sync_dir}, package sizes are unknown")
+        missing, dependencies, download_bytes, installed_bytes = [], [], None, None
+
+    scheduler = StepScheduler()
+    for step in steps:
+        scheduler.add(step)
+    by_name = {step.name: step for step in steps}
+    ordered = [by_name[name] for name in scheduler.order()]
+
+    timings = load_step_timings(trace_paths)
+    planned_steps = [
+        {
+            'name': step.name,
+            'requires': list(step.requires),
+            'resources': sorted(step.resources),
+            'estimated_seconds': timings.get(step.name),
+        }
+        for step in ordered
+    ]
+
+    return InstallPlan(
+        partitions=partitions,
+        packages=packages,
+        dependencies=dependencies,
+        missing_packages=missing,
+        services=services,
+        users=users,
+        custom_commands=custom_commands,
+        steps=planned_steps,
+        download_bytes=download_bytes,
+        installed_bytes=installed_bytes,
+        estimated_seconds=round(estimate_duration(ordered, timings), 1) if timings else None,
+        root_bytes=_root_bytes(partitions, mountpoint),
+    )
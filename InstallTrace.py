@@ -0,0 +1,140 @@
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Iterator, Optional
+
+# Traces of earlier installations on this host, kept across runs next to the
+# mirror ranking cache; InstallPlan estimates step durations from them
+TRACE_HISTORY = Path('/var/cache/maiarch/traces')
+TRACE_HISTORY_RUNS = 20  # Traces kept, the oldest are removed
+
+
+@dataclass
+class Span:
+    """A timed piece of work. All durations are in seconds."""
+    name: str
+    category: str
+    start: float  # perf_counter() at the start
+    wall: float
+    cpu: float  # CPU time of the thread that ran the span
+    children: float  # CPU time of child processes that finished during the span
+    thread_id: int
+    thread_name: str
+    args: dict[str, Any] = field(default_factory=dict)
+
+
+def _children_time() -> float:
+    times = os.times()
+    return times.children_user + times.children_system
+
+
+class Tracer:
+    """
+    Records timing spans and exports them as a Chrome trace (also readable
+    by Perfetto) plus a plain-text summary table.
+
+    Child-process time is process-wide: when spans run concurrently, each
+    one is charged for every child that exited while it was running.
+    """
+
+    def __init__(self):
+        self.spans: list[Span] = []
+        self._lock = threading.Lock()
+        self._origin = time.perf_counter()
+
+    @contextmanager
+    def span(self, name: str, category: str = 'step', **args: Any) -> Iterator[None]:
+        start = time.perf_counter()
+        cpu_start = time.thread_time()
+        children_start = _children_time()
+        try:
+            yield
+        finally:
+            thread = threading.current_thread()
+            span = Span(
+                name=name,
+                category=category,
+                start=start,
+                wall=time.perf_counter() - start,
+                cpu=time.thread_time() - cpu_start,
+                children=_children_time() - children_start,
+                thread_id=thread.ident or 0,
+                thread_name=thread.name,
+                args=args,
+            )
+            with self._lock:
+                self.spans.append(span)
+
+    def chrome_trace(self) -> dict[str, Any]:
+        pid = os.getpid()
+        events: list[dict[str, Any]] = []
+        threads: dict[int, str] = {}
+
+        for span in sorted(self.spans, key=lambda s: s.start):
+            threads[span.thread_id] = span.thread_name
+            events.append({
+                'name': span.name,
+                'cat': span.category,
+                'ph': 'X',
+                'ts': round((span.start - self._origin) * 1e6),
+                'dur': round(span.wall * 1e6),
+                'pid': pid,
+                'tid': span.thread_id,
+                'args': {
+                    'cpu_ms': round(span.cpu * 1e3, 3),
+                    'children_ms': round(span.children * 1e3, 3),
+                    **span.args,
+                },
+            })
+
+        for thread_id, thread_name in threads.items():
+            events.append({
+                'name': 'thread_name',
+                'ph': 'M',
+                'pid': pid,
+                'tid': thread_id,
+                'args': {'name': thread_name},
+            })
+
+        return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+    def write_chrome_trace(self, path: Path) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(self.chrome_trace(), default=str))
+
+    def summary(self) -> str:
+        header = f"{'Span':<40} {'Wall (s)':>10} {'CPU (s)':>10} {'Children (s)':>13}"
+        lines = [header, '-' * len(header)]
+        for span in sorted(self.spans, key=lambda s: s.start):
+            lines.append(f"{span.name:<40} {span.wall:>10.2f} {span.cpu:>10.2f} {span.children:>13.2f}")
+        return '\n'.join(lines)
+
+
+def maybe_span(tracer: Optional[Tracer], name: str, category: str = 'step', **args: Any):
+    """A tracer span, or a no-op context when tracing is off."""
+    if tracer is None:
+        return nullcontext()
+    return tracer.span(name, category, **args)
+
+
+def keep_trace(trace_path: Path, history: Optional[Path] = None, runs: int = TRACE_HISTORY_RUNS) -> Path:
+    """Copy a trace into the history under a timestamped name, keeping the newest `runs` traces."""
+    history = history or TRACE_HISTORY
+    history.mkdir(parents=True, exist_ok=True)
+    stamp = datetime.now().strftime('%Y%m%dT%H%M%S.%f')
+    kept = history / f"{trace_path.stem}-{stamp}-{os.getpid()}{trace_path.suffix}"
+    kept.write_bytes(trace_path.read_bytes())
+    for old in trace_history(history)[runs:]:
+        old.unlink(missing_ok=True)
+    return kept
+
+
+def trace_history(history: Optional[Path] = None) -> list[Path]:
+    """The traces in the history, newest first."""
+    history = history or TRACE_HISTORY
+    return sorted(history.glob('*.json'), reverse=True) if history.is_dir() else []
@@ -1,26 +1,52 @@
+from __future__ import annotations
+
+import importlib
+import json
+import subprocess
+import sys
+from contextlib import ExitStack
 from pathlib import Path
+from types import ModuleType
 from typing import Any, TYPE_CHECKING, Optional
-import subprocess
-import archinstall
-from archinstall import info, debug
-from archinstall import SysInfo
-from archinstall.lib import locale, disk
-from archinstall.lib.global_menu import GlobalMenu
-from archinstall.lib.configuration import ConfigurationOutput
-from archinstall.lib.installer import Installer
-from archinstall.lib.models import AudioConfiguration, Bootloader
-from archinstall.lib.models.network_configuration import NetworkConfiguration
-from archinstall.lib.profile.profiles_handler import profile_handler
 import logging
 
+from InstallJournal import InstallJournal
+from InstallTrace import Tracer, keep_trace, trace_history
+from PackageAccumulator import PackageAccumulator
+from PacmanTuning import BASE_PACKAGES, PACMAN_CONF, choose_parallel_downloads, set_parallel_downloads
+from StepScheduler import Step, StepError, StepScheduler
+
 if TYPE_CHECKING:
+    from archinstall.lib.disk import FilesystemHandler
+    from archinstall.lib.installer import Installer
+    from archinstall.lib.locale import LocaleConfiguration
+    from archinstall.lib.models import AudioConfiguration
+    from archinstall.lib.models.network_configuration import NetworkConfiguration
+    from InstallPlan import InstallPlan
+    from MirrorRanking import MirrorResult
     _: Any
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
+
+class LazyModule:
+    """
+    Stands in for a module and imports it on first attribute access.
+    Importing archinstall parses the arguments and probes the hardware, which
+    is slow on a live ISO booting from USB, so it only happens once needed.
+    """
+
+    def __init__(self, name: str):
+        self._name = name
+        self._module: Optional[ModuleType] = None
+
+    def __getattr__(self, attr: str) -> Any:
+        if self._module is None:
+            self._module = importlib.import_module(self._name)
+        return getattr(self._module, attr)
+
+
+archinstall = LazyModule('archinstall')
 
 # Constants for argument keys
-ARG_HELP = 'help'
 ARG_SILENT = 'silent'
 ARG_ADVANCED = 'advanced'
 ARG_DRY_RUN = 'dry_run'
@@ -42,16 +68,97 @@ ARG_CUSTOM_COMMANDS = 'custom-commands'
 ARG_ENCRYPTION = 'disk_encryption'
 ARG_SWAP = 'swap'
 ARG_UKI = 'uki'
+ARG_MAX_PARALLEL_STEPS = 'max_parallel_steps'
+ARG_RESUME = 'resume'
+ARG_SKIP_MIRROR_RANKING = 'skip_mirror_ranking'
+ARG_MIRROR_CACHE_TTL = 'mirror_cache_ttl'
+ARG_SKIP_POST_INSTALL = 'skip_post_install'
+ARG_PACKAGE_CACHE = 'package_cache'  # Package cache shared between installs, see Fleet.py
+ARG_GOLDEN_IMAGE = 'golden_image'  # Build, or restore, an image of the configuration, see GoldenImage.py
+ARG_IMAGE_DIR = 'image_dir'
+ARG_SKIP_LAYOUT_OPTIMIZER = 'skip_layout_optimizer'
+ARG_EAGER_FORMAT = 'eager_format'  # Initialize ext inode tables and journals while formatting, see FormatEngine.py
+ARG_RECONFIGURE = 'reconfigure'  # Apply configuration changes to an installed system, see Reconfigure.py
+ARG_PARALLEL_DOWNLOADS = 'parallel downloads'  # Only set when picked in the advanced menu
+
+# Chrome trace of the installation, saved next to the configuration
+TRACE_FILE = 'install_trace.json'
+
+tracer = Tracer()
+
+# What archinstall's minimal installation pacstraps besides the kernels
+MINIMAL_PACKAGES = ['base', 'sudo', 'linux-firmware']
+
+# Steps that only change the live environment, they are redone when resuming
+LIVE_STEPS = {'mirrors', 'package_cache'}
+
+# Steps whose result only depends on the configuration, not on the host.
+# A golden image captures the target right after them.
+IMAGE_STEPS = {
+    'minimal_installation', 'target_mirrors', 'pacman_conf', 'swap', 'packages',
+    'network', 'profile', 'timezone', 'ntp', 'accessibility',
+}
+# The configuration values the image steps read, they key the golden image
+IMAGE_CONFIG_KEYS = [
+    'additional-repositories', 'audio_config', 'bootloader', 'kernels', 'locale_config', 'mirror_config',
+    'network_config', 'ntp', ARG_PACKAGES, ARG_PARALLEL_DOWNLOADS, 'profile_config', 'swap', 'timezone', 'uki',
+]
+RESTORE_STEP = 'restore_image'  # Journaled when the target was restored from a golden image
+
+# Arguments about how the installer runs rather than about the installed system,
+# they may differ between the installation and a later --reconfigure
+RUNTIME_ARGS = {
+    'config_version', 'debug', 'mount_point', 'offline', 'script', 'skip_ntp', 'skip_wkd', 'verbose', 'version',
+    ARG_SILENT, ARG_ADVANCED, ARG_DRY_RUN, ARG_MAX_PARALLEL_STEPS, ARG_RESUME, ARG_SKIP_MIRROR_RANKING,
+    ARG_MIRROR_CACHE_TTL, ARG_SKIP_POST_INSTALL, ARG_PACKAGE_CACHE, ARG_GOLDEN_IMAGE, ARG_IMAGE_DIR,
+    ARG_SKIP_LAYOUT_OPTIMIZER, ARG_EAGER_FORMAT, ARG_RECONFIGURE,
+}
+
+
+# The options MaiArch adds. archinstall keeps options it doesn't know under their
+# command line spelling, e.g. 'max-parallel-steps', see normalize_arguments()
+MAIARCH_ARGS = {
+    ARG_MAX_PARALLEL_STEPS, ARG_RESUME, ARG_SKIP_MIRROR_RANKING, ARG_MIRROR_CACHE_TTL, ARG_SKIP_POST_INSTALL,
+    ARG_PACKAGE_CACHE, ARG_GOLDEN_IMAGE, ARG_IMAGE_DIR, ARG_SKIP_LAYOUT_OPTIMIZER, ARG_EAGER_FORMAT, ARG_RECONFIGURE,
+}
+
+
+HELP_TEXT = """usage: Installer.py [--silent] [--advanced] [--dry-run] [--config FILE] [--resume]
+                    [--max-parallel-steps N] [--skip-mirror-ranking] [--mirror-cache-ttl SECONDS]
+                    [--skip-post-install] [--skip-layout-optimizer] [--eager-format] [--reconfigure]
+
+--skip-mirror-ranking keeps the live system's mirrorlist as it is, the target still
+gets the mirrors of the configuration.
+
+--reconfigure applies the changes from the configuration the target at --mount-point
+was installed with: packages, services, hostname, timezone, locale and ntp.
+
+See `man archinstall` for help on the other options."""
 
 
 def exit_if_help_requested() -> None:
-    if archinstall.arguments.get(ARG_HELP):
-        print("See `man archinstall` for help.")
+    # Read from sys.argv, so the help is printed without importing archinstall
+    if {'-h', '--help'} & set(sys.argv[1:]):
+        print(HELP_TEXT)
         exit(0)
 
 
+def normalize_arguments(arguments: dict[str, Any]) -> None:
+    """
+    Store MaiArch's options given on the command line (--max-parallel-steps) under
+    the keys the installer reads (max_parallel_steps), like configuration files and
+    Fleet write them. A value already under the underscore key wins.
+    """
+    for key in MAIARCH_ARGS:
+        dashed = key.replace('_', '-')
+        if dashed != key and dashed in arguments:
+            arguments.setdefault(key, arguments.pop(dashed))
+
+
 def ask_user_questions() -> None:
     """First, we'll ask the user for a bunch of user input."""
+    from archinstall.lib.global_menu import GlobalMenu
+
     global_menu = GlobalMenu(data_store=archinstall.arguments)
     
     # Enable menu options
@@ -90,129 +197,561 @@ def ask_user_questions() -> None:
     global_menu.run()
 
 
-def perform_installation(mountpoint: Path) -> None:
-    """Performs the installation steps on a block device."""
-    info('Starting installation...')
-    
-    disk_config: disk.DiskLayoutConfiguration = archinstall.arguments[ARG_DISK_CONFIG]
-    locale_config: locale.LocaleConfiguration = archinstall.arguments[ARG_LOCALE_CONFIG]
-    disk_encryption: disk.DiskEncryption = archinstall.arguments.get(ARG_ENCRYPTION, None)
+def optimize_disk_layout() -> None:
+    """Align the partitions and pick mount options for the target devices, see LayoutOptimizer.py."""
+    disk_config = archinstall.arguments.get(ARG_DISK_CONFIG, None)
+    if disk_config is None or archinstall.arguments.get(ARG_SKIP_LAYOUT_OPTIMIZER, False):
+        return
+
+    from LayoutOptimizer import optimize_layout
+
+    services = list(archinstall.arguments.get(ARG_SERVICES, None) or [])
+    for service in optimize_layout(disk_config):
+        if service not in services:
+            services.append(service)
+    archinstall.arguments[ARG_SERVICES] = services
+
+
+def filesystem_operations(fs_handler: FilesystemHandler) -> None:
+    """
+    Partitions and formats the target devices. Plain layouts are formatted
+    concurrently by FormatEngine, the others (encryption, LVM, btrfs subvolumes)
+    by archinstall. --eager-format applies to both, except when the layout
+    optimizer is skipped for archinstall's formatting.
+    """
+    from contextlib import nullcontext
+    from FormatEngine import FormatError, format_layout, supports_layout
+    from LayoutOptimizer import archinstall_mkfs_options
+
+    disk_config = archinstall.arguments[ARG_DISK_CONFIG]
+    optimize = not archinstall.arguments.get(ARG_SKIP_LAYOUT_OPTIMIZER, False)
+    eager = archinstall.arguments.get(ARG_EAGER_FORMAT, False)
+
+    if not supports_layout(disk_config, archinstall.arguments.get(ARG_ENCRYPTION, None)):
+        with archinstall_mkfs_options(eager) if optimize else nullcontext():
+            fs_handler.perform_filesystem_operations()
+        return
+
+    try:
+        format_layout(disk_config, lazy=not eager, optimize=optimize, fs_handler=fs_handler)
+    except FormatError as e:
+        archinstall.warn(str(e))
+        exit(1)
+
+
+# Exclusive resources shared between steps
+RES_PACMAN = 'pacman'  # pacman database lock and transaction hooks
+
+
+def add_requested_packages(accumulator: PackageAccumulator) -> None:
+    """Adds the extra packages the configuration asks for, beyond the minimal installation."""
+    from archinstall.lib.models import Bootloader
+    from HardwareInventory import inventory
+
+    profile_config = archinstall.arguments.get(ARG_PROFILE_CONFIG, None)
+    network_config: Optional[NetworkConfiguration] = archinstall.arguments.get(ARG_NETWORK_CONFIG, None)
+    audio_config: Optional[AudioConfiguration] = archinstall.arguments.get(ARG_AUDIO_CONFIG, None)
+
+    if archinstall.arguments.get(ARG_BOOTLOADER) == Bootloader.Grub and inventory().uefi:
+        accumulator.add("grub")
+    if network_config:
+        accumulator.add_network(network_config, profile_config)
+    if audio_config:
+        accumulator.add_audio(audio_config)
+    if profile_config:
+        accumulator.add_profile(profile_config)
+    accumulator.add(archinstall.arguments.get(ARG_PACKAGES, None))
+
+
+def installation_steps(installation: Optional[Installer], completed: frozenset[str] = frozenset()) -> list[Step]:
+    """
+    Declares every installation step together with the steps it depends on.
+    `completed` holds the steps a previous, resumed run already finished.
+    Without an `installation` the steps can only be inspected, not run, so the
+    modules only their actions need are imported when the actions run.
+    """
+    locale_config: LocaleConfiguration = archinstall.arguments[ARG_LOCALE_CONFIG]
+    mirror_config = archinstall.arguments.get(ARG_MIRROR_CONFIG, None)
+    profile_config = archinstall.arguments.get(ARG_PROFILE_CONFIG, None)
+    network_config: Optional[NetworkConfiguration] = archinstall.arguments.get(ARG_NETWORK_CONFIG, None)
+    audio_config: Optional[AudioConfiguration] = archinstall.arguments.get(ARG_AUDIO_CONFIG, None)
+
+    # Steps that install extra packages go through this wrapper, which skips
+    # everything the consolidated `packages` transaction already installed.
+    accumulator = PackageAccumulator(tracer)
+    accumulated = accumulator.wrap(installation)
+
+    add_requested_packages(accumulator)
+
+    if 'packages' in completed:
+        accumulator.mark_installed(accumulator.packages)
 
     enable_testing = 'testing' in archinstall.arguments.get('additional-repositories', [])
     enable_multilib = 'multilib' in archinstall.arguments.get('additional-repositories', [])
     run_mkinitcpio = not archinstall.arguments.get(ARG_UKI)
 
+    # Filled by the mirrors step, fastest first
+    ranked_mirrors: list[MirrorResult] = []
+
+    def parallel_downloads(queued_packages: int) -> int:
+        if chosen := int(archinstall.arguments.get(ARG_PARALLEL_DOWNLOADS, 0)):
+            return chosen
+        throughput = ranked_mirrors[0].throughput if ranked_mirrors else None
+        return choose_parallel_downloads(queued_packages, throughput)
+
+    def tune_downloads(queued_packages: int) -> None:
+        # pacstrap runs with the live pacman.conf, so that is the one each phase tunes
+        if not archinstall.arguments.get(ARG_PARALLEL_DOWNLOADS):
+            set_parallel_downloads(parallel_downloads(queued_packages), PACMAN_CONF)
+
+    def mirrors() -> None:
+        from MirrorRanking import DEFAULT_CACHE_TTL, candidate_urls, custom_urls, rank_mirrors, write_mirrorlist
+
+        # The live mirrorlist is kept as it is, e.g. Fleet has set it up for all its workers
+        if archinstall.arguments.get(ARG_SKIP_MIRROR_RANKING, False):
+            return
+
+        if mirror_config:
+            installation.set_mirrors(mirror_config, on_target=False)
+
+        ranked_mirrors[:] = rank_mirrors(
+            candidate_urls(mirror_config),
+            cache_ttl=float(archinstall.arguments.get(ARG_MIRROR_CACHE_TTL, DEFAULT_CACHE_TTL)),
+            keep=custom_urls(mirror_config)
+        )
+        if ranked_mirrors:
+            archinstall.info(f"Using {len(ranked_mirrors)} ranked mirrors, fastest: {ranked_mirrors[0].url}")
+            write_mirrorlist(ranked_mirrors)
+        else:
+            archinstall.warn("No mirror passed the ranking, keeping the current mirrorlist")
+
+    def package_cache() -> None:
+        if cache := archinstall.arguments.get(ARG_PACKAGE_CACHE, None):
+            target_cache = installation.target / 'var/cache/pacman/pkg'
+            target_cache.mkdir(parents=True, exist_ok=True)
+            subprocess.run(['mount', '--bind', str(cache), str(target_cache)], check=True)
+
+    def minimal_installation() -> None:
+        tune_downloads(BASE_PACKAGES)
+        installation.minimal_installation(
+            testing=enable_testing,
+            multilib=enable_multilib,
+            mkinitcpio=run_mkinitcpio,
+            hostname=archinstall.arguments.get('hostname', 'archlinux'),
+            locale_config=locale_config
+        )
+
+    def target_mirrors() -> None:
+        from MirrorRanking import write_mirrorlist
+
+        if mirror_config:
+            installation.set_mirrors(mirror_config, on_target=True)
+        if ranked_mirrors:
+            write_mirrorlist(ranked_mirrors, installation.target / 'etc/pacman.d/mirrorlist')
+
+    def pacman_conf() -> None:
+        target_conf = installation.target / PACMAN_CONF.relative_to('/')
+        if target_conf.exists():
+            set_parallel_downloads(parallel_downloads(BASE_PACKAGES), target_conf)
+
+    def swap() -> None:
+        if archinstall.arguments.get(ARG_SWAP):
+            installation.setup_swap('zram')
+
+    def packages() -> None:
+        tune_downloads(len(accumulator.packages))
+        accumulator.install(installation)
+
+    def bootloader() -> None:
+        installation.add_bootloader(
+            archinstall.arguments[ARG_BOOTLOADER],
+            archinstall.arguments.get(ARG_UKI, False)
+        )
+
+    def network() -> None:
+        if network_config:
+            network_config.install_network_config(accumulated, profile_config)
+
+    def users() -> None:
+        if users := archinstall.arguments.get(ARG_USERS, None):
+            installation.create_users(users)
+
+    def audio() -> None:
+        if audio_config:
+            audio_config.install_audio_config(accumulated)
+        else:
+            archinstall.info("No audio server will be installed")
+
+    def profile() -> None:
+        from archinstall.lib.profile.profiles_handler import profile_handler
+
+        if profile_config:
+            profile_handler.install_profile_config(accumulated, profile_config)
+
+    def timezone() -> None:
+        if timezone := archinstall.arguments.get(ARG_TIMEZONE, None):
+            installation.set_timezone(timezone)
+
+    def ntp() -> None:
+        if archinstall.arguments.get(ARG_NTP, False):
+            installation.activate_time_synchronization()
+
+    def accessibility() -> None:
+        from HardwareInventory import inventory
+
+        if inventory().accessibility:
+            installation.enable_espeakup()
+
+    def root_password() -> None:
+        if root_pw := archinstall.arguments.get(ARG_ROOT_PASSWORD, None):
+            installation.user_set_pw('root', root_pw)
+
+    def post_install() -> None:
+        if profile_config:
+            profile_config.profile.post_install(accumulated)
+
+    def services() -> None:
+        if services := archinstall.arguments.get(ARG_SERVICES, None):
+            installation.enable_service(services)
+
+    def custom_commands() -> None:
+        if custom_commands := archinstall.arguments.get(ARG_CUSTOM_COMMANDS, None):
+            archinstall.run_custom_user_commands(custom_commands, installation)
+
+    def host_identity() -> None:
+        from GoldenImage import reset_host_identity
+
+        reset_host_identity(installation.target, archinstall.arguments.get('hostname', 'archlinux'))
+
+    def initramfs() -> None:
+        from GoldenImage import regenerate_initramfs
+
+        regenerate_initramfs(installation.target)
+
+    def genfstab() -> None:
+        # The shared package cache must not end up in the target's fstab
+        if archinstall.arguments.get(ARG_PACKAGE_CACHE, None):
+            subprocess.run(['umount', str(installation.target / 'var/cache/pacman/pkg')], check=True)
+        installation.genfstab()
+
+    base = ('minimal_installation',)
+    pacman = frozenset({RES_PACMAN})
+
+    # A target restored from a golden image already holds the image steps'
+    # results, but still needs its own identity and an initramfs for its hardware.
+    restored = RESTORE_STEP in completed
+    host_steps = [
+        Step('host_identity', host_identity, base, pacman),
+        Step('initramfs', initramfs, ('host_identity',), pacman),
+    ] if restored else []
+
+    steps = [
+        *host_steps,
+        Step('mirrors', mirrors),
+        Step('package_cache', package_cache),
+        Step('minimal_installation', minimal_installation, ('mirrors', 'package_cache'), pacman),
+        Step('target_mirrors', target_mirrors, base),
+        Step('pacman_conf', pacman_conf, base),
+        Step('swap', swap, base, pacman),
+        Step('packages', packages, base, pacman),
+        Step('bootloader', bootloader, ('packages', *(step.name for step in host_steps)), pacman),
+        Step('network', network, ('packages',), pacman),
+        Step('users', users, base),
+        # Pipewire enables per-user services, so the users have to exist first
+        Step('audio', audio, ('packages', 'users'), pacman),
+        Step('profile', profile, ('packages',), pacman),
+        Step('timezone', timezone, base),
+        Step('ntp', ntp, base),
+        Step('accessibility', accessibility, base, pacman),
+        Step('root_password', root_password, base),
+        Step('post_install', post_install, ('profile', 'users')),
+        Step('services', services, ('packages', 'profile', 'network', 'audio', 'post_install')),
+    ]
+    # Custom commands may rely on anything installed before them, and genfstab
+    # appends to the fstab, so both keep their original position at the end.
+    steps.append(Step('custom_commands', custom_commands, tuple(step.name for step in steps)))
+    steps.append(Step('genfstab', genfstab, ('custom_commands',)))
+    return steps
+
+
+def save_timings() -> None:
+    """
+    Writes the recorded timing spans as a Chrome trace, keeps a copy in the
+    timing history for planning later installations and logs a summary table.
+    """
+    trace_path = Path(archinstall.storage.get('LOG_PATH', '.')) / TRACE_FILE
+    tracer.write_chrome_trace(trace_path)
+    try:
+        keep_trace(trace_path)
+    except OSError as e:
+        archinstall.warn(f"Could not keep the timing trace for later estimates: {e}")
+    archinstall.info(f"Installation timings:\n{tracer.summary()}")
+    archinstall.info(f"Timing trace saved to {trace_path} (open it in chrome://tracing or ui.perfetto.dev)")
+
+
+def install_plan(mountpoint: Path) -> InstallPlan:
+    """Compiles the configuration into an explicit plan with size and duration estimates."""
+    from HardwareInventory import inventory
+    from InstallPlan import compile_plan, describe_partitions
+
+    accumulator = PackageAccumulator()
+    add_requested_packages(accumulator)
+    kernels = archinstall.arguments.get(ARG_KERNE, ['linux'])
+    # archinstall's minimal installation adds the CPU's microcode as well
+    microcode = [inventory().microcode] if inventory().microcode else []
+    packages = list(dict.fromkeys([*MINIMAL_PACKAGES, *microcode, *kernels, *accumulator.packages]))
+
+    return compile_plan(
+        installation_steps(None),
+        packages,
+        describe_partitions(archinstall.arguments.get(ARG_DISK_CONFIG, None)),
+        services=list(archinstall.arguments.get(ARG_SERVICES, None) or []),
+        users=[getattr(user, 'username', str(user)) for user in archinstall.arguments.get(ARG_USERS, None) or []],
+        custom_commands=list(archinstall.arguments.get(ARG_CUSTOM_COMMANDS, None) or []),
+        mountpoint=mountpoint,
+        trace_paths=trace_history(),
+    )
+
+
+def golden_image() -> Optional[Path]:
+    """The golden image of this configuration when the mode is enabled, whether it exists yet or not."""
+    if not archinstall.arguments.get(ARG_GOLDEN_IMAGE, False):
+        return None
+
+    from archinstall.lib.configuration import ConfigurationOutput
+    from GoldenImage import IMAGE_DIR, config_hash, image_path
+    from HardwareInventory import inventory
+    from InstallPlan import describe_partitions
+
+    user_config = json.loads(ConfigurationOutput(archinstall.arguments).user_config_to_json())
+    inputs = {key: user_config.get(key) for key in IMAGE_CONFIG_KEYS}
+    # The filesystems and the encryption decide the filesystem tools and initramfs hooks
+    partitions = describe_partitions(archinstall.arguments.get(ARG_DISK_CONFIG, None))
+    inputs['filesystems'] = sorted({partition['fs_type'] for partition in partitions if partition['fs_type']})
+    inputs['encryption'] = str(getattr(archinstall.arguments.get(ARG_ENCRYPTION, None), 'encryption_type', None))
+    # The image steps install the CPU's microcode, and GRUB on UEFI systems
+    inputs['microcode'] = inventory().microcode
+    inputs['uefi'] = inventory().uefi
+
+    return image_path(Path(archinstall.arguments.get(ARG_IMAGE_DIR) or IMAGE_DIR), config_hash(inputs))
+
+
+def perform_installation(mountpoint: Path, resume: bool = False) -> None:
+    """
+    Performs the installation steps on a block device.
+    With `resume`, the steps the target's journal records as finished are skipped.
+
+    In golden image mode, an existing image of the configuration replaces the
+    image steps, otherwise the target is captured into one once they are done.
+    """
+    from archinstall.lib import disk
+    from archinstall.lib.installer import Installer
+
+    archinstall.info('Starting installation...')
+
+    disk_config: disk.DiskLayoutConfiguration = archinstall.arguments[ARG_DISK_CONFIG]
+    disk_encryption: disk.DiskEncryption = archinstall.arguments.get(ARG_ENCRYPTION, None)
+    image_lock = ExitStack()
+
     try:
         with Installer(mountpoint, disk_config, disk_encryption=disk_encryption,
                        kernels=archinstall.arguments.get(ARG_KERNE, ['linux'])) as installation:
             if disk_config.config_type != disk.DiskLayoutType.Pre_mount:
-                installation.mount_ordered_layout()
+                with tracer.span('mount_ordered_layout'):
+                    installation.mount_ordered_layout()
 
-            installation.sanity_check()
+            with tracer.span('sanity_check'):
+                installation.sanity_check()
 
             if disk_encryption and disk_encryption.encryption_type != disk.EncryptionType.NoEncryption:
                 installation.generate_key_files()
 
-            if mirror_config := archinstall.arguments.get(ARG_MIRROR_CONFIG, None):
-                installation.set_mirrors(mirror_config, on_target=False)
+            journal = InstallJournal(mountpoint)
+            if resume:
+                completed = frozenset(journal.completed() - LIVE_STEPS)
+                if failed := journal.failed_step():
+                    archinstall.info(f"Resuming installation after the failed step {failed}")
+                archinstall.info(f"Resuming installation, skipping finished steps: {', '.join(sorted(completed)) or 'none'}")
+            else:
+                completed = frozenset()
+                journal.reset()
+
+            image = golden_image()
+            if image is not None:
+                from GoldenImage import build_lock
+
+                # Held while this installation builds the image, others of the same configuration wait for it
+                image_lock.enter_context(build_lock(image))
+
+            # Building an image: run the image steps first and capture the target
+            # before any host-specific step changes it.
+            building = image is not None and not image.exists() and not completed - IMAGE_STEPS
+            if not building:
+                # Images are captured atomically, restoring an existing one needs no lock
+                image_lock.close()
+
+            if image is not None and image.exists() and not completed & IMAGE_STEPS:
+                from GoldenImage import restore
+
+                archinstall.info(f"Restoring the golden image {image}")
+                with tracer.span(RESTORE_STEP):
+                    restore(image, installation.target)
+                for name in [RESTORE_STEP, *sorted(IMAGE_STEPS)]:
+                    journal.record(name)
+                completed |= {RESTORE_STEP, *IMAGE_STEPS}
+
+            steps = installation_steps(installation, completed)
+            stages = [IMAGE_STEPS | LIVE_STEPS, None] if building else [None]
+
+            for stage in stages:
+                scheduler = StepScheduler(
+                    int(archinstall.arguments.get(ARG_MAX_PARALLEL_STEPS, 0)) or None,
+                    tracer,
+                    on_complete=journal.record
+                )
+                for step in steps:
+                    if stage is None or step.name in stage:
+                        scheduler.add(step)
 
-            installation.minimal_installation(
-                testing=enable_testing,
-                multilib=enable_multilib,
-                mkinitcpio=run_mkinitcpio,
-                hostname=archinstall.arguments.get('hostname', 'archlinux'),
-                locale_config=locale_config
-            )
+                try:
+                    scheduler.run(skip=completed)
+                except StepError as e:
+                    journal.record(e.step, 'failed', str(e.__cause__ or e))
+                    archinstall.info(f"Run the installer again with --{ARG_RESUME} to continue from step '{e.step}'")
+                    raise
 
-            if mirror_config:
-                installation.set_mirrors(mirror_config, on_target=True)
+                if stage is not None:
+                    from GoldenImage import capture as capture_image
 
-            if archinstall.arguments.get(ARG_SWAP):
-                installation.setup_swap('zram')
+                    archinstall.info(f"Capturing the golden image {image}")
+                    with tracer.span('capture_image'):
+                        capture_image(installation.target, image)
+                    image_lock.close()
+                    completed |= stage
 
-            if archinstall.arguments.get(ARG_BOOTLOADER) == Bootloader.Grub and SysInfo.has_uefi():
-                installation.add_additional_packages("grub")
+            from archinstall.lib.configuration import ConfigurationOutput
+            from Reconfigure import store as store_config
 
-            installation.add_bootloader(
-                archinstall.arguments[ARG_BOOTLOADER],
-                archinstall.arguments.get(ARG_UKI, False)
-            )
+            # Kept on the target for --reconfigure
+            store_config(installation.target, json.loads(ConfigurationOutput(archinstall.arguments).user_config_to_json()))
 
-            network_config: Optional[NetworkConfiguration] = archinstall.arguments.get(ARG_NETWORK_CONFIG, None)
-            if network_config:
-                network_config.install_network_config(
-                    installation,
-                    archinstall.arguments.get(ARG_PROFILE_CONFIG, None)
-                )
+            archinstall.info("For post-installation tips, see https://wiki.archlinux.org/index.php/Installation_guide#Post-installation")
+
+    except Exception as e:
+        logging.error(f"Installation failed: {e}")
+        exit(1)
+    finally:
+        image_lock.close()
+        save_timings()
 
-            if users := archinstall.arguments.get(ARG_USERS, None):
-                installation.create_users(users)
+    archinstall.debug(f"Disk states after installing: {disk.disk_layouts()}")
 
-            audio_config: Optional[AudioConfiguration] = archinstall.arguments.get(ARG_AUDIO_CONFIG, None)
-            if audio_config:
-                audio_config.install_audio_config(installation)
-            else:
-                info("No audio server will be installed")
 
-            if packages := archinstall.arguments.get(ARG_PACKAGES, None):
-                installation.add_additional_packages(packages)
+def reconfigure(mountpoint: Path) -> None:
+    """Applies what changed since the installed system at `mountpoint` was configured."""
+    from archinstall.lib.configuration import ConfigurationOutput
+    from Reconfigure import Reconfigure, ReconfigureError, load_stored
 
-            if profile_config := archinstall.arguments.get(ARG_PROFILE_CONFIG, None):
-                profile_handler.install_profile_config(installation, profile_config)
+    new = json.loads(ConfigurationOutput(archinstall.arguments).user_config_to_json())
+    try:
+        changed = Reconfigure(
+            mountpoint, load_stored(mountpoint), new, ignore=RUNTIME_ARGS,
+            max_workers=int(archinstall.arguments.get(ARG_MAX_PARALLEL_STEPS, 0)) or None, tracer=tracer
+        ).run()
+    except (ReconfigureError, StepError) as e:
+        archinstall.warn(str(e))
+        exit(1)
+    finally:
+        save_timings()
 
-            if timezone := archinstall.arguments.get(ARG_TIMEZONE, None):
-                installation.set_timezone(timezone)
+    archinstall.info(f"Reconfigured {mountpoint}: {', '.join(changed) or 'nothing changed'}")
 
-            if archinstall.arguments.get(ARG_NTP, False):
-                installation.activate_time_synchronization()
 
-            if archinstall.accessibility_tools_in_use():
-                installation.enable_espeakup()
+def main() -> None:
+    """Runs the interactive or silent installation from the command line."""
+    exit_if_help_requested()
 
-            if root_pw := archinstall.arguments.get(ARG_ROOT_PASSWORD, None):
-                installation.user_set_pw('root', root_pw)
+    from archinstall.lib import disk
+    from archinstall.lib.configuration import ConfigurationOutput
+    from HardwareInventory import invalidate, inventory
+    from InstallLogging import capture_output, setup_logging
+    from InstallPlan import PlanError
 
-            if profile_config:
-                profile_config.profile.post_install(installation)
+    normalize_arguments(archinstall.arguments)
+    setup_logging(Path(archinstall.storage.get('LOG_PATH', '.')))
 
-            if services := archinstall.arguments.get(ARG_SERVICES, None):
-                installation.enable_service(services)
+    with tracer.span('hardware_inventory'):
+        inventory()
 
-            if custom_commands := archinstall.arguments.get(ARG_CUSTOM_COMMANDS, None):
-                archinstall.run_custom_user_commands(custom_commands, installation)
+    if not archinstall.arguments.get(ARG_SILENT):
+        ask_user_questions()
 
-            installation.genfstab()
-            info("For post-installation tips, see https://wiki.archlinux.org/index.php/Installation_guide#Post-installation")
+    with tracer.span('optimize_disk_layout'):
+        optimize_disk_layout()
 
-    except Exception as e:
-        logging.error(f"Installation failed: {e}")
-        exit(1)
+    config_output = ConfigurationOutput(archinstall.arguments)
+
+    if not archinstall.arguments.get(ARG_SILENT):
+        config_output.show()
+
+    config_output.save()
+
+    if archinstall.arguments.get(ARG_RECONFIGURE):
+        capture_output()
+        reconfigure(archinstall.storage.get('MOUNT_POINT', Path('/mnt')))
+        return
 
-    debug(f"Disk states after installing: {disk.disk_layouts()}")
+    mountpoint = archinstall.storage.get('MOUNT_POINT', Path('/mnt'))
+    resume = archinstall.arguments.get(ARG_RESUME, False)
 
+    with tracer.span('install_plan'):
+        plan = install_plan(mountpoint)
 
-exit_if_help_requested()
+    if archinstall.arguments.get(ARG_DRY_RUN):
+        print(plan.to_json())
+
+    # Reject configurations that cannot fit before any disk is touched.
+    # A resumed run has already written to the target, so it is not checked again.
+    if not resume:
+        try:
+            plan.check_fits()
+        except PlanError as e:
+            archinstall.warn(str(e))
+            exit(1)
+
+    if archinstall.arguments.get(ARG_DRY_RUN):
+        exit(0)
 
-if not archinstall.arguments.get(ARG_SILENT):
-    ask_user_questions()
+    if not archinstall.arguments.get(ARG_SILENT):
+        input(str(_('Press Enter to continue.')))
 
-config_output = ConfigurationOutput(archinstall.arguments)
+    fs_handler = disk.FilesystemHandler(
+        archinstall.arguments[ARG_DISK_CONFIG],
+        archinstall.arguments.get(ARG_ENCRYPTION, None)
+    )
 
-if not archinstall.arguments.get(ARG_SILENT):
-    config_output.show()
+    # When resuming, the partitions from the failed run are kept as they are
+    if resume:
+        archinstall.info("Resuming: skipping partitioning and formatting")
+    else:
+        with tracer.span('filesystem_operations'):
+            filesystem_operations(fs_handler)
+        invalidate(block_devices_only=True)
 
-config_output.save()
+    # Nothing asks anything from here on, the final countdown before formatting was the last
+    capture_output()
+    perform_installation(mountpoint, resume)
 
-if archinstall.arguments.get(ARG_DRY_RUN):
-    exit(0)
+    if not archinstall.arguments.get(ARG_SKIP_POST_INSTALL, False):
+        from PostInstall import PostInstall, PostInstallError
 
-if not archinstall.arguments.get(ARG_SILENT):
-    input(str(_('Press Enter to continue.')))
+        archinstall.info("Installing MaiArch's components")
+        try:
+            PostInstall(mountpoint).run()
+        except PostInstallError as e:
+            archinstall.warn(str(e))
+            exit(1)
 
-fs_handler = disk.FilesystemHandler(
-    archinstall.arguments[ARG_DISK_CONFIG],
-    archinstall.arguments.get(ARG_ENCRYPTION, None)
-)
 
-fs_handler.perform_filesystem_operations()
-perform_installation(archinstall.storage.get('MOUNT_POINT', Path('/mnt')))
+if __name__ == '__main__':
+    main()
@@ -15,6 +15,8 @@ fi
 # Variables
 REPO_URL="https://github.com/archlinux/archinstall.git"
 INSTALL_SCRIPT="archinstall/archinstall/scripts/Installer.py"
+# Modules imported by Installer.py, moved next to it
+SUPPORT_MODULES=(BlockImager.py ConfigValues.py Fleet.py FormatEngine.py GoldenImage.py HardwareInventory.py InstallJournal.py InstallLogging.py InstallPlan.py InstallTrace.py LayoutOptimizer.py MirrorRanking.py PackageAccumulator.py PacmanTuning.py PostInstall.py Reconfigure.py StepScheduler.py)
 
 # Welcome Message
 dialog --title "Welcome to MaiArch Installation" \
@@ -47,13 +49,16 @@ unzip archinstall.zip || { echo "Failed to Unzip. Exiting."; exit 1; }
 
 # Move custom installer script
 mv Installer.py "$INSTALL_SCRIPT" || { echo "Failed to move Installer.py. Exiting."; exit 1; }
+mv "${SUPPORT_MODULES[@]}" "$(dirname "$INSTALL_SCRIPT")" || { echo "Failed to move installer modules. Exiting."; exit 1; }
 
 # Run the custom installer
 python3 "$INSTALL_SCRIPT" || { echo "MaiArch installer script failed. Exiting."; exit 1; }
 
-# Message and additional package installations
-dialog --msgbox "The base has been installed." 5 40
+# TuxTalk, OmniPkg and the side apps are installed by the installer's post-install stage
+dialog --msgbox "The installation is complete." 5 40
 
-dialog --msgbox "Continuing with installing your side apps." 5 40
-
-sudo ./Convertor.sh
\ No newline at end of file
+if dialog --yesno "The system will now restart. Do you want to proceed?" 7 50; then
+  reboot
+else
+  dialog --msgbox "Reboot canceled. Please reboot manually to apply changes." 7 50
+fi
@@ -0,0 +1,186 @@
+import math
+import sys
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Iterator, Optional
+
+import logging
+
+from ConfigValues import plain_value
+from HardwareInventory import QueueInfo, inventory, parent_device
+
+logger = logging.getLogger(__name__)
+
+MIB = 1024 ** 2
+DEFAULT_ALIGNMENT = MIB
+MAX_ALIGNMENT = 64 * MIB  # Odd stripe sizes give huge common multiples, fall back to 1 MiB then
+FS_BLOCK_SIZE = 4096
+
+# Filesystems that are trimmed periodically by fstrim.timer rather than on every delete
+PERIODIC_TRIM_FILESYSTEMS = {'ext4', 'xfs', 'f2fs'}
+
+
+def alignment(queue: QueueInfo) -> int:
+    """Partition alignment in bytes: 1 MiB, widened to the optimal I/O and erase block sizes."""
+    sizes = [DEFAULT_ALIGNMENT, queue.physical_block_size]
+    if queue.optimal_io_size:
+        sizes.append(queue.optimal_io_size)
+    if queue.discard_granularity:
+        sizes.append(queue.discard_granularity)
+
+    aligned = math.lcm(*sizes)
+    return aligned if aligned <= MAX_ALIGNMENT else DEFAULT_ALIGNMENT
+
+
+def mount_options(queue: QueueInfo, fs_type: str) -> list[str]:
+    if fs_type in ('vfat', 'fat32', 'swap', 'linux-swap'):
+        return []
+
+    options = ['noatime']
+    if fs_type == 'btrfs':
+        # Level 1 keeps up with NVMe, slower disks gain more from the default level
+        options.append('compress=zstd' if queue.rotational else 'compress=zstd:1')
+        if queue.discard and not queue.rotational:
+            options.append('discard=async')
+    elif fs_type == 'ext4' and (queue.smr or queue.rotational):
+        # Fewer, larger metadata writes, which shingled disks handle much better
+        options += ['lazytime', 'commit=60']
+    return options
+
+
+def mkfs_options(queue: QueueInfo, fs_type: str, eager: bool = False) -> list[str]:
+    """
+    mkfs options for the device. With `eager`, ext4 initializes its inode tables and
+    journal while formatting, which takes long on large rotational disks, instead of
+    leaving that to the kernel after the first mount.
+    """
+    # A striped device (RAID) reports its chunk size and full stripe width
+    chunk = queue.minimum_io_size or queue.optimal_io_size
+    striped = queue.optimal_io_size > FS_BLOCK_SIZE and chunk % FS_BLOCK_SIZE == 0 \
+        and queue.optimal_io_size % chunk == 0
+
+    if fs_type == 'ext4':
+        extended = []
+        if striped:
+            extended += [f'stride={chunk // FS_BLOCK_SIZE}', f'stripe_width={queue.optimal_io_size // FS_BLOCK_SIZE}']
+        if not queue.discard:
+            extended.append('nodiscard')
+        if eager:
+            extended += ['lazy_itable_init=0', 'lazy_journal_init=0']
+        if queue.smr or queue.rotational:
+            # Keep the metadata together at the start, which saves seeks and shingled rewrites
+            extended.append('packed_meta_blocks=1')
+        options = ['-b', str(FS_BLOCK_SIZE)]
+        return options + ['-E', ','.join(extended)] if extended else options
+
+    if fs_type == 'xfs':
+        options = []
+        if striped:
+            options += ['-d', f'su={chunk},sw={queue.optimal_io_size // chunk}']
+        if queue.physical_block_size > 512:
+            options += ['-s', f'size={queue.physical_block_size}']
+        if not queue.discard:
+            options.append('-K')
+        return options
+
+    if fs_type == 'btrfs':
+        return [] if queue.discard else ['--nodiscard']
+
+    return []
+
+
+def _merge(options: list[str], extra: list[str]) -> list[str]:
+    """Add `extra` options whose name (the part before '=') is not set already."""
+    names = {option.split('=', 1)[0] for option in options}
+    return options + [option for option in extra if option.split('=', 1)[0] not in names]
+
+
+def aligned_range(start: int, length: int, boundary: int) -> Optional[tuple[int, int]]:
+    """
+    The (start, length) in bytes of a partition shrunk to `boundary`, or None when
+    it is too small for that: nothing would be left, or more than one boundary lost.
+    """
+    aligned_start = -(-start // boundary) * boundary
+    aligned_end = (start + length) // boundary * boundary
+    if aligned_end <= aligned_start or length - (aligned_end - aligned_start) > boundary:
+        return None
+    return aligned_start, aligned_end - aligned_start
+
+
+def _align(partition: Any, boundary: int) -> None:
+    from archinstall.lib.disk import Size, Unit
+
+    start = partition.start.convert(Unit.B).value
+    length = partition.length.convert(Unit.B).value
+    aligned = aligned_range(start, length, boundary)
+    if aligned is None:
+        logger.warning(f"Not aligning the partition at byte {start} to {boundary // 1024} KiB, "
+                       f"its {length} bytes are too few for that")
+        return
+
+    sector_size = partition.start.sector_size
+    partition.start = Size(aligned[0], Unit.B, sector_size)
+    partition.length = Size(aligned[1], Unit.B, sector_size)
+
+
+def optimize_layout(disk_config: Any) -> list[str]:
+    """
+    Tune an archinstall DiskLayoutConfiguration for the devices it is written to:
+    align the partitions that will be created and add mount options. Returns the
+    services the layout benefits from (fstrim.timer for trimmable SSDs).
+    """
+    services = []
+    for modification in getattr(disk_config, 'device_modifications', None) or []:
+        device_path = getattr(getattr(modification.device, 'device_info', None), 'path', modification.device)
+        queue = inventory().queue(parent_device(device_path))
+        boundary = alignment(queue)
+        logger.info(f"{device_path}: {'rotational' if queue.rotational else 'solid state'}, "
+                    f"discard {'yes' if queue.discard else 'no'}, optimal I/O {queue.optimal_io_size}, "
+                    f"zoned {queue.zoned}, aligning partitions to {boundary // 1024} KiB")
+
+        for partition in modification.partitions:
+            fs_type = str(plain_value(partition.fs_type)) if getattr(partition, 'fs_type', None) else None
+            if fs_type:
+                partition.mount_options = _merge(list(partition.mount_options or []), mount_options(queue, fs_type))
+                if fs_type in PERIODIC_TRIM_FILESYSTEMS and queue.discard and not queue.rotational:
+                    services.append('fstrim.timer')
+
+            if str(plain_value(getattr(partition, 'status', ''))) == 'create':
+                _align(partition, boundary)
+
+    return list(dict.fromkeys(services))
+
+
+@contextmanager
+def archinstall_mkfs_options(eager: bool = False) -> Iterator[None]:
+    """
+    archinstall formats with default mkfs options and has no way to pass others,
+    so for the duration of the context its formatting adds the options suited to
+    the device each partition is on. See mkfs_options() for `eager`.
+    """
+    from archinstall.lib.disk.device_handler import device_handler
+
+    original = device_handler.format
+
+    def format(fs_type: Any, path: Path, additional_parted_options: Any = None, *args: Any, **kwargs: Any) -> Any:
+        options = mkfs_options(inventory().queue(parent_device(path)), str(plain_value(fs_type)), eager)
+        logger.debug(f"mkfs options for {path}: {options}")
+        return original(fs_type, path, [*(additional_parted_options or []), *options], *args, **kwargs)
+
+    device_handler.format = format
+    try:
+        yield
+    finally:
+        del device_handler.format  # Back to the method
+
+
+def main() -> None:
+    """`LayoutOptimizer.py mkfs|mount FS_TYPE DEVICE` prints the options for shell scripts."""
+    kind, fs_type, device = sys.argv[1:4]
+    queue = inventory().queue(parent_device(device))
+    options = mkfs_options(queue, fs_type) if kind == 'mkfs' else mount_options(queue, fs_type)
+    print(' '.join(options) if kind == 'mkfs' else ','.join(options))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,240 @@
+import asyncio
+import json
+import ssl
+import time
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any, Iterable, Optional
+from urllib.parse import urlsplit
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+MIRRORLIST = Path('/etc/pacman.d/mirrorlist')
+CACHE_PATH = Path('/var/cache/maiarch/mirror-ranking.json')
+DEFAULT_CACHE_TTL = 3600  # Seconds
+
+# The ranged download reads the start of the core database, which every mirror carries
+PROBE_REPO = 'core'
+PROBE_ARCH = 'x86_64'
+PROBE_FILE = 'core.db'
+PROBE_BYTES = 256 * 1024
+
+CONCURRENCY = 16  # Mirrors probed at the same time
+CONNECT_TIMEOUT = 3.0  # Seconds
+DOWNLOAD_TIMEOUT = 10.0  # Seconds
+MAX_LATENCY = 1.0  # Seconds to connect, slower mirrors are dropped
+MIN_THROUGHPUT = 128 * 1024  # Bytes per second, slower mirrors are dropped
+MAX_SYNC_AGE = 24 * 3600  # Seconds since the mirror's last sync, older ones are stale
+
+
+@dataclass
+class MirrorResult:
+    url: str
+    latency: Optional[float] = None  # Seconds to open the connection
+    throughput: Optional[float] = None  # Bytes per second of the ranged download
+    last_sync: Optional[int] = None  # Epoch of the mirror's last sync, if it publishes one
+    error: Optional[str] = None
+
+    @property
+    def usable(self) -> bool:
+        if self.error or self.latency is None or self.throughput is None:
+            return False
+        if self.latency > MAX_LATENCY or self.throughput < MIN_THROUGHPUT:
+            return False
+        if self.last_sync is not None and time.time() - self.last_sync > MAX_SYNC_AGE:
+            return False
+        return True
+
+
+def custom_urls(mirror_config: Any = None) -> list[str]:
+    """
+    The user's own servers from archinstall's mirror configuration, e.g. a mirror
+    on the local network. They are ranked with the others but never dropped.
+    """
+    # custom_servers in newer archinstall versions; custom_mirrors in older ones are
+    # extra repositories written to pacman.conf, not mirrorlist servers
+    servers = getattr(mirror_config, 'custom_servers', None) or []
+    return list(dict.fromkeys(str(getattr(server, 'url', server)) for server in servers))
+
+
+def candidate_urls(mirror_config: Any = None, mirrorlist: Path = MIRRORLIST) -> list[str]:
+    """
+    The mirror URLs to rank: those selected in archinstall's mirror configuration
+    and its custom servers, or the servers listed in the live system's mirrorlist
+    when there are none.
+    """
+    urls: dict[str, None] = {}
+
+    regions = getattr(mirror_config, 'mirror_regions', None) or {}
+    # Older archinstall versions map region -> urls, newer ones keep region objects with .urls
+    entries = regions.values() if isinstance(regions, dict) else [getattr(region, 'urls', []) for region in regions]
+    for region_urls in entries:
+        for entry in region_urls:
+            urls.setdefault(str(getattr(entry, 'url', entry)), None)
+    for url in custom_urls(mirror_config):
+        urls.setdefault(url, None)
+
+    if not urls and mirrorlist.exists():
+        for line in mirrorlist.read_text().splitlines():
+            key, _, value = line.partition('=')
+            if key.strip() == 'Server' and value.strip():
+                urls.setdefault(value.strip(), None)
+
+    return list(urls)
+
+
+async def _get(url: str, byte_range: Optional[int] = None) -> tuple[float, float, int, bytes]:
+    """
+    Minimal HTTP/1.1 GET on its own connection.
+    Returns (connect seconds, transfer seconds, status, body).
+    """
+    parts = urlsplit(url)
+    secure = parts.scheme == 'https'
+    port = parts.port or (443 if secure else 80)
+
+    start = time.perf_counter()
+    reader, writer = await asyncio.wait_for(
+        asyncio.open_connection(parts.hostname, port, ssl=ssl.create_default_context() if secure else None),
+        CONNECT_TIMEOUT
+    )
+    connected = time.perf_counter()
+
+    try:
+        headers = [
+            f"GET {parts.path or '/'} HTTP/1.1",
+            f"Host: {parts.netloc}",
+            "User-Agent: maiarch-mirror-ranking",
+            "Connection: close",
+        ]
+        if byte_range is not None:
+            headers.append(f"Range: bytes=0-{byte_range - 1}")
+        writer.write(('\r\n'.join(headers) + '\r\n\r\n').encode())
+        await writer.drain()
+
+        response = await asyncio.wait_for(reader.read(), DOWNLOAD_TIMEOUT)
+        finished = time.perf_counter()
+    finally:
+        writer.close()
+
+    head, _, body = response.partition(b'\r\n\r\n')
+    status_line, *header_lines = head.decode('latin-1').split('\r\n')
+    status = int(status_line.split()[1])
+    if any(line.lower().replace(' ', '') == 'transfer-encoding:chunked' for line in header_lines):
+        body = _dechunk(body)
+
+    return connected - start, finished - connected, status, body
+
+
+def _dechunk(body: bytes) -> bytes:
+    data = bytearray()
+    while body:
+        size_line, _, body = body.partition(b'\r\n')
+        size = int(size_line.split(b';')[0], 16)
+        if size == 0:
+            break
+        data += body[:size]
+        body = body[size + 2:]
+    return bytes(data)
+
+
+async def probe_mirror(url: str) -> MirrorResult:
+    result = MirrorResult(url)
+    probe_url = url.replace('$repo', PROBE_REPO).replace('$arch', PROBE_ARCH).rstrip('/') + '/' + PROBE_FILE
+
+    try:
+        latency, transfer, status, body = await _get(probe_url, PROBE_BYTES)
+        if status not in (200, 206):
+            result.error = f"HTTP {status}"
+            return result
+        result.latency = latency
+        result.throughput = len(body) / max(transfer, 1e-6)
+    except (OSError, asyncio.TimeoutError, ValueError, IndexError) as e:
+        result.error = str(e) or type(e).__name__
+        return result
+
+    # Arch mirrors publish the epoch of their last sync next to the repositories
+    if '$repo' in url:
+        try:
+            _, _, status, body = await _get(url.split('$repo')[0] + 'lastsync')
+            if status == 200:
+                result.last_sync = int(body.strip())
+        except (OSError, asyncio.TimeoutError, ValueError, IndexError):
+            pass
+
+    return result
+
+
+async def _probe_all(urls: list[str]) -> list[MirrorResult]:
+    semaphore = asyncio.Semaphore(CONCURRENCY)
+
+    async def probe(url: str) -> MirrorResult:
+        async with semaphore:
+            return await probe_mirror(url)
+
+    return await asyncio.gather(*(probe(url) for url in urls))
+
+
+def _load_cache(urls: list[str], cache_path: Path, ttl: float) -> Optional[list[MirrorResult]]:
+    try:
+        cache = json.loads(cache_path.read_text())
+    except (OSError, ValueError):
+        return None
+
+    if time.time() - cache.get('time', 0) > ttl or sorted(cache.get('candidates', [])) != sorted(urls):
+        return None
+    return [MirrorResult(**result) for result in cache['results']]
+
+
+def rank_mirrors(urls: Iterable[str], cache_path: Path = CACHE_PATH, cache_ttl: float = DEFAULT_CACHE_TTL,
+                 keep: Iterable[str] = ()) -> list[MirrorResult]:
+    """
+    Probe every mirror concurrently and return the usable ones, fastest first,
+    followed by the mirrors in `keep` that did not pass the ranking.
+    Results for the same candidate list are reused for `cache_ttl` seconds.
+    """
+    keep = set(keep)
+    urls = list(urls)
+    if not urls:
+        return []
+
+    if (results := _load_cache(urls, cache_path, cache_ttl)) is None:
+        logger.info(f"Ranking {len(urls)} mirrors")
+        results = asyncio.run(_probe_all(urls))
+        try:
+            cache_path.parent.mkdir(parents=True, exist_ok=True)
+            cache_path.write_text(json.dumps({
+                'time': time.time(),
+                'candidates': urls,
+                'results': [asdict(result) for result in results],
+            }))
+        except OSError as e:
+            logger.warning(f"Could not cache the mirror ranking: {e}")
+
+    usable = [result for result in results if result.usable]
+    kept = []
+    for result in results:
+        if result.usable:
+            continue
+        if result.url in keep:
+            logger.info(f"Keeping custom mirror {result.url} although it did not pass the ranking: "
+                        f"{result.error or 'too slow or stale'}")
+            kept.append(result)
+        else:
+            logger.debug(f"Dropping mirror {result.url}: {result.error or 'too slow or stale'}")
+
+    return sorted(usable, key=lambda result: (-result.throughput, result.latency)) + kept
+
+
+def write_mirrorlist(results: list[MirrorResult], path: Path = MIRRORLIST) -> None:
+    lines = [f"## Ranked by MaiArch on {time.strftime('%Y-%m-%d %H:%M:%S')}"]
+    for result in results:
+        if result.usable:
+            lines.append(f"# {result.latency * 1000:.0f} ms, {result.throughput / 1024:.0f} KiB/s")
+        else:
+            lines.append("# Not ranked")
+        lines.append(f"Server = {result.url}")
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text('\n'.join(lines) + '\n')
@@ -0,0 +1,140 @@
+import threading
+from typing import Any, Iterable, Optional, Union
+
+import logging
+
+from ConfigValues import plain_value
+from InstallTrace import Tracer, maybe_span
+
+logger = logging.getLogger(__name__)
+
+# Greeter type -> packages, mirrors archinstall's profile_handler.install_greeter
+GREETER_PACKAGES = {
+    'lightdm-gtk-greeter': ['lightdm', 'lightdm-gtk-greeter'],
+    'lightdm-slick-greeter': ['lightdm', 'lightdm-slick-greeter'],
+    'sddm': ['sddm'],
+    'gdm': ['gdm'],
+    'ly': ['ly'],
+    'cosmic-greeter': ['cosmic-greeter'],
+}
+
+PIPEWIRE_PACKAGES = [
+    'pipewire',
+    'pipewire-alsa',
+    'pipewire-jack',
+    'pipewire-pulse',
+    'gst-plugin-pipewire',
+    'libpulse',
+    'wireplumber',
+]
+
+
+def _normalize(packages: Union[str, Iterable[str], None]) -> list[str]:
+    if not packages:
+        return []
+    if isinstance(packages, str):
+        packages = packages.split()
+    return [str(plain_value(package)) for package in packages if package]
+
+
+class PackageAccumulator:
+    """
+    Gathers the extra packages requested by the installation steps so they
+    can be installed in a single pacman transaction instead of one
+    transaction (sync, dependency resolution and hooks) per step.
+    """
+
+    def __init__(self, tracer: Optional[Tracer] = None):
+        self.tracer = tracer
+        self._requested: dict[str, None] = {}  # Ordered set
+        self._installed: set[str] = set()
+        self._lock = threading.Lock()
+
+    @property
+    def packages(self) -> list[str]:
+        return list(self._requested)
+
+    def add(self, packages: Union[str, Iterable[str], None]) -> None:
+        with self._lock:
+            for package in _normalize(packages):
+                self._requested.setdefault(package, None)
+
+    def add_audio(self, audio_config: Any) -> None:
+        audio = plain_value(getattr(audio_config, 'audio', None))
+        if audio == 'pipewire':
+            self.add(PIPEWIRE_PACKAGES)
+        elif audio == 'pulseaudio':
+            self.add('pulseaudio')
+
+    def add_network(self, network_config: Any, profile_config: Any) -> None:
+        if plain_value(getattr(network_config, 'type', None)) != 'nm':
+            return
+        self.add('networkmanager')
+        profile = getattr(profile_config, 'profile', None)
+        if profile is not None and getattr(profile, 'is_desktop_profile', lambda: False)():
+            self.add('network-manager-applet')
+
+    def add_profile(self, profile_config: Any) -> None:
+        profile = getattr(profile_config, 'profile', None)
+        if profile is None:
+            return
+
+        self.add(getattr(profile, 'packages', None))
+        for sub_profile in getattr(profile, 'current_selection', None) or []:
+            self.add(getattr(sub_profile, 'packages', None))
+
+        if gfx_driver := getattr(profile_config, 'gfx_driver', None):
+            self.add(gfx_driver.gfx_packages())
+
+        if greeter := getattr(profile_config, 'greeter', None):
+            self.add(GREETER_PACKAGES.get(plain_value(greeter), []))
+
+    def install(self, installation: Any) -> None:
+        """Install every requested package in one transaction."""
+        with self._lock:
+            pending = [package for package in self._requested if package not in self._installed]
+        if not pending:
+            return
+
+        logger.info(f"Installing {len(pending)} packages in a single transaction")
+        with maybe_span(self.tracer, f"packages ({len(pending)})", 'packages', packages=pending):
+            installation.add_additional_packages(pending)
+
+        with self._lock:
+            self._installed.update(pending)
+
+    def wrap(self, installation: Any) -> 'AccumulatedInstallation':
+        return AccumulatedInstallation(installation, self)
+
+    def missing(self, packages: Union[str, Iterable[str], None]) -> list[str]:
+        with self._lock:
+            return [package for package in _normalize(packages) if package not in self._installed]
+
+    def mark_installed(self, packages: Iterable[str]) -> None:
+        with self._lock:
+            self._installed.update(packages)
+
+
+class AccumulatedInstallation:
+    """
+    Wraps an archinstall Installer so that add_additional_packages only
+    installs packages the accumulator has not already installed. Packages
+    that were not predicted up front are still installed normally.
+    """
+
+    def __init__(self, installation: Any, accumulator: PackageAccumulator):
+        self._installation = installation
+        self._accumulator = accumulator
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._installation, name)
+
+    def add_additional_packages(self, packages: Union[str, list[str]], *args: Any, **kwargs: Any) -> Optional[Any]:
+        if not (missing := self._accumulator.missing(packages)):
+            return None
+
+        logger.debug(f"Installing packages outside the consolidated transaction: {missing}")
+        with maybe_span(self._accumulator.tracer, f"packages ({len(missing)})", 'packages', packages=missing):
+            result = self._installation.add_additional_packages(missing, *args, **kwargs)
+        self._accumulator.mark_installed(missing)
+        return result
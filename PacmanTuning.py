@@ -0,0 +1,73 @@
+import fcntl
+import math
+import os
+import re
+import tempfile
+from pathlib import Path
+from typing import Optional
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+PACMAN_CONF = Path('/etc/pacman.conf')
+LOCK_DIR = Path('/run/lock/maiarch')  # Not next to the file, installed systems would ship the lock
+
+DEFAULT_PARALLEL_DOWNLOADS = 5  # pacman.conf's suggested value, used when the bandwidth is unknown
+MAX_PARALLEL_DOWNLOADS = 16
+DOWNLOADS_PER_CPU = 2  # Each download is also checked and decompressed, which costs CPU
+TARGET_THROUGHPUT = 64 * 1024 * 1024  # Bytes per second we try to reach in total
+
+# Roughly how many packages a base pacstrap pulls in
+BASE_PACKAGES = 150
+
+_PARALLEL_DOWNLOADS_LINE = re.compile(r'^\s*#?\s*ParallelDownloads\s*=.*$', re.MULTILINE)
+
+
+def choose_parallel_downloads(queued_packages: int, stream_throughput: Optional[float] = None,
+                              cpu_count: Optional[int] = None) -> int:
+    """
+    Pick a ParallelDownloads value for a phase that downloads `queued_packages`.
+
+    `stream_throughput` is what a single connection to the best mirror reached
+    (bytes per second). Slower streams need more of them in parallel to reach
+    TARGET_THROUGHPUT; the CPU count and the number of packages cap the result.
+    """
+    if stream_throughput:
+        wanted = math.ceil(TARGET_THROUGHPUT / stream_throughput)
+    else:
+        wanted = DEFAULT_PARALLEL_DOWNLOADS
+
+    cpus = cpu_count or os.cpu_count() or 1
+    return max(1, min(wanted, cpus * DOWNLOADS_PER_CPU, queued_packages, MAX_PARALLEL_DOWNLOADS))
+
+
+def set_parallel_downloads(value: int, pacman_conf: Path = PACMAN_CONF, lock_dir: Path = LOCK_DIR) -> None:
+    """
+    Set ParallelDownloads in a pacman.conf, uncommenting or adding the option as needed.
+    Fleet workers on one host share the live pacman.conf: the update holds an exclusive
+    lock in `lock_dir`, and the new file is written under a unique name and then
+    renamed into place.
+    """
+    line = f"ParallelDownloads = {value}"
+
+    lock_dir.mkdir(parents=True, exist_ok=True)
+    lock_name = str(pacman_conf.resolve()).strip('/').replace('/', '-')
+    with open(lock_dir / f'{lock_name}.lock', 'w') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        config = pacman_conf.read_text()
+        if _PARALLEL_DOWNLOADS_LINE.search(config):
+            config = _PARALLEL_DOWNLOADS_LINE.sub(line, config, count=1)
+        else:
+            config = config.replace('[options]\n', f"[options]\n{line}\n", 1)
+
+        fd, tmp_path = tempfile.mkstemp(prefix=f'.{pacman_conf.name}.', dir=pacman_conf.parent)
+        try:
+            with os.fdopen(fd, 'w') as tmp:
+                tmp.write(config)
+            os.chmod(tmp_path, pacman_conf.stat().st_mode & 0o7777)
+            os.replace(tmp_path, pacman_conf)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+    logger.info(f"Set {line} in {pacman_conf}")
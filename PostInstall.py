@@ -0,0 +1,151 @@
+import subprocess
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Optional
+
+import logging
+
+from InstallTrace import Tracer
+from StepScheduler import Step, StepScheduler
+
+logger = logging.getLogger(__name__)
+
+# Where the component sources are cloned, relative to the target's root
+SOURCE_DIR = Path('opt/maiarch/src')
+
+
+@dataclass(frozen=True)
+class Component:
+    name: str
+    repo: str
+    installer: str  # Script in the repository root that installs the component
+
+
+COMPONENTS = [
+    Component('TuxTalk', 'https://github.com/devtracer/TuxTalk.git', 'TuxTalkInstall.sh'),
+    Component('OmniPkg', 'https://github.com/devtracer/OmniPkg.git', 'Installation.sh'),
+]
+
+# Installed with OmniPkg in one batch once it is available
+APPS = ['nautilus', 'konsole', 'google-chrome', 'evince', 'vlc']
+
+# What Convertor.sh installed first: the component installers need git and a synced package database
+PREREQUISITES = ['git']
+
+# The component installers and OmniPkg all run pacman, which holds one database lock
+RES_PACMAN = 'pacman'
+
+
+class PostInstallError(Exception):
+    """Raised when one or more post-install components failed."""
+
+
+class PostInstall:
+    """
+    Installs MaiArch's own components onto an installed system. This replaces
+    the serial Convertor.sh pipeline: the repositories are shallow-cloned
+    concurrently while git and the package database are brought up to date,
+    and the apps are installed as a single OmniPkg batch. The component
+    installers and OmniPkg run pacman, so they take turns on its lock.
+
+    The sources are cloned from the live system into the target and the
+    installers run inside it through arch-chroot. With a root of '/' they
+    run directly on the current system.
+    """
+
+    def __init__(self, root: Path, components: Optional[list[Component]] = None,
+                 apps: Optional[list[str]] = None, max_workers: Optional[int] = None):
+        self.root = root
+        self.components = COMPONENTS if components is None else components
+        self.apps = APPS if apps is None else apps
+        self.tracer = Tracer()
+        # Clones and installers wait on the network and subprocesses, not the CPU
+        self.max_workers = max_workers or len(self.components) + 1
+        self.errors: dict[str, str] = {}
+
+    def _run(self, command: list[str], cwd: Optional[Path] = None) -> None:
+        result = subprocess.run(command, cwd=cwd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+        if result.returncode != 0:
+            output = result.stdout.strip().splitlines()[-5:]
+            raise PostInstallError(f"`{' '.join(command)}` exited with {result.returncode}: {' / '.join(output)}")
+
+    def _in_target(self, command: str) -> list[str]:
+        if self.root == Path('/'):
+            return ['sh', '-c', command]
+        return ['arch-chroot', str(self.root), 'sh', '-c', command]
+
+    def _guarded(self, name: str, requires: tuple[str, ...], action: Callable[[], None]) -> Callable[[], None]:
+        """
+        Record a failure instead of raising, so independent components keep going,
+        and skip the step when something it needs has failed.
+        """
+        def run() -> None:
+            if failed := [dep for dep in requires if dep in self.errors]:
+                self.errors[name] = f"skipped, {', '.join(failed)} failed"
+                return
+            try:
+                action()
+            except Exception as e:
+                logger.error(f"Post-install step {name} failed: {e}")
+                self.errors[name] = str(e)
+        return run
+
+    def steps(self) -> list[Step]:
+        pacman = frozenset({RES_PACMAN})
+        source_dir = self.root / SOURCE_DIR
+
+        def prerequisites() -> None:
+            self._run(self._in_target(f"pacman -Sy --needed --noconfirm {' '.join(PREREQUISITES)}"))
+
+        steps = [Step('prerequisites', self._guarded('prerequisites', (), prerequisites), resources=pacman)]
+        # On the current system the clones need git from the prerequisites, a live system brings its own
+        clone_requires = ('prerequisites',) if self.root == Path('/') else ()
+
+        for component in self.components:
+            checkout = source_dir / component.name
+            target_checkout = Path('/') / SOURCE_DIR / component.name
+
+            def clone(component: Component = component, checkout: Path = checkout) -> None:
+                checkout.parent.mkdir(parents=True, exist_ok=True)
+                if checkout.exists():
+                    self._run(['git', '-C', str(checkout), 'pull', '--depth', '1'])
+                else:
+                    self._run(['git', 'clone', '--depth', '1', component.repo, str(checkout)])
+
+            def install(component: Component = component, checkout: Path = target_checkout) -> None:
+                self._run(self._in_target(f"cd {checkout} && chmod +x {component.installer} && ./{component.installer}"))
+
+            clone_step = f"clone {component.name}"
+            install_step = f"install {component.name}"
+            install_requires = (clone_step, 'prerequisites')
+            steps.append(Step(clone_step, self._guarded(clone_step, clone_requires, clone), clone_requires))
+            steps.append(Step(install_step, self._guarded(install_step, install_requires, install), install_requires,
+                              pacman))
+
+        if self.apps and any(component.name == 'OmniPkg' for component in self.components):
+            def apps() -> None:
+                self._run(self._in_target(f"omnipkg install {' '.join(self.apps)}"))
+
+            requires = ('install OmniPkg',)
+            steps.append(Step('apps', self._guarded('apps', requires, apps), requires, pacman))
+
+        return steps
+
+    def run(self) -> None:
+        scheduler = StepScheduler(self.max_workers, self.tracer)
+        for step in self.steps():
+            scheduler.add(step)
+        scheduler.run()
+
+        logger.info(f"Post-install report:\n{self.report()}")
+        if self.errors:
+            raise PostInstallError(f"Post-install failed: {', '.join(sorted(self.errors))}")
+
+    def report(self) -> str:
+        lines = [f"{'Step':<25} {'Status':<8} {'Time (s)':>9}"]
+        for span in sorted(self.tracer.spans, key=lambda s: s.start):
+            status = 'FAILED' if span.name in self.errors else 'ok'
+            lines.append(f"{span.name:<25} {status:<8} {span.wall:>9.2f}")
+            if span.name in self.errors:
+                lines.append(f"    {self.errors[span.name]}")
+        return '\n'.join(lines)
@@ -0,0 +1,226 @@
+import json
+import os
+import re
+import subprocess
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Iterable, Optional
+
+import logging
+
+from InstallTrace import Tracer
+from StepScheduler import Step, StepScheduler
+
+logger = logging.getLogger(__name__)
+
+# The configuration a target was installed with, relative to its root
+STORED_CONFIG = Path('var/lib/maiarch/user_configuration.json')
+
+# Configuration keys an installed system can be brought up to date with
+RECONFIGURABLE = {'hostname', 'locale_config', 'ntp', 'packages', 'services', 'timezone'}
+
+# Fields of a disk configuration archinstall fills in while installing, or that
+# differ between two runs of the same layout; they don't change the layout
+VOLATILE_DISK_FIELDS = {'dev_path', 'obj_id', 'partn', 'partuuid', 'status', 'uuid', 'wipe'}
+
+DEFAULT_HOSTNAME = 'archlinux'  # What the installer names a system without a hostname
+NTP_SERVICE = 'systemd-timesyncd'
+RES_PACMAN = 'pacman'
+
+
+class ReconfigureError(Exception):
+    """Raised when a target cannot be reconfigured, e.g. a change needs a reinstall."""
+
+
+def load_stored(root: Path) -> dict[str, Any]:
+    path = root / STORED_CONFIG
+    try:
+        return json.loads(path.read_text())
+    except FileNotFoundError:
+        raise ReconfigureError(f"{path} not found, {root} was not installed by MaiArch or is not mounted")
+
+
+def store(root: Path, config: dict[str, Any]) -> None:
+    """Keep the configuration on the target, for reconfiguring it later."""
+    path = root / STORED_CONFIG
+    path.parent.mkdir(parents=True, exist_ok=True)
+    partial = path.with_name(path.name + '.partial')
+    partial.write_text(json.dumps(config, indent=4))
+    os.replace(partial, path)
+
+
+@dataclass
+class ConfigDiff:
+    changed: dict[str, tuple[Any, Any]]  # Key -> (old, new)
+
+    def __bool__(self) -> bool:
+        return bool(self.changed)
+
+    @property
+    def unsupported(self) -> list[str]:
+        """Changed keys that only a new installation applies."""
+        return sorted(key for key in self.changed if key not in RECONFIGURABLE)
+
+    def added(self, key: str) -> list[str]:
+        old, new = self.changed.get(key, (None, None))
+        return [item for item in new or [] if item not in (old or [])]
+
+    def removed(self, key: str) -> list[str]:
+        old, new = self.changed.get(key, (None, None))
+        return [item for item in old or [] if item not in (new or [])]
+
+
+def normalize_disk_config(value: Any) -> Any:
+    """The layout a disk configuration describes, without its volatile fields."""
+    if isinstance(value, dict):
+        return {key: normalize_disk_config(item) for key, item in value.items() if key not in VOLATILE_DISK_FIELDS}
+    if isinstance(value, list):
+        return [normalize_disk_config(item) for item in value]
+    return value
+
+
+def diff(old: dict[str, Any], new: dict[str, Any], ignore: Iterable[str] = ()) -> ConfigDiff:
+    ignored = set(ignore)
+    # Without a layout, or with the mounted one, the new configuration keeps the installed layout
+    new_disks = new.get('disk_config')
+    if not new_disks or new_disks.get('config_type') == 'pre_mounted_config':
+        ignored.add('disk_config')
+
+    def value(config: dict[str, Any], key: str) -> Any:
+        return normalize_disk_config(config.get(key)) if key == 'disk_config' else config.get(key)
+
+    return ConfigDiff({
+        key: (old.get(key), new.get(key))
+        for key in sorted(old.keys() | new.keys())
+        if key not in ignored and value(old, key) != value(new, key)
+    })
+
+
+def split_locale(sys_lang: str, sys_enc: str) -> tuple[str, str, str]:
+    """
+    Language, encoding and modifier of a locale, as archinstall's set_locale
+    splits them: a language like en_US.UTF-8 carries its own encoding.
+    """
+    lang, encoding, modifier = sys_lang, sys_enc, ''
+    if '.' in lang:
+        lang, found = lang.split('.', 1)
+        if '@' in found:
+            found, modifier = found.split('@', 1)
+            modifier = f'@{modifier}'
+        if sys_enc == 'UTF-8':  # archinstall's default, an encoding in the language wins
+            encoding = found
+    if '@' in lang:
+        lang, modifier = lang.split('@', 1)
+        modifier = f'@{modifier}'
+    return lang, encoding, modifier
+
+
+class Reconfigure:
+    """
+    Brings an installed system up to date with a changed configuration by running
+    only what the changes need: installing and removing packages, enabling and
+    disabling services, and rewriting the hostname, timezone and locale. Commands
+    run in the target with arch-chroot, or directly when `root` is /.
+    """
+
+    def __init__(self, root: Path, old: dict[str, Any], new: dict[str, Any], ignore: Iterable[str] = (),
+                 max_workers: Optional[int] = None, tracer: Optional[Tracer] = None):
+        self.root = root
+        self.new = new
+        self.diff = diff(old, new, ignore)
+        self.max_workers = max_workers
+        self.tracer = tracer
+
+    def _run(self, *command: str) -> None:
+        chroot = [] if self.root == Path('/') else ['arch-chroot', str(self.root)]
+        subprocess.run([*chroot, *command], check=True)
+
+    def _hostname(self) -> None:
+        (self.root / 'etc/hostname').write_text((self.new.get('hostname') or DEFAULT_HOSTNAME) + '\n')
+
+    def _timezone(self) -> None:
+        zone = Path('/usr/share/zoneinfo') / self.new['timezone']
+        if not (self.root / zone.relative_to('/')).exists():
+            raise ReconfigureError(f"Unknown timezone {self.new['timezone']}")
+        self._run('ln', '-sf', str(zone), '/etc/localtime')
+
+    def _locale(self) -> None:
+        locale = self.new['locale_config']
+        lang, encoding, modifier = split_locale(locale['sys_lang'], locale['sys_enc'])
+
+        # Like archinstall's set_locale: the first column of an entry may or may not include the encoding
+        locale_gen = self.root / 'etc/locale.gen'
+        lines = locale_gen.read_text().splitlines() if locale_gen.exists() else []
+        lang_re, encoding_re, modifier_re = map(re.escape, (lang, encoding, modifier))
+        entry_re = re.compile(rf'#?\s*{lang_re}(\.{encoding_re})?{modifier_re} {encoding_re}\s*$')
+        for index, line in enumerate(lines):
+            if entry_re.match(line):
+                lines[index] = line.lstrip('#').strip()
+                break
+        else:
+            lines.append(f"{lang}.{encoding}{modifier} {encoding}")
+            index = len(lines) - 1
+        locale_gen.write_text('\n'.join(lines) + '\n')
+        self._run('locale-gen')
+
+        (self.root / 'etc/locale.conf').write_text(f"LANG={lines[index].split()[0]}\n")
+        self._keymap(locale['kb_layout'])
+
+    def _keymap(self, keymap: str) -> None:
+        """Set KEYMAP in vconsole.conf, keeping the font and other settings."""
+        vconsole = self.root / 'etc/vconsole.conf'
+        lines = [line for line in (vconsole.read_text().splitlines() if vconsole.exists() else [])
+                 if not line.startswith('KEYMAP=')]
+        vconsole.write_text('\n'.join([f"KEYMAP={keymap}", *lines]) + '\n')
+
+    def _ntp(self) -> None:
+        self._run('systemctl', 'enable' if self.new.get('ntp') else 'disable', NTP_SERVICE)
+
+    def steps(self) -> list[Step]:
+        changed = self.diff.changed
+        pacman = frozenset({RES_PACMAN})
+        install, remove = self.diff.added('packages'), self.diff.removed('packages')
+        enable, disable = self.diff.added('services'), self.diff.removed('services')
+
+        steps = []
+        if 'hostname' in changed:
+            steps.append(Step('hostname', self._hostname))
+        if 'timezone' in changed and self.new.get('timezone'):
+            steps.append(Step('timezone', self._timezone))
+        if 'locale_config' in changed and self.new.get('locale_config'):
+            steps.append(Step('locale', self._locale))
+        if install:
+            # The installed system's package database may be old, -u keeps it from ending up partially upgraded
+            steps.append(Step('install_packages',
+                              lambda: self._run('pacman', '-Syu', '--needed', '--noconfirm', *install),
+                              resources=pacman))
+        # New services may come with the new packages, and removed ones go before their packages
+        if enable:
+            steps.append(Step('enable_services', lambda: self._run('systemctl', 'enable', *enable),
+                              ('install_packages',) if install else ()))
+        if disable:
+            steps.append(Step('disable_services', lambda: self._run('systemctl', 'disable', *disable)))
+        if 'ntp' in changed:
+            steps.append(Step('ntp', self._ntp))
+        if remove:
+            steps.append(Step('remove_packages', lambda: self._run('pacman', '-Rs', '--noconfirm', *remove),
+                              ('disable_services',) if disable else (), pacman))
+        return steps
+
+    def run(self) -> list[str]:
+        """Apply the changes and store the new configuration, returns the steps that ran."""
+        if unsupported := self.diff.unsupported:
+            raise ReconfigureError(f"Changing {', '.join(unsupported)} needs a new installation")
+
+        steps = self.steps()
+        if steps:
+            logger.info(f"Reconfiguring {self.root}: {', '.join(step.name for step in steps)}")
+            scheduler = StepScheduler(self.max_workers, self.tracer)
+            for step in steps:
+                scheduler.add(step)
+            scheduler.run()
+        else:
+            logger.info(f"{self.root} is up to date with the configuration")
+
+        store(self.root, self.new)
+        return [step.name for step in steps]
@@ -0,0 +1,142 @@
+import threading
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Callable, Iterable, Optional
+
+import logging
+
+from InstallTrace import Tracer, maybe_span
+
+logger = logging.getLogger(__name__)
+
+# Steps mostly wait on pacman, downloads and child processes, not on the CPU,
+# so the default does not depend on the CPU count (often 1 on a live VM)
+DEFAULT_MAX_WORKERS = 4
+
+# The step the current thread is running, InstallLogging tags log records with it
+current_step: ContextVar[Optional[str]] = ContextVar('current_step', default=None)
+
+
+class StepError(Exception):
+    """Raised when a scheduled step fails or the step graph is invalid."""
+
+    def __init__(self, message: str, step: Optional[str] = None):
+        super().__init__(message)
+        self.step = step  # The step that failed, if any
+
+
+@dataclass(frozen=True)
+class Step:
+    """
+    A single unit of installation work.
+
+    `requires` names the steps that must finish before this one starts.
+    `resources` names exclusive resources (e.g. the pacman database lock);
+    two steps sharing a resource never run at the same time.
+    """
+    name: str
+    action: Callable[[], None]
+    requires: tuple[str, ...] = ()
+    resources: frozenset[str] = field(default_factory=frozenset)
+
+
+class StepScheduler:
+    """
+    Runs a dependency graph of steps, executing independent steps
+    concurrently on a bounded thread pool.
+    """
+
+    def __init__(self, max_workers: Optional[int] = None, tracer: Optional[Tracer] = None,
+                 on_complete: Optional[Callable[[str], None]] = None):
+        self.max_workers = max_workers or DEFAULT_MAX_WORKERS
+        self.tracer = tracer
+        self.on_complete = on_complete  # Called with the step name after each successful step
+        self._steps: dict[str, Step] = {}
+
+    def add(self, step: Step) -> None:
+        if step.name in self._steps:
+            raise StepError(f"Duplicate step: {step.name}")
+        self._steps[step.name] = step
+
+    def order(self) -> list[str]:
+        """
+        Return the step names in a valid sequential (topological) order,
+        keeping declaration order among independent steps.
+        """
+        self._validate()
+        done: list[str] = []
+        pending = list(self._steps.values())
+        while pending:
+            for step in pending:
+                if all(dep in done for dep in step.requires):
+                    done.append(step.name)
+                    pending.remove(step)
+                    break
+            else:
+                names = ', '.join(step.name for step in pending)
+                raise StepError(f"Dependency cycle between steps: {names}")
+        return done
+
+    def run(self, skip: Iterable[str] = ()) -> None:
+        """
+        Execute all steps, except those in `skip` which count as already finished.
+        Stops scheduling new steps on the first failure, waits for the running
+        ones to finish and re-raises the error.
+        """
+        self.order()  # Validates the graph before anything runs
+
+        finished: set[str] = set(skip) & self._steps.keys()
+        waiting = [step for step in self._steps.values() if step.name not in finished]
+        running: dict[Future, Step] = {}
+        held: set[str] = set()
+        failure: Optional[BaseException] = None
+        failed_step: Optional[str] = None
+
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='step') as pool:
+            while waiting or running:
+                if failure is None:
+                    for step in list(waiting):
+                        if len(running) >= self.max_workers:
+                            break
+                        if not all(dep in finished for dep in step.requires):
+                            continue
+                        if step.resources & held:
+                            continue
+                        waiting.remove(step)
+                        held |= step.resources
+                        running[pool.submit(self._run_step, step)] = step
+
+                if not running:
+                    break
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    step = running.pop(future)
+                    held -= step.resources
+                    if (exc := future.exception()) is not None:
+                        if failure is None:
+                            failure, failed_step = exc, step.name
+                    else:
+                        finished.add(step.name)
+                        if self.on_complete is not None:
+                            self.on_complete(step.name)
+
+        if failure is not None:
+            raise StepError(f"Step '{failed_step}' failed: {failure}", failed_step) from failure
+
+    def _run_step(self, step: Step) -> None:
+        token = current_step.set(step.name)
+        try:
+            logger.debug(f"Starting step {step.name} on {threading.current_thread().name}")
+            with maybe_span(self.tracer, step.name):
+                step.action()
+            logger.debug(f"Finished step {step.name}")
+        finally:
+            current_step.reset(token)
+
+    def _validate(self) -> None:
+        for step in self._steps.values():
+            for dep in step.requires:
+                if dep not in self._steps:
+                    raise StepError(f"Step '{step.name}' requires unknown step '{dep}'")
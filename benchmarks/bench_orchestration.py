@@ -0,0 +1,154 @@
+"""
+Benchmarks for the orchestration layer: Installer.perform_installation
+against the recording fake archinstall backend, and DiskStatusHandler
+against a synthetic /sys/block tree with thousands of partitions.
+"""
+import contextlib
+import importlib
+import io
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+import pytest
+
+import fake_archinstall
+import InstallTrace
+from InstallTrace import Tracer
+
+DISKS = 250
+PARTITIONS_PER_DISK = 16
+
+
+@pytest.fixture
+def installer(tmp_path, monkeypatch):
+    monkeypatch.setattr(InstallTrace, 'TRACE_HISTORY', tmp_path / 'traces')
+    archinstall = fake_archinstall.install(tmp_path)
+    sys.modules.pop('Installer', None)
+    module = importlib.import_module('Installer')
+
+    def run(latency: float = 0.0, **config):
+        # Fresh state per round, so spans and calls don't pile up across rounds
+        module.tracer = Tracer()
+        fake_archinstall.recorder.reset()
+        fake_archinstall.recorder.latency = latency
+        archinstall.arguments.clear()
+        archinstall.arguments.update(fake_archinstall.arguments(**config))
+        start = time.perf_counter()
+        module.perform_installation(tmp_path / 'mnt')
+        return start
+
+    yield run
+
+    fake_archinstall.recorder.latency = 0.0
+    for name in [name for name in sys.modules if name == 'Installer' or name.startswith('archinstall')]:
+        del sys.modules[name]
+
+
+def test_scheduling_overhead(installer, benchmark):
+    """With zero-latency fakes the whole run is orchestration overhead."""
+    benchmark(installer)
+    benchmark.extra_info['installer_calls'] = len(fake_archinstall.recorder.calls)
+
+
+def test_parallel_steps(installer, benchmark):
+    """Every fake call sleeps; compare the wall time against running them back to back."""
+    latency = 0.01
+    benchmark.pedantic(installer, args=(latency,), rounds=3)
+    serial = len(fake_archinstall.recorder.calls) * latency
+    benchmark.extra_info['serial_estimate_s'] = round(serial, 3)
+
+
+def test_time_to_first_step(installer, benchmark):
+    """Time from calling perform_installation to the first installation step reaching archinstall."""
+    delays = []
+
+    def run():
+        start = installer()
+        delays.append(fake_archinstall.recorder.first('minimal_installation') - start)
+
+    benchmark(run)
+    benchmark.extra_info['time_to_first_step_ms'] = round(statistics.median(delays) * 1e3, 3)
+
+
+def test_large_package_and_command_lists(installer, benchmark):
+    """Memory and time with very large `packages` and `custom-commands` lists."""
+    config = {'packages': 20000, 'custom_commands': 5000, 'profile_packages': 2000}
+
+    tracemalloc.start()
+    try:
+        installer(**config)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    benchmark(installer, **config)
+    benchmark.extra_info['peak_memory_kib'] = peak // 1024
+
+
+def _synthetic_sysfs(root: Path) -> tuple[Path, Path]:
+    """
+    Build a fake /sys/block with DISKS disks of PARTITIONS_PER_DISK partitions
+    each, and a mountinfo that mounts the first partition of every disk.
+    """
+    sys_block = root / 'sys' / 'block'
+    mountpoint = root / 'mnt'
+    mountpoint.mkdir(parents=True)
+    mountinfo = []
+
+    for disk in range(DISKS):
+        name = f'sd{disk}'
+        disk_dir = sys_block / name
+        disk_dir.mkdir(parents=True)
+        (disk_dir / 'dev').write_text(f'8:{disk * 32}\n')
+        (disk_dir / 'size').write_text(f'{PARTITIONS_PER_DISK * 2048 * 1024}\n')
+
+        for number in range(1, PARTITIONS_PER_DISK + 1):
+            part_dir = disk_dir / f'{name}p{number}'
+            part_dir.mkdir()
+            (part_dir / 'dev').write_text(f'8:{disk * 32 + number}\n')
+            (part_dir / 'size').write_text(f'{2048 * 1024}\n')
+            (part_dir / 'partition').write_text(f'{number}\n')
+
+        mountinfo.append(f'{100 + disk} 1 8:{disk * 32 + 1} / {mountpoint} rw,relatime - ext4 /dev/{name}p1 rw')
+
+    mountinfo_path = root / 'mountinfo'
+    mountinfo_path.write_text('\n'.join(mountinfo) + '\n')
+    return sys_block, mountinfo_path
+
+
+@pytest.fixture
+def disk_preview(tmp_path, monkeypatch):
+    pytest.importorskip('psutil')
+    import DiskPreview
+
+    sys_block, mountinfo = _synthetic_sysfs(tmp_path)
+    monkeypatch.setattr(DiskPreview, 'SYS_BLOCK', sys_block)
+    monkeypatch.setattr(DiskPreview, 'MOUNTINFO', mountinfo)
+
+    # A fake smartctl that answers instantly with a healthy drive
+    bin_dir = tmp_path / 'bin'
+    bin_dir.mkdir()
+    smartctl = bin_dir / 'smartctl'
+    smartctl.write_text('#!/bin/sh\necho \'{"smart_status": {"passed": true}, "temperature": {"current": 30}}\'\n')
+    smartctl.chmod(0o755)
+    monkeypatch.setenv('PATH', f"{bin_dir}{os.pathsep}{os.environ['PATH']}")
+
+    return DiskPreview
+
+
+def test_disk_inventory(disk_preview, benchmark):
+    handler = benchmark(disk_preview.DiskStatusHandler)
+    benchmark.extra_info['partitions'] = sum(len(disk['partitions']) for disk in handler.disks)
+
+
+def test_disk_status_report(disk_preview, benchmark):
+    def report():
+        disk_preview._smart_cache.clear()  # Cold cache: every disk is probed
+        with contextlib.redirect_stdout(io.StringIO()):
+            disk_preview.DiskStatusHandler().get_disk_status()
+
+    benchmark.pedantic(report, rounds=3)
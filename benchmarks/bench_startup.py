@@ -0,0 +1,103 @@
+"""
+Startup budget of the installer entry point, measured with `-X importtime`.
+
+Importing Installer.py must not pull in archinstall or the modules only the
+installation itself needs, so `--help` and `--dry-run` stay near-instant on
+a live ISO booting from USB.
+"""
+import json
+import os
+import subprocess
+import sys
+import textwrap
+import time
+
+from conftest import ROOT
+
+# Cumulative import time of Installer.py, a few times what a laptop needs
+STARTUP_BUDGET_US = 250_000
+
+# Wall time of a --dry-run up to the printed plan, against the fake archinstall
+DRY_RUN_BUDGET_S = 2.0
+
+# Only the installation itself needs these, a --dry-run must not load them
+NOT_FOR_DRY_RUN = {'FormatEngine', 'GoldenImage', 'MirrorRanking', 'PostInstall', 'Reconfigure', 'asyncio', 'ssl'}
+
+# Loaded on first use only
+LAZY_MODULES = {'archinstall', 'FormatEngine', 'GoldenImage', 'HardwareInventory', 'InstallLogging', 'InstallPlan', 'LayoutOptimizer', 'MirrorRanking', 'PostInstall', 'Reconfigure', 'asyncio', 'ssl', 'tarfile'}
+
+
+def _import_times() -> dict[str, int]:
+    """Cumulative import time in microseconds of every module `import Installer` loads."""
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', 'import Installer'],
+        cwd=ROOT, env={**os.environ, 'PYTHONPATH': str(ROOT)},
+        stderr=subprocess.PIPE, text=True, check=True
+    )
+
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        _, cumulative, name = line.split(':', 1)[1].split('|')
+        times[name.strip()] = int(cumulative)
+    return times
+
+
+def test_import_time_budget(benchmark):
+    times = benchmark.pedantic(_import_times, rounds=3)
+
+    loaded = {name.split('.')[0] for name in times}
+    assert not loaded & LAZY_MODULES, f"imported eagerly: {sorted(loaded & LAZY_MODULES)}"
+    assert times['Installer'] <= STARTUP_BUDGET_US, f"Installer imports in {times['Installer']} us"
+    benchmark.extra_info['import_ms'] = round(times['Installer'] / 1e3, 1)
+
+
+def test_help_without_archinstall(benchmark):
+    """--help answers before archinstall is imported, even when it is not installed."""
+    def run():
+        return subprocess.run(
+            [sys.executable, str(ROOT / 'Installer.py'), '--help'],
+            cwd=ROOT, stdout=subprocess.PIPE, text=True, check=True
+        )
+
+    result = benchmark(run)
+    assert result.stdout.startswith('usage:')
+
+
+DRY_RUN = textwrap.dedent("""
+    import json, sys
+    from pathlib import Path
+
+    import fake_archinstall
+
+    archinstall = fake_archinstall.install(Path(sys.argv[1]))
+    archinstall.arguments.update(fake_archinstall.arguments(), dry_run=True)
+
+    import Installer
+
+    try:
+        Installer.main()
+    except SystemExit:
+        pass
+    print(json.dumps(sorted(sys.modules)), file=sys.stderr)
+""")
+
+
+def test_dry_run(benchmark, tmp_path):
+    """--dry-run compiles the plan without loading what only the installation needs."""
+    def run():
+        start = time.perf_counter()
+        result = subprocess.run(
+            [sys.executable, '-c', DRY_RUN, str(tmp_path)],
+            cwd=ROOT, env={**os.environ, 'PYTHONPATH': os.pathsep.join([str(ROOT), str(ROOT / 'benchmarks')])},
+            stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, check=True
+        )
+        return result, time.perf_counter() - start
+
+    result, seconds = benchmark.pedantic(run, rounds=3)
+
+    assert seconds <= DRY_RUN_BUDGET_S, f"--dry-run took {seconds:.2f} s"
+    assert json.loads(result.stdout)['steps']
+    loaded = {name.split('.')[0] for name in json.loads(result.stderr.splitlines()[-1])}
+    assert not loaded & NOT_FOR_DRY_RUN, f"loaded for --dry-run: {sorted(loaded & NOT_FOR_DRY_RUN)}"
@@ -0,0 +1,68 @@
+"""
+Orchestration benchmarks, run with `python -m pytest benchmarks`.
+
+The suite uses pytest-benchmark's `benchmark` fixture when the plugin is
+installed. Without it, a minimal fixture with the same calling convention
+times a few rounds and prints a summary at the end of the run.
+"""
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import Any, Callable
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / 'v0.0.0'))
+
+ROUNDS = 5
+
+
+def pytest_collect_file(file_path: Path, parent: pytest.Collector):
+    if file_path.suffix == '.py' and file_path.name.startswith('bench_'):
+        return pytest.Module.from_parent(parent, path=file_path)
+    return None
+
+
+try:
+    import pytest_benchmark  # noqa: F401
+except ImportError:
+    _results: list[tuple[str, list[float], dict]] = []
+
+    class _Benchmark:
+        def __init__(self, name: str):
+            self.name = name
+            self.extra_info: dict[str, Any] = {}
+
+        def __call__(self, function: Callable, *args: Any, **kwargs: Any) -> Any:
+            return self.pedantic(function, args=args, kwargs=kwargs, rounds=ROUNDS)
+
+        def pedantic(self, function: Callable, args: tuple = (), kwargs: dict = None,
+                     setup: Callable = None, rounds: int = ROUNDS, **_: Any) -> Any:
+            timings = []
+            result = None
+            for _ in range(rounds):
+                if setup is not None:
+                    setup()
+                start = time.perf_counter()
+                result = function(*args, **(kwargs or {}))
+                timings.append(time.perf_counter() - start)
+            _results.append((self.name, timings, self.extra_info))
+            return result
+
+    @pytest.fixture
+    def benchmark(request: pytest.FixtureRequest) -> _Benchmark:
+        return _Benchmark(request.node.name)
+
+    def pytest_terminal_summary(terminalreporter: Any) -> None:
+        if not _results:
+            return
+        terminalreporter.section('benchmarks')
+        terminalreporter.write_line(f"{'Name':<45} {'Min (ms)':>10} {'Mean (ms)':>10}  Extra")
+        for name, timings, extra in _results:
+            extra_text = ', '.join(f"{key}={value}" for key, value in extra.items())
+            terminalreporter.write_line(
+                f"{name:<45} {min(timings) * 1e3:>10.2f} {statistics.mean(timings) * 1e3:>10.2f}  {extra_text}"
+            )
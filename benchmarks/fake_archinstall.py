@@ -0,0 +1,225 @@
+"""
+Recording stand-ins for the parts of archinstall that Installer.py uses.
+
+install() registers the fakes in sys.modules so Installer.py can be
+imported without archinstall, a live ISO or a real disk. Every call made
+on the fake Installer is recorded with its start time, and each method
+can be given an artificial latency to model slow pacman or chroot calls.
+"""
+import enum
+import json
+import sys
+import threading
+import time
+import types
+from pathlib import Path
+from typing import Any, Optional
+
+
+class Recorder:
+    """Thread-safe log of (method, start time, args) and per-method latency."""
+
+    def __init__(self, latency: float = 0.0, latencies: Optional[dict[str, float]] = None):
+        self.latency = latency
+        self.latencies = latencies or {}
+        self.calls: list[tuple[str, float, tuple]] = []
+        self._lock = threading.Lock()
+
+    def record(self, name: str, args: tuple) -> None:
+        with self._lock:
+            self.calls.append((name, time.perf_counter(), args))
+        if delay := self.latencies.get(name, self.latency):
+            time.sleep(delay)
+
+    def names(self) -> list[str]:
+        return [name for name, _, _ in self.calls]
+
+    def first(self, name: str) -> Optional[float]:
+        return next((start for call, start, _ in self.calls if call == name), None)
+
+    def reset(self) -> None:
+        with self._lock:
+            self.calls.clear()
+
+
+recorder = Recorder()
+
+
+class FakeInstaller:
+    def __init__(self, mountpoint: Path, disk_config: Any, disk_encryption: Any = None, kernels: Any = None):
+        self.target = mountpoint
+        recorder.record('__init__', (mountpoint,))
+
+    def __enter__(self) -> 'FakeInstaller':
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        recorder.record('__exit__', ())
+
+    def __getattr__(self, name: str) -> Any:
+        def method(*args: Any, **kwargs: Any) -> None:
+            recorder.record(name, args)
+        return method
+
+
+class FakeFilesystemHandler:
+    def __init__(self, disk_config: Any, disk_encryption: Any = None):
+        pass
+
+    def perform_filesystem_operations(self) -> None:
+        recorder.record('perform_filesystem_operations', ())
+
+
+class DiskLayoutType(enum.Enum):
+    Default = 'default_layout'
+    Manual = 'manual_partitioning'
+    Pre_mount = 'pre_mounted_config'
+
+
+class EncryptionType(enum.Enum):
+    NoEncryption = 'no_encryption'
+    Luks = 'luks'
+
+
+class Bootloader(enum.Enum):
+    Systemd = 'Systemd-boot'
+    Grub = 'Grub'
+
+
+class FakeDiskLayoutConfiguration:
+    def __init__(self, config_type: DiskLayoutType = DiskLayoutType.Default):
+        self.config_type = config_type
+
+
+class FakeAudioConfiguration:
+    audio = 'pipewire'
+
+    def install_audio_config(self, installation: Any) -> None:
+        installation.add_additional_packages(['pipewire', 'pipewire-pulse', 'wireplumber'])
+
+
+class FakeNetworkConfiguration:
+    type = 'nm'
+
+    def install_network_config(self, installation: Any, profile_config: Any) -> None:
+        installation.add_additional_packages(['networkmanager'])
+        installation.enable_service('NetworkManager.service')
+
+
+class FakeProfile:
+    def __init__(self, packages: list[str]):
+        self.packages = packages
+
+    def is_desktop_profile(self) -> bool:
+        return True
+
+    def post_install(self, installation: Any) -> None:
+        recorder.record('post_install', ())
+
+
+class FakeProfileConfiguration:
+    def __init__(self, packages: list[str]):
+        self.profile = FakeProfile(packages)
+        self.gfx_driver = None
+        self.greeter = 'gdm'
+
+
+class FakeProfileHandler:
+    def install_profile_config(self, installation: Any, profile_config: FakeProfileConfiguration) -> None:
+        installation.add_additional_packages(profile_config.profile.packages)
+        installation.add_additional_packages(['gdm'])
+        installation.enable_service('gdm')
+
+
+class FakeGlobalMenu:
+    def __init__(self, data_store: dict):
+        pass
+
+    def enable(self, *args: Any, **kwargs: Any) -> None:
+        pass
+
+    def run(self) -> None:
+        pass
+
+
+class FakeConfigurationOutput:
+    def __init__(self, config: dict):
+        self.config = config
+
+    def show(self) -> None:
+        pass
+
+    def save(self, dest_path: Optional[Path] = None) -> None:
+        pass
+
+    def user_config_to_json(self) -> str:
+        return json.dumps(self.config, default=str)
+
+
+def _module(name: str, **attrs: Any) -> types.ModuleType:
+    module = types.ModuleType(name)
+    module.__dict__.update(attrs)
+    sys.modules[name] = module
+    return module
+
+
+def install(log_path: Path) -> types.ModuleType:
+    """Register the fake archinstall modules and return the top-level package."""
+    noop = lambda *args, **kwargs: None  # noqa: E731
+
+    disk = _module(
+        'archinstall.lib.disk',
+        DiskLayoutType=DiskLayoutType,
+        EncryptionType=EncryptionType,
+        DiskLayoutConfiguration=FakeDiskLayoutConfiguration,
+        DiskEncryption=object,
+        FilesystemHandler=FakeFilesystemHandler,
+        disk_layouts=lambda: '',
+    )
+    locale = _module('archinstall.lib.locale', LocaleConfiguration=object)
+    lib = _module('archinstall.lib', disk=disk, locale=locale)
+    _module('archinstall.lib.global_menu', GlobalMenu=FakeGlobalMenu)
+    _module('archinstall.lib.configuration', ConfigurationOutput=FakeConfigurationOutput)
+    _module('archinstall.lib.installer', Installer=FakeInstaller)
+    _module('archinstall.lib.models', AudioConfiguration=FakeAudioConfiguration, Bootloader=Bootloader)
+    _module('archinstall.lib.models.network_configuration', NetworkConfiguration=FakeNetworkConfiguration)
+    _module('archinstall.lib.profile')
+    _module('archinstall.lib.profile.profiles_handler', profile_handler=FakeProfileHandler())
+
+    return _module(
+        'archinstall',
+        lib=lib,
+        arguments={},
+        storage={'LOG_PATH': log_path, 'MOUNT_POINT': Path('/mnt')},
+        info=noop,
+        debug=noop,
+        warn=noop,
+        SysInfo=types.SimpleNamespace(has_uefi=lambda: True),
+        accessibility_tools_in_use=lambda: False,
+        run_custom_user_commands=lambda commands, installation: recorder.record('custom_commands', (len(commands),)),
+    )
+
+
+def arguments(packages: int = 4, custom_commands: int = 3, profile_packages: int = 40) -> dict:
+    """A silent-install configuration with synthetic package and command lists."""
+    return {
+        'silent': True,
+        'skip_mirror_ranking': True,
+        'parallel downloads': 5,  # Keeps the benchmarks away from the host's pacman.conf
+        'disk_config': FakeDiskLayoutConfiguration(),
+        'locale_config': object(),
+        'bootloader': Bootloader.Grub,
+        'hostname': 'bench',
+        'kernels': ['linux'],
+        '!root-password': 'root',
+        '!users': ['bench'],
+        'audio_config': FakeAudioConfiguration(),
+        'network_config': FakeNetworkConfiguration(),
+        'profile_config': FakeProfileConfiguration([f'profile-pkg-{i}' for i in range(profile_packages)]),
+        'packages': [f'pkg-{i}' for i in range(packages)],
+        'services': ['docker', 'sshd'],
+        'timezone': 'Europe/Stockholm',
+        'ntp': True,
+        'swap': True,
+        'custom-commands': [f'echo {i}' for i in range(custom_commands)],
+    }
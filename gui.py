@@ -1,136 +1,357 @@
-import sys import os from pathlib import Path
-
-from PyQt5.QtWidgets import ( QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, QLabel, QLineEdit, QPushButton, QFileDialog, QMessageBox, QComboBox, QCheckBox, QTextEdit, QTabWidget )
-
-from archinstall import SysInfo from archinstall.lib.args import arch_config_handler from archinstall.lib.configuration import ConfigurationOutput from archinstall.lib.disk.filesystem import FilesystemHandler from archinstall.lib.installer import Installer, accessibility_tools_in_use, run_custom_user_commands from archinstall.lib.global_menu import GlobalMenu from archinstall.lib.interactions.general_conf import PostInstallationAction, ask_post_installation from archinstall.lib.models import Bootloader from archinstall.lib.models.device_model import DiskLayoutType, EncryptionType from archinstall.lib.models.users import User from archinstall.lib.profile.profiles_handler import profile_handler from archinstall.tui import Tui from archinstall.lib.output import info, error, debug
-
-class MaiBloomOS(QMainWindow): def init(self): super().init() self.setWindowTitle("Mai Bloom OS Installer") self.setGeometry(100, 100, 800, 600)
-
-self.tabs = QTabWidget()
-    self.setCentralWidget(self.tabs)
-
-    self.disk_tab = DiskConfigTab()
-    self.user_tab = UserConfigTab()
-    self.options_tab = OptionsTab()
-    self.install_tab = InstallTab()
-
-    self.tabs.addTab(self.disk_tab, "Disk")
-    self.tabs.addTab(self.user_tab, "Users")
-    self.tabs.addTab(self.options_tab, "Options")
-    self.tabs.addTab(self.install_tab, "Install")
-
-class DiskConfigTab(QWidget): def init(self): super().init() layout = QVBoxLayout()
-
-# Mountpoint Selection
-    mount_layout = QHBoxLayout()
-    mount_layout.addWidget(QLabel("Mountpoint:"))
-    self.mount_edit = QLineEdit()
-    mount_layout.addWidget(self.mount_edit)
-    browse_btn = QPushButton("Browse")
-    browse_btn.clicked.connect(self.browse_mount)
-    mount_layout.addWidget(browse_btn)
-    layout.addLayout(mount_layout)
-
-    # Encryption
-    self.encrypt_check = QCheckBox("Enable Encryption")
-    layout.addWidget(self.encrypt_check)
-
-    self.setLayout(layout)
-
-def browse_mount(self):
-    directory = QFileDialog.getExistingDirectory(self, "Select Mountpoint")
-    if directory:
-        self.mount_edit.setText(directory)
-
-class UserConfigTab(QWidget): def init(self): super().init() layout = QVBoxLayout()
-
-layout.addWidget(QLabel("Root Password:"))
-    self.root_pw = QLineEdit()
-    self.root_pw.setEchoMode(QLineEdit.Password)
-    layout.addWidget(self.root_pw)
-
-    layout.addWidget(QLabel("New User Name:"))
-    self.username = QLineEdit()
-    layout.addWidget(self.username)
-
-    layout.addWidget(QLabel("User Password:"))
-    self.user_pw = QLineEdit()
-    self.user_pw.setEchoMode(QLineEdit.Password)
-    layout.addWidget(self.user_pw)
-
-    self.setLayout(layout)
-
-class OptionsTab(QWidget): def init(self): super().init() layout = QVBoxLayout()
-
-layout.addWidget(QLabel("Bootloader:"))
-    self.boot_combo = QComboBox()
-    for bl in Bootloader:
-        self.boot_combo.addItem(bl.name, bl)
-    layout.addWidget(self.boot_combo)
-
-    self.dry_run = QCheckBox("Dry Run")
-    layout.addWidget(self.dry_run)
-    self.silent = QCheckBox("Silent Mode")
-    layout.addWidget(self.silent)
-    self.setLayout(layout)
-
-class InstallTab(QWidget): def init(self): super().init() layout = QVBoxLayout()
-
-self.log_output = QTextEdit()
-    self.log_output.setReadOnly(True)
-    layout.addWidget(self.log_output)
-
-    install_btn = QPushButton("Start Installation")
-    install_btn.clicked.connect(self.start_install)
-    layout.addWidget(install_btn)
-
-    self.setLayout(layout)
-
-def start_install(self):
-    try:
-        # Collect config from tabs
-        mount = Path(
-            self.parentWidget().disk_tab.mount_edit.text() or '/mnt')
-        arch_config_handler.config.disk_config.mountpoint = mount
-        arch_config_handler.config.disk_encryption = (
-            EncryptionType.Luks if self.parentWidget().disk_tab.encrypt_check.isChecked()
-            else EncryptionType.NoEncryption
-        )
-
-        # User config
-        root_pw = self.parentWidget().user_tab.root_pw.text()
-        if root_pw:
-            arch_config_handler.config.root_enc_password = root_pw
-
-        username = self.parentWidget().user_tab.username.text()
-        user_pw = self.parentWidget().user_tab.user_pw.text()
-        if username and user_pw:
-            arch_config_handler.config.users = [User(username, user_pw, False)]
-
-        # Options
-        arch_config_handler.args.dry_run = self.parentWidget().options_tab.dry_run.isChecked()
-        arch_config_handler.args.silent = self.parentWidget().options_tab.silent.isChecked()
-        arch_config_handler.config.bootloader = self.parentWidget().options_tab.boot_combo.currentData()
-
-        # Perform install
+import sys
+import os
+import logging
+import threading
+from collections import deque
+from pathlib import Path
+
+from PyQt5.QtCore import QThread, QTimer, pyqtSignal
+from PyQt5.QtWidgets import (
+    QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, QLabel, QLineEdit, QPushButton,
+    QFileDialog, QMessageBox, QComboBox, QCheckBox, QPlainTextEdit, QTabWidget, QProgressBar
+)
+
+from archinstall.lib.args import arch_config_handler
+from archinstall.lib.configuration import ConfigurationOutput
+from archinstall.lib.disk.filesystem import FilesystemHandler
+from archinstall.lib.installer import Installer, run_custom_user_commands
+from archinstall.lib.global_menu import GlobalMenu
+from archinstall.lib.interactions.general_conf import PostInstallationAction, ask_post_installation
+from archinstall.lib.models import Bootloader
+from archinstall.lib.models.device_model import DiskLayoutType, EncryptionType
+from archinstall.lib.models.users import User
+from archinstall.lib.profile.profiles_handler import profile_handler
+from archinstall.tui import Tui
+from archinstall.lib.output import info, error, debug
+from archinstall.lib.storage import storage
+
+from HardwareInventory import inventory
+from InstallLogging import OUTPUT_LOGGER, OutputToLog
+
+LOG_VIEW_LINES = 5000  # Lines kept in the log view, older ones are dropped
+LOG_FLUSH_INTERVAL_MS = 100  # How often queued log lines are appended to the view
+LOG_FORMAT = '%(asctime)s %(levelname)s %(message)s'
+
+
+class MaiBloomOS(QMainWindow):
+    def __init__(self):
+        super().__init__()
+        self.setWindowTitle("Mai Bloom OS Installer")
+        self.setGeometry(100, 100, 800, 600)
+
+        self.tabs = QTabWidget()
+        self.setCentralWidget(self.tabs)
+
+        self.disk_tab = DiskConfigTab()
+        self.user_tab = UserConfigTab()
+        self.options_tab = OptionsTab()
+        self.install_tab = InstallTab()
+
+        self.tabs.addTab(self.disk_tab, "Disk")
+        self.tabs.addTab(self.user_tab, "Users")
+        self.tabs.addTab(self.options_tab, "Options")
+        self.tabs.addTab(self.install_tab, "Install")
+
+
+class DiskConfigTab(QWidget):
+    def __init__(self):
+        super().__init__()
+        layout = QVBoxLayout()
+
+        # Mountpoint Selection
+        mount_layout = QHBoxLayout()
+        mount_layout.addWidget(QLabel("Mountpoint:"))
+        self.mount_edit = QLineEdit()
+        mount_layout.addWidget(self.mount_edit)
+        browse_btn = QPushButton("Browse")
+        browse_btn.clicked.connect(self.browse_mount)
+        mount_layout.addWidget(browse_btn)
+        layout.addLayout(mount_layout)
+
+        # Encryption
+        self.encrypt_check = QCheckBox("Enable Encryption")
+        layout.addWidget(self.encrypt_check)
+
+        self.setLayout(layout)
+
+    def browse_mount(self):
+        directory = QFileDialog.getExistingDirectory(self, "Select Mountpoint")
+        if directory:
+            self.mount_edit.setText(directory)
+
+
+class UserConfigTab(QWidget):
+    def __init__(self):
+        super().__init__()
+        layout = QVBoxLayout()
+
+        layout.addWidget(QLabel("Root Password:"))
+        self.root_pw = QLineEdit()
+        self.root_pw.setEchoMode(QLineEdit.Password)
+        layout.addWidget(self.root_pw)
+
+        layout.addWidget(QLabel("New User Name:"))
+        self.username = QLineEdit()
+        layout.addWidget(self.username)
+
+        layout.addWidget(QLabel("User Password:"))
+        self.user_pw = QLineEdit()
+        self.user_pw.setEchoMode(QLineEdit.Password)
+        layout.addWidget(self.user_pw)
+
+        self.setLayout(layout)
+
+
+class OptionsTab(QWidget):
+    def __init__(self):
+        super().__init__()
+        layout = QVBoxLayout()
+
+        layout.addWidget(QLabel("Bootloader:"))
+        self.boot_combo = QComboBox()
+        for bl in Bootloader:
+            self.boot_combo.addItem(bl.name, bl)
+        layout.addWidget(self.boot_combo)
+
+        self.dry_run = QCheckBox("Dry Run")
+        layout.addWidget(self.dry_run)
+        self.silent = QCheckBox("Silent Mode")
+        layout.addWidget(self.silent)
+        self.setLayout(layout)
+
+
+class LogViewHandler(logging.Handler):
+    """
+    Feeds log records into a QPlainTextEdit without stalling the UI.
+    Records are queued from any thread and appended in one batch per
+    timer tick on the main thread. Only the last LOG_VIEW_LINES lines are
+    kept, in the queue as well as in the view.
+    """
+
+    def __init__(self, view: QPlainTextEdit):
+        super().__init__()
+        self.view = view
+        self.view.setMaximumBlockCount(LOG_VIEW_LINES)
+        self._pending = deque(maxlen=LOG_VIEW_LINES)
+        self._pending_lock = threading.Lock()
+
+        self._timer = QTimer(view)
+        self._timer.timeout.connect(self.flush_to_view)
+        self._timer.start(LOG_FLUSH_INTERVAL_MS)
+
+    def emit(self, record: logging.LogRecord):
+        try:
+            line = self.format(record)
+        except Exception:
+            self.handleError(record)
+            return
+        with self._pending_lock:
+            self._pending.append(line)
+
+    def flush_to_view(self):
+        with self._pending_lock:
+            if not self._pending:
+                return
+            lines, self._pending = self._pending, deque(maxlen=LOG_VIEW_LINES)
+        self.view.appendPlainText('\n'.join(lines))
+
+
+class InstallWorker(QThread):
+    """
+    Runs the installation off the Qt main thread. Progress, step transitions
+    and errors are reported back through signals, which Qt delivers on the
+    main thread, so the UI stays responsive for the whole install.
+    """
+    progress = pyqtSignal(int, str)  # Percentage, message
+    step_changed = pyqtSignal(str)
+    failed = pyqtSignal(str)
+    cancelled = pyqtSignal()
+    cancellable = pyqtSignal(bool)  # Whether Cancel can still stop the installation
+    succeeded = pyqtSignal()
+
+    def __init__(self, mount: Path, dry_run: bool):
+        super().__init__()
+        self.mount = mount
+        self.dry_run = dry_run
+
+    def run(self):
+        # (name, action, whether Cancel still works once the step has started)
+        steps = [
+            # Probed once here, off the UI thread, and shared by every later step
+            ("Detecting hardware", inventory, True),
+            ("Saving configuration", self._save_config, True),
+        ]
+        if not self.dry_run:
+            steps.append(("Preparing disks", self._prepare_disks, True))
+        # The installation runs as one long call that can't be stopped part way, Cancel is
+        # disabled for it rather than appearing to work and only taking effect at the end
+        steps.append(("Installing", lambda: perform_installation(self.mount), False))
+
+        try:
+            for index, (name, action, cancellable) in enumerate(steps):
+                # Cancelling takes effect between steps, a running step is never interrupted half-way
+                if self.isInterruptionRequested():
+                    info("Installation cancelled")
+                    self.cancelled.emit()
+                    return
+
+                self.cancellable.emit(cancellable)
+                self.step_changed.emit(name)
+                self.progress.emit(index * 100 // len(steps), name)
+                action()
+
+            self.progress.emit(100, "Done")
+            self.succeeded.emit()
+        except Exception as e:
+            error(f"Installation failed: {e}")
+            self.failed.emit(str(e))
+
+    def _save_config(self):
         config = ConfigurationOutput(arch_config_handler.config)
         config.write_debug()
         config.save()
 
-        if not arch_config_handler.args.dry_run:
-            fs_handler = FilesystemHandler(
-                arch_config_handler.config.disk_config,
-                arch_config_handler.config.disk_encryption,
+    def _prepare_disks(self):
+        fs_handler = FilesystemHandler(
+            arch_config_handler.config.disk_config,
+            arch_config_handler.config.disk_encryption,
+        )
+        fs_handler.perform_filesystem_operations()
+
+
+class InstallTab(QWidget):
+    def __init__(self):
+        super().__init__()
+        layout = QVBoxLayout()
+        self.worker = None
+
+        self.log_output = QPlainTextEdit()
+        self.log_output.setReadOnly(True)
+        layout.addWidget(self.log_output)
+        self._attach_logging()
+
+        self.step_label = QLabel()
+        layout.addWidget(self.step_label)
+        self.progress_bar = QProgressBar()
+        layout.addWidget(self.progress_bar)
+
+        buttons = QHBoxLayout()
+        self.install_btn = QPushButton("Start Installation")
+        self.install_btn.clicked.connect(self.start_install)
+        buttons.addWidget(self.install_btn)
+        self.cancel_btn = QPushButton("Cancel")
+        self.cancel_btn.setEnabled(False)
+        self.cancel_btn.clicked.connect(self.cancel_install)
+        buttons.addWidget(self.cancel_btn)
+        layout.addLayout(buttons)
+
+        self.setLayout(layout)
+
+    def _attach_logging(self):
+        """
+        Stream the installer output into the log view, and the full log to disk.
+        """
+        formatter = logging.Formatter(LOG_FORMAT)
+        root = logging.getLogger()
+        root.setLevel(logging.INFO)
+
+        view_handler = LogViewHandler(self.log_output)
+        view_handler.setFormatter(formatter)
+        root.addHandler(view_handler)
+
+        log_dir = Path(storage.get('LOG_PATH', '/var/log/archinstall'))
+        log_dir.mkdir(parents=True, exist_ok=True)
+        file_handler = logging.FileHandler(log_dir / 'maiarch-gui.log')
+        file_handler.setFormatter(formatter)
+        root.addHandler(file_handler)
+
+        # The handlers above log to the real stderr on failure, never back into stdout
+        sys.stdout = OutputToLog(sys.stdout, logging.getLogger(OUTPUT_LOGGER), tee=True)
+
+    def start_install(self):
+        # The tabs live in a QTabWidget, window() is the MaiBloomOS instance
+        window = self.window()
+        try:
+            # Collect config from tabs, widgets may only be read on the main thread
+            mount = Path(window.disk_tab.mount_edit.text() or '/mnt')
+            arch_config_handler.config.disk_config.mountpoint = mount
+            arch_config_handler.config.disk_encryption = (
+                EncryptionType.Luks if window.disk_tab.encrypt_check.isChecked()
+                else EncryptionType.NoEncryption
             )
-            fs_handler.perform_filesystem_operations()
 
-        perform_installation(mount)
+            # User config
+            root_pw = window.user_tab.root_pw.text()
+            if root_pw:
+                arch_config_handler.config.root_enc_password = root_pw
+
+            username = window.user_tab.username.text()
+            user_pw = window.user_tab.user_pw.text()
+            if username and user_pw:
+                arch_config_handler.config.users = [User(username, user_pw, False)]
+
+            # Options
+            arch_config_handler.args.dry_run = window.options_tab.dry_run.isChecked()
+            arch_config_handler.args.silent = window.options_tab.silent.isChecked()
+            arch_config_handler.config.bootloader = window.options_tab.boot_combo.currentData()
+        except Exception as e:
+            error(f"Installation failed: {e}")
+            QMessageBox.critical(self, "Error", str(e))
+            return
+
+        # Perform install in the background
+        self.worker = InstallWorker(mount, arch_config_handler.args.dry_run)
+        self.worker.progress.connect(self.on_progress)
+        self.worker.step_changed.connect(self.step_label.setText)
+        self.worker.succeeded.connect(self.on_succeeded)
+        self.worker.failed.connect(self.on_failed)
+        self.worker.cancelled.connect(self.on_cancelled)
+        self.worker.cancellable.connect(self.on_cancellable)
+        self.worker.finished.connect(self.on_finished)
+
+        self.install_btn.setEnabled(False)
+        self.cancel_btn.setEnabled(True)
+        self.worker.start()
+
+    def cancel_install(self):
+        if self.worker is not None:
+            self.worker.requestInterruption()
+            self.cancel_btn.setEnabled(False)
+            self.step_label.setText("Cancelling after the current step...")
+
+    def on_cancellable(self, cancellable: bool):
+        if self.worker is not None and not self.worker.isInterruptionRequested():
+            self.cancel_btn.setEnabled(cancellable)
+
+    def on_progress(self, percent: int, message: str):
+        self.progress_bar.setValue(percent)
+        self.progress_bar.setFormat(f"%p% - {message}")
+
+    def on_succeeded(self):
         QMessageBox.information(self, "Success", "Installation completed.")
-    except Exception as e:
-        error(f"Installation failed: {e}")
-        QMessageBox.critical(self, "Error", str(e))
 
-def perform_installation(mountpoint: Path) -> None: info("Starting installation...") # Copy the function body from existing script from archinstall.lib.models import Bootloader as BL from archinstall.lib.disk.utils import disk_layouts # ... include full implementation as needed ...
+    def on_failed(self, message: str):
+        QMessageBox.critical(self, "Error", message)
+
+    def on_cancelled(self):
+        self.step_label.setText("Installation cancelled")
+
+    def on_finished(self):
+        self.install_btn.setEnabled(True)
+        self.cancel_btn.setEnabled(False)
+        self.worker = None
+
+
+def perform_installation(mountpoint: Path) -> None:
+    info("Starting installation...")
+    # Copy the function body from existing script
+    from archinstall.lib.models import Bootloader as BL
+    from archinstall.lib.disk.utils import disk_layouts
+    # ... include full implementation as needed ...
 
-if name == 'main': app = QApplication(sys.argv) window = MaiBloomOS() window.show() sys.exit(app.exec_())
 
+if __name__ == '__main__':
+    app = QApplication(sys.argv)
+    window = MaiBloomOS()
+    window.show()
+    sys.exit(app.exec_())
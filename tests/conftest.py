@@ -0,0 +1,14 @@
+"""
+Unit tests, run with `python -m pytest tests`.
+
+They need neither archinstall nor a live ISO: modules are imported from the
+repository root, and archinstall is replaced where needed by the fake the
+benchmarks use.
+"""
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / 'v0.0.0'))
+sys.path.insert(0, str(ROOT / 'benchmarks'))
@@ -0,0 +1,69 @@
+import os
+
+import pytest
+
+import BlockImager
+from BlockImager import CHUNK_SIZE, BlockImager as Imager, ImagingError, data_extents
+
+MIB = 1024 ** 2
+
+
+@pytest.fixture
+def sparse_image(tmp_path):
+    """A 64 MiB sparse file: data at 0 and 40 MiB, a written all-zero chunk at 16 MiB, holes elsewhere."""
+    path = tmp_path / 'source.img'
+    with open(path, 'wb') as image:
+        image.truncate(64 * MIB)
+        image.seek(0)
+        image.write(os.urandom(MIB + 123))
+        image.seek(16 * MIB)
+        image.write(bytes(CHUNK_SIZE))
+        image.seek(40 * MIB)
+        image.write(os.urandom(3 * MIB))
+    return path
+
+
+def test_sparse_round_trip(tmp_path, sparse_image):
+    target = tmp_path / 'target.img'
+    reports = []
+
+    result = Imager(sparse_image, target, on_progress=reports.append).run()
+
+    assert target.read_bytes() == sparse_image.read_bytes()
+    assert result.size == 64 * MIB
+    assert result.verified
+    # Only the data is copied, the written zeros and the holes are skipped
+    assert result.copied <= MIB + 123 + 3 * MIB + 2 * 4096
+    assert target.stat().st_blocks * 512 < 8 * MIB
+    assert reports[-1].done == reports[-1].total == 64 * MIB
+
+
+def test_data_extents_skip_holes(sparse_image):
+    fd = os.open(sparse_image, os.O_RDONLY)
+    try:
+        extents = list(data_extents(fd, os.fstat(fd).st_size))
+    finally:
+        os.close(fd)
+    assert sum(end - start for start, end in extents) < 32 * MIB
+
+
+def test_same_digest_for_the_same_data(tmp_path, sparse_image):
+    first = Imager(sparse_image, tmp_path / 'first.img').run()
+    second = Imager(tmp_path / 'first.img', tmp_path / 'second.img').run()
+    assert first.digest == second.digest
+
+
+def test_verification_catches_a_mismatch(tmp_path, sparse_image, monkeypatch):
+    def corrupt(source, target, offset, length, data):
+        os.pwrite(target, bytes(len(data) - 1) + b'\x01', offset)
+
+    monkeypatch.setattr(BlockImager, '_copy_range', corrupt)
+    with pytest.raises(ImagingError):
+        Imager(sparse_image, tmp_path / 'target.img').run()
+
+
+def test_empty_source(tmp_path):
+    source = tmp_path / 'empty.img'
+    source.touch()
+    result = Imager(source, tmp_path / 'target.img').run()
+    assert result.size == result.copied == 0
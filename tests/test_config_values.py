@@ -0,0 +1,16 @@
+import enum
+
+from ConfigValues import plain_value
+
+
+class FsType(enum.Enum):
+    Ext4 = 'ext4'
+
+
+def test_enum_members_are_unwrapped():
+    assert plain_value(FsType.Ext4) == 'ext4'
+
+
+def test_plain_values_are_kept():
+    assert plain_value('ext4') == 'ext4'
+    assert plain_value(None) is None
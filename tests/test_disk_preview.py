@@ -0,0 +1,75 @@
+import json
+import subprocess
+
+import pytest
+
+pytest.importorskip('psutil')
+
+import DiskPreview
+
+MOUNTINFO = """\
+22 1 8:2 / /boot rw,relatime shared:2 - vfat /dev/sda2 rw
+29 1 0:27 /@ / rw,relatime shared:1 - btrfs /dev/sda1 rw,subvol=/@
+30 29 0:27 /@home /home rw,relatime shared:3 - btrfs /dev/sda1 rw,subvol=/@home
+31 29 0:27 /@log /var/log rw,relatime shared:4 - btrfs /dev/sda1 rw,subvol=/@log
+40 1 8:17 /data /srv/bind rw,relatime - ext4 /dev/sdb1 rw
+41 1 8:17 / /mnt/my\\040disk rw,relatime - ext4 /dev/sdb1 rw
+"""
+
+
+@pytest.fixture
+def mounts(tmp_path):
+    path = tmp_path / 'mountinfo'
+    path.write_text(MOUNTINFO)
+    return DiskPreview._read_mountinfo(path)
+
+
+def test_btrfs_subvolumes_map_to_their_partition(mounts):
+    assert mounts['/dev/sda1']['mountpoint'] == '/'
+    assert mounts['/dev/sda1']['fstype'] == 'btrfs'
+
+
+def test_indexed_by_device_number(mounts):
+    assert mounts['8:2']['mountpoint'] == '/boot'
+
+
+def test_filesystem_root_wins_over_bind_mounts(mounts):
+    assert mounts['8:17']['mountpoint'] == '/mnt/my disk'
+    assert mounts['/dev/sdb1']['mountpoint'] == '/mnt/my disk'
+
+
+class FakeSmartctl:
+    def __init__(self, *outcomes):
+        self.outcomes = list(outcomes)
+        self.calls = 0
+
+    def __call__(self, command, **kwargs):
+        self.calls += 1
+        outcome = self.outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return subprocess.CompletedProcess(command, 0, stdout=json.dumps(outcome).encode())
+
+
+@pytest.fixture
+def handler(monkeypatch):
+    monkeypatch.setattr(DiskPreview, '_smart_cache', {})
+    return DiskPreview.DiskStatusHandler.__new__(DiskPreview.DiskStatusHandler)
+
+
+def test_smart_successes_are_cached(monkeypatch, handler):
+    smartctl = FakeSmartctl({'smart_status': {'passed': True}})
+    monkeypatch.setattr(DiskPreview.subprocess, 'run', smartctl)
+
+    assert handler._get_disk_health('/dev/sda').passed
+    assert handler._get_disk_health('/dev/sda').passed
+    assert smartctl.calls == 1
+
+
+def test_smart_timeouts_are_retried(monkeypatch, handler):
+    smartctl = FakeSmartctl(subprocess.TimeoutExpired('smartctl', 15), {'smart_status': {'passed': True}})
+    monkeypatch.setattr(DiskPreview.subprocess, 'run', smartctl)
+
+    assert handler._get_disk_health('/dev/sda').error
+    assert handler._get_disk_health('/dev/sda').passed
+    assert smartctl.calls == 2
@@ -0,0 +1,122 @@
+import json
+import subprocess
+
+import pytest
+
+import Fleet as fleet_module
+from Fleet import CONFIG_FILE, PLAN_FILE, SPEC_FILE, Fleet, FleetError, Target, load_targets
+from Installer import ARG_GOLDEN_IMAGE, ARG_IMAGE_DIR, ARG_PACKAGE_CACHE, ARG_SKIP_MIRROR_RANKING
+
+
+def fleet_file(tmp_path, entries):
+    path = tmp_path / 'fleet.json'
+    path.write_text(json.dumps(entries))
+    return path
+
+
+def config(tmp_path, *devices):
+    path = tmp_path / 'config.json'
+    path.write_text(json.dumps({'disk_config': {'device_modifications': [{'device': device} for device in devices]}}))
+    return path
+
+
+def test_targets_are_read_relative_to_the_fleet_file(tmp_path):
+    targets = load_targets(fleet_file(tmp_path, [
+        {'device': '/dev/sdb', 'config': 'a.json'},
+        {'name': 'vm', 'image': 'vm.img', 'size': '20G', 'config': 'b.json', 'creds': 'creds.json'},
+    ]))
+    assert [target.name for target in targets] == ['sdb', 'vm']
+    assert targets[0].config == tmp_path / 'a.json' and targets[0].image is None
+    assert targets[1].image == tmp_path / 'vm.img' and targets[1].creds == tmp_path / 'creds.json'
+
+
+@pytest.mark.parametrize('entries, error', [
+    ([{'name': 'a', 'config': 'a.json'}], 'exactly one'),
+    ([{'name': 'a', 'device': '/dev/sdb', 'image': 'a.img', 'config': 'a.json'}], 'exactly one'),
+    ([{'name': 'a', 'device': '/dev/sdb', 'config': 'a.json'},
+      {'name': 'a', 'device': '/dev/sdc', 'config': 'a.json'}], 'same name'),
+    ([{'name': 'a', 'device': '/dev/sdb', 'config': 'a.json'},
+      {'name': 'b', 'device': '/dev/sdb', 'config': 'a.json'}], 'same device'),
+])
+def test_invalid_fleet_files_are_rejected(tmp_path, entries, error):
+    with pytest.raises(FleetError, match=error):
+        load_targets(fleet_file(tmp_path, entries))
+
+
+def test_prepare_points_the_configuration_at_the_target(tmp_path):
+    target = Target('vm', config(tmp_path, '/dev/sda'), device='/dev/loop3')
+    fleet = Fleet([target], work_dir=tmp_path / 'work', cache_dir=tmp_path / 'cache')
+    fleet._prepare(target)
+
+    target_dir = tmp_path / 'work' / 'vm'
+    written = json.loads((target_dir / CONFIG_FILE).read_text())
+    assert written['disk_config']['device_modifications'][0]['device'] == '/dev/loop3'
+
+    spec = json.loads((target_dir / SPEC_FILE).read_text())
+    assert spec['config'] == str(target_dir / CONFIG_FILE)
+    assert spec['creds'] is None
+    assert spec['arguments'][ARG_PACKAGE_CACHE] == str(tmp_path / 'cache')
+    assert spec['arguments'][ARG_SKIP_MIRROR_RANKING] is True
+    assert spec['arguments'][ARG_GOLDEN_IMAGE] is False
+    assert spec['arguments'][ARG_IMAGE_DIR] is None
+
+
+def test_prepare_rejects_a_configuration_without_the_target_device(tmp_path):
+    target = Target('vm', config(tmp_path, '/dev/sda', '/dev/sdb'), device='/dev/sdc')
+    with pytest.raises(FleetError, match='/dev/sdc'):
+        Fleet([target], work_dir=tmp_path)._prepare(target)
+
+
+def test_prefetch_downloads_the_planned_packages_once(tmp_path, monkeypatch):
+    targets = [Target(name, tmp_path / 'config.json') for name in ('a', 'b', 'c')]
+    targets[2].status = 'failed'
+    plans = {'a': {'packages': ['base', 'vim']}, 'b': {'packages': ['base', 'nano', 'typo'], 'missing_packages': ['typo']}}
+    for name, plan in plans.items():
+        (tmp_path / name).mkdir()
+        (tmp_path / name / PLAN_FILE).write_text(json.dumps(plan))
+
+    commands = []
+    monkeypatch.setattr(fleet_module.subprocess, 'run',
+                        lambda command, **kwargs: commands.append(command) or subprocess.CompletedProcess(command, 0))
+    Fleet(targets, work_dir=tmp_path, cache_dir=tmp_path / 'cache')._prefetch()
+    assert commands == [['pacman', '-Syw', '--noconfirm', '--cachedir', str(tmp_path / 'cache'), 'base', 'vim', 'nano']]
+
+
+def test_report_shows_failures_with_their_error(tmp_path):
+    ok = Target('a', tmp_path, device='/dev/sdb', status='install', seconds=12.34)
+    failed = Target('b', tmp_path, status='failed', error='plan exited with 1')
+    report = Fleet([ok, failed], work_dir=tmp_path).report().splitlines()
+    assert report[1].split() == ['a', '/dev/sdb', 'ok', '12.3']
+    assert report[2].split() == ['b', '-', 'FAILED', '0.0']
+    assert report[3].strip() == 'plan exited with 1'
+
+
+def mirror_targets(tmp_path, *mirror_configs):
+    targets = []
+    for index, mirror_config in enumerate(mirror_configs):
+        path = tmp_path / f'{index}.json'
+        path.write_text(json.dumps({'mirror_config': mirror_config}))
+        targets.append(Target(str(index), path))
+    return targets
+
+
+def test_targets_must_share_the_mirror_config(tmp_path):
+    targets = mirror_targets(tmp_path, {'mirror_regions': {'Germany': ['https://de.example/']}}, None)
+    with pytest.raises(FleetError, match='mirror_config'):
+        Fleet(targets, work_dir=tmp_path)._rank_mirrors()
+
+
+def test_mirror_config_is_applied_once_then_ranked(tmp_path, monkeypatch):
+    import MirrorRanking
+
+    mirror_config = {'mirror_regions': {'Germany': ['https://de.example/$repo/os/$arch']},
+                     'custom_servers': [{'url': 'http://lan.example/$repo/os/$arch'}]}
+    written, ranked = [], []
+    monkeypatch.setattr(MirrorRanking, 'write_mirrorlist', lambda results: written.append([r.url for r in results]))
+    monkeypatch.setattr(MirrorRanking, 'rank_mirrors',
+                        lambda urls, keep: ranked.append((urls, keep)) or [MirrorRanking.MirrorResult(keep[0])])
+
+    Fleet(mirror_targets(tmp_path, mirror_config, mirror_config), work_dir=tmp_path)._rank_mirrors()
+    urls = ['https://de.example/$repo/os/$arch', 'http://lan.example/$repo/os/$arch']
+    assert ranked == [(urls, urls[1:])]
+    assert written == [urls, urls[1:]]
@@ -0,0 +1,154 @@
+import shutil
+import sys
+import threading
+import time
+import types
+from dataclasses import replace
+from pathlib import Path
+
+import pytest
+
+import HardwareInventory
+from FormatEngine import (FormatEngine, FormatError, FormatJob, FormatResult, format_layout, mkfs_command,
+                          with_extended_options)
+from HardwareInventory import BlockDevice, QueueInfo
+
+
+def _disk(name: str, rotational: bool) -> BlockDevice:
+    return BlockDevice(name, f'/dev/{name}', 2 ** 40, None, False, False, (), QueueInfo(name, rotational=rotational))
+
+
+@pytest.fixture
+def disks(monkeypatch):
+    """An SSD and an HDD, with partitions resolving to them."""
+    snapshot = replace(HardwareInventory.probe(), block_devices=(_disk('nvme0n1', False), _disk('sda', True)))
+    monkeypatch.setattr(HardwareInventory, '_snapshot', snapshot)
+    monkeypatch.setattr('FormatEngine.parent_device', lambda path: 'sda' if 'sda' in str(path) else 'nvme0n1')
+
+
+def test_with_extended_options():
+    assert with_extended_options(['-b', '4096', '-E', 'nodiscard,lazy_itable_init=0'], {'lazy_itable_init': '1'}) == [
+        '-b', '4096', '-E', 'nodiscard,lazy_itable_init=1',
+    ]
+    assert with_extended_options([], {'lazy_itable_init': '1'}) == ['-E', 'lazy_itable_init=1']
+
+
+def test_mkfs_command():
+    assert mkfs_command('ext4', Path('/dev/sda1'), ['-b', '4096']) == ['mkfs.ext4', '-F', '-b', '4096', '/dev/sda1']
+    assert mkfs_command('fat32', Path('/dev/sda1'), []) == ['mkfs.fat', '-F', '32', '/dev/sda1']
+    assert mkfs_command('linux-swap', Path('/dev/sda2'), []) == ['mkswap', '/dev/sda2']
+
+
+def test_lazy_and_eager_initialization(disks):
+    job = FormatJob(Path('/dev/sda1'), 'ext4')
+    assert FormatEngine([job]).command(job) == [
+        'mkfs.ext4', '-F', '-b', '4096', '-E', 'nodiscard,packed_meta_blocks=1,lazy_itable_init=1,lazy_journal_init=1',
+        '/dev/sda1',
+    ]
+    assert FormatEngine([job], lazy=False, optimize=False).command(job) == [
+        'mkfs.ext4', '-F', '-E', 'lazy_itable_init=0,lazy_journal_init=0', '/dev/sda1',
+    ]
+
+
+def test_partitions_of_a_rotational_disk_are_formatted_in_turn(disks):
+    jobs = [FormatJob(Path(path), 'ext4') for path in ('/dev/sda1', '/dev/sda2', '/dev/nvme0n1p1', '/dev/nvme0n1p2')]
+    groups = FormatEngine(jobs)._groups()
+    assert [[str(job.path) for job in group] for group in groups] == [
+        ['/dev/sda1', '/dev/sda2'], ['/dev/nvme0n1p1'], ['/dev/nvme0n1p2'],
+    ]
+
+
+def test_at_most_one_mkfs_per_cpu(disks, monkeypatch):
+    monkeypatch.setattr(HardwareInventory, '_snapshot', replace(HardwareInventory._snapshot, cpu_count=2))
+    running, most = [], []
+    lock = threading.Lock()
+
+    def fake_format(self, job):
+        with lock:
+            running.append(job)
+            most.append(len(running))
+        time.sleep(0.02)
+        with lock:
+            running.remove(job)
+        return FormatResult(job, [], 0.02)
+
+    monkeypatch.setattr(FormatEngine, '_format', fake_format)
+    FormatEngine([FormatJob(Path(f'/dev/nvme0n1p{number}'), 'ext4') for number in range(1, 9)]).run()
+    assert max(most) == 2
+
+
+@pytest.mark.skipif(not (shutil.which('mkfs.ext4') and shutil.which('mkswap')), reason='needs mkfs.ext4 and mkswap')
+def test_formats_image_files(tmp_path):
+    jobs = []
+    for name, fs_type in (('root.img', 'ext4'), ('swap.img', 'linux-swap')):
+        path = tmp_path / name
+        with open(path, 'wb') as image:
+            image.truncate(32 * 1024 ** 2)
+        jobs.append(FormatJob(path, fs_type))
+
+    results = FormatEngine(jobs).run()
+
+    assert [result.error for result in results] == [None, None]
+    assert (tmp_path / 'root.img').read_bytes()[0x438:0x43a] == b'\x53\xef'  # ext4 superblock magic
+
+
+def test_failures_are_reported_together(tmp_path):
+    jobs = [FormatJob(tmp_path / 'a.img', 'no-such-fs'), FormatJob(tmp_path / 'b.img', 'no-such-fs')]
+    with pytest.raises(FormatError, match='a.img.*b.img'):
+        FormatEngine(jobs, optimize=False).run()
+
+
+class FakeDeviceHandler:
+    def __init__(self):
+        self.calls = []
+
+    def partition(self, modification, partition_table):
+        self.calls.append('partition')
+
+    def udev_sync(self):
+        self.calls.append('udev_sync')
+
+
+class FakeFilesystemHandler:
+    def __init__(self, answer):
+        self.answer = answer
+        self.warned = []
+
+    def _final_warning(self, device_paths):
+        self.warned.append(device_paths)
+        return self.answer
+
+
+@pytest.fixture
+def device_handler(monkeypatch):
+    handler = FakeDeviceHandler()
+    disk = types.ModuleType('archinstall.lib.disk')
+    disk.PartitionTable = types.SimpleNamespace(GPT='gpt', MBR='msdos')
+    for name, module in {
+        'archinstall': types.ModuleType('archinstall'),
+        'archinstall.lib': types.ModuleType('archinstall.lib'),
+        'archinstall.lib.disk': disk,
+        'archinstall.lib.disk.device_handler': types.SimpleNamespace(device_handler=handler),
+    }.items():
+        monkeypatch.setitem(sys.modules, name, module)
+    return handler
+
+
+def _layout():
+    device = types.SimpleNamespace(device_info=types.SimpleNamespace(path=Path('/dev/sda')))
+    partition = types.SimpleNamespace(status='existing', fs_type=None, safe_dev_path=Path('/dev/sda1'))
+    return types.SimpleNamespace(device_modifications=[types.SimpleNamespace(device=device, partitions=[partition])])
+
+
+def test_countdown_comes_before_partitioning(device_handler):
+    fs_handler = FakeFilesystemHandler(answer=True)
+    format_layout(_layout(), fs_handler=fs_handler)
+
+    assert fs_handler.warned == ['/dev/sda']
+    assert device_handler.calls[0] == 'partition'
+
+
+def test_cancelled_countdown_leaves_the_disks_alone(device_handler):
+    with pytest.raises(FormatError, match='cancelled'):
+        format_layout(_layout(), fs_handler=FakeFilesystemHandler(answer=False))
+    assert device_handler.calls == []
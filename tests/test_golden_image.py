@@ -0,0 +1,58 @@
+import shutil
+import threading
+import time
+
+import pytest
+
+from GoldenImage import build_lock, capture, config_hash, image_path, restore
+
+needs_tools = pytest.mark.skipif(not (shutil.which('tar') and shutil.which('zstd')), reason='needs tar and zstd')
+
+
+@needs_tools
+def test_capture_and_restore(tmp_path):
+    target = tmp_path / 'target'
+    (target / 'etc').mkdir(parents=True)
+    (target / 'etc/os-release').write_text('NAME="MaiArch"\n')
+    (target / 'etc/machine-id').write_text('0123456789abcdef\n')
+    image = image_path(tmp_path / 'images', config_hash({'packages': ['vim']}))
+
+    capture(target, image)
+    assert [path.name for path in image.parent.iterdir()] == [image.name]
+
+    restored = tmp_path / 'restored'
+    restored.mkdir()
+    restore(image, restored)
+    assert (restored / 'etc/os-release').read_text() == 'NAME="MaiArch"\n'
+    assert not (restored / 'etc/machine-id').exists()
+
+
+def test_failed_capture_leaves_nothing_behind(tmp_path):
+    image = tmp_path / 'images' / 'maiarch-0.tar.zst'
+    with pytest.raises(Exception):
+        capture(tmp_path / 'missing', image)
+    assert list(image.parent.iterdir()) == []
+
+
+def test_config_hash_depends_on_the_packages():
+    assert config_hash({'packages': ['vim']}) != config_hash({'packages': ['emacs']})
+    assert config_hash({'a': 1, 'b': 2}) == config_hash({'b': 2, 'a': 1})
+
+
+def test_one_build_per_image(tmp_path):
+    image = tmp_path / 'maiarch-0.tar.zst'
+    builds = []
+
+    def install():
+        with build_lock(image):
+            if not image.exists():
+                builds.append(threading.current_thread().name)
+                time.sleep(0.05)
+                image.write_text('image')
+
+    threads = [threading.Thread(target=install) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(builds) == 1
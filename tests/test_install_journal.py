@@ -0,0 +1,33 @@
+from InstallJournal import JOURNAL_PATH, InstallJournal
+
+
+def test_completed_and_failed_steps(tmp_path):
+    journal = InstallJournal(tmp_path)
+    assert journal.completed() == set() and journal.failed_step() is None
+
+    journal.record('mirrors')
+    journal.record('packages', 'failed', 'pacman exited with 1')
+    assert journal.completed() == {'mirrors'}
+    assert journal.failed_step() == 'packages'
+
+    journal.record('packages')
+    assert journal.completed() == {'mirrors', 'packages'}
+    assert journal.failed_step() is None
+
+
+def test_a_torn_last_line_is_ignored(tmp_path):
+    journal = InstallJournal(tmp_path)
+    journal.record('mirrors')
+    journal.record('packages', 'failed')
+    with (tmp_path / JOURNAL_PATH).open('a') as file:
+        file.write('{"step": "swap", "sta')
+
+    assert journal.completed() == {'mirrors'}
+    assert journal.failed_step() == 'packages'
+
+
+def test_reset(tmp_path):
+    journal = InstallJournal(tmp_path)
+    journal.record('mirrors')
+    journal.reset()
+    assert journal.completed() == set()
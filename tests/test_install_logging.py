@@ -0,0 +1,70 @@
+import io
+import json
+import logging
+import sys
+
+import pytest
+
+from InstallLogging import JSON_LOG, OUTPUT_LOGGER, OutputToLog, capture_output, setup_logging, stop_logging
+
+
+@pytest.fixture
+def root_logger():
+    root = logging.getLogger()
+    handlers, level = list(root.handlers), root.level
+    yield root
+    stop_logging()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    for handler in handlers:
+        root.addHandler(handler)
+    root.setLevel(level)
+
+
+def records(log_dir):
+    return [json.loads(line) for line in (log_dir / JSON_LOG).read_text().splitlines()]
+
+
+def test_captured_output_is_queued_with_the_log_records(root_logger, tmp_path, capsys):
+    setup_logging(tmp_path)
+    stdout, stderr = sys.stdout, sys.stderr
+    capture_output()
+    logging.getLogger('maiarch.test').info('before')
+    print('installing base')
+    print('downloading 10%\rdownloading 100%')
+    print('not found', file=sys.stderr)
+    sys.stdout.write('no newline')
+    stop_logging()
+
+    assert (sys.stdout, sys.stderr) == (stdout, stderr)
+    output = [(record['level'], record['message']) for record in records(tmp_path) if record['logger'] == OUTPUT_LOGGER]
+    assert output == [('INFO', 'installing base'), ('INFO', 'downloading 100%'),
+                      ('WARNING', 'not found'), ('INFO', 'no newline')]
+    # The console shows the output as printed, after the records logged before it
+    console = capsys.readouterr().err.splitlines()
+    assert console == ['INFO:maiarch.test:before', 'installing base', 'downloading 100%', 'not found', 'no newline']
+
+
+def test_tracebacks_get_a_field_of_their_own(root_logger, tmp_path, capsys):
+    setup_logging(tmp_path)
+    try:
+        raise ValueError('bad value')
+    except ValueError:
+        logging.getLogger('maiarch.test').exception('step failed')
+    stop_logging()
+
+    [record] = records(tmp_path)
+    assert record['message'] == 'step failed'
+    assert record['exception'].startswith('Traceback') and 'ValueError: bad value' in record['exception']
+    assert 'ValueError: bad value' in capsys.readouterr().err
+
+
+def test_tee_keeps_writing_to_the_stream(root_logger, tmp_path, capsys):
+    setup_logging(tmp_path)
+    stream = io.StringIO()
+    output = OutputToLog(stream, logging.getLogger(OUTPUT_LOGGER), tee=True)
+    output.write('progress 50%\rprogress 100%\ndone')
+    stop_logging()
+
+    assert stream.getvalue() == 'progress 50%\rprogress 100%\ndone'
+    assert [record['message'] for record in records(tmp_path)] == ['progress 100%']
@@ -0,0 +1,22 @@
+from InstallPlan import load_step_timings
+from InstallTrace import Tracer, keep_trace, trace_history
+
+
+def test_history_keeps_the_newest_runs(tmp_path):
+    history = tmp_path / 'history'
+    trace = tmp_path / 'install_trace.json'
+    kept = []
+    for run in range(5):
+        tracer = Tracer()
+        with tracer.span('packages'):
+            pass
+        tracer.write_chrome_trace(trace)
+        kept.append(keep_trace(trace, history, runs=3))
+
+    traces = trace_history(history)
+    assert traces == kept[:1:-1]
+    assert set(load_step_timings(traces)) == {'packages'}
+
+
+def test_no_history_yet(tmp_path):
+    assert trace_history(tmp_path / 'missing') == []
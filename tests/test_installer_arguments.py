@@ -0,0 +1,35 @@
+import re
+
+import pytest
+
+import Installer
+from Installer import HELP_TEXT, MAIARCH_ARGS, normalize_arguments
+
+# Options archinstall's own parser knows, it stores them under their argparse dest
+ARCHINSTALL_OPTIONS = {'silent', 'advanced', 'dry-run', 'config'}
+
+ADVERTISED = re.findall(r'--([a-z-]+)', HELP_TEXT.split('\n\n')[0])
+
+
+def test_every_advertised_option_is_ours_or_archinstalls():
+    assert set(ADVERTISED) - ARCHINSTALL_OPTIONS
+    for option in set(ADVERTISED) - ARCHINSTALL_OPTIONS:
+        assert option.replace('-', '_') in MAIARCH_ARGS
+
+
+@pytest.mark.parametrize('option', sorted(set(ADVERTISED) - ARCHINSTALL_OPTIONS))
+def test_command_line_options_reach_the_installer(option):
+    # archinstall stores unknown options under their name without the leading dashes
+    arguments = {option: '3', 'custom-commands': ['true']}
+    normalize_arguments(arguments)
+
+    key = option.replace('-', '_')
+    assert arguments[key] == '3'
+    assert key == option or option not in arguments
+    assert arguments['custom-commands'] == ['true']
+
+
+def test_underscore_keys_win():
+    arguments = {Installer.ARG_MAX_PARALLEL_STEPS: 2, 'max-parallel-steps': '8'}
+    normalize_arguments(arguments)
+    assert arguments == {Installer.ARG_MAX_PARALLEL_STEPS: 2}
@@ -0,0 +1,16 @@
+import json
+
+from JsonAccess import ConfigStore
+
+
+def test_save_keeps_the_file_mode(tmp_path):
+    path = tmp_path / 'configs.json'
+    path.write_text(json.dumps({'network_config': {'type': 'nm'}}))
+    path.chmod(0o644)
+
+    store = ConfigStore(str(path))
+    store.set('network_config.type', 'iwd')
+
+    assert json.loads(path.read_text()) == {'network_config': {'type': 'iwd'}}
+    assert path.stat().st_mode & 0o777 == 0o644
+    assert [entry.name for entry in tmp_path.iterdir()] == ['configs.json']
@@ -0,0 +1,51 @@
+import pytest
+
+from HardwareInventory import QueueInfo
+from LayoutOptimizer import MIB, aligned_range, alignment, mkfs_options, mount_options
+
+SSD = QueueInfo('nvme0n1', discard_max_bytes=2 ** 31, discard_granularity=512 * 1024)
+HDD = QueueInfo('sda', rotational=True)
+SMR = QueueInfo('sdb', rotational=True, zoned='host-aware')
+RAID = QueueInfo('md0', minimum_io_size=512 * 1024, optimal_io_size=2 * 1024 * 1024)
+
+
+def test_alignment():
+    assert alignment(HDD) == MIB
+    assert alignment(RAID) == 2 * MIB
+    # An odd stripe width would need a huge common multiple
+    assert alignment(QueueInfo('md1', optimal_io_size=3 * 5 * 7 * 11 * 13 * 4096)) == MIB
+
+
+@pytest.mark.parametrize('start, length, expected', [
+    (MIB, 10 * MIB, (MIB, 10 * MIB)),  # Aligned already
+    (MIB + 4096, 10 * MIB, (2 * MIB, 9 * MIB)),  # Loses less than one boundary
+    (MIB + 4096, MIB, None),  # Nothing would be left
+    (MIB + 4096, 3 * MIB - 8192, None),  # Would lose more than one boundary
+    (MIB + 4096, MIB - 8192, None),  # Smaller than one boundary
+])
+def test_aligned_range(start, length, expected):
+    assert aligned_range(start, length, MIB) == expected
+
+
+def test_rotational_ext4_is_lazily_initialized_by_default():
+    options = mkfs_options(HDD, 'ext4')
+    assert options == ['-b', '4096', '-E', 'nodiscard,packed_meta_blocks=1']
+
+
+def test_eager_ext4():
+    assert mkfs_options(SMR, 'ext4', eager=True) == [
+        '-b', '4096', '-E', 'nodiscard,lazy_itable_init=0,lazy_journal_init=0,packed_meta_blocks=1',
+    ]
+
+
+def test_striped_devices():
+    assert mkfs_options(RAID, 'ext4') == ['-b', '4096', '-E', 'stride=128,stripe_width=512,nodiscard']
+    assert mkfs_options(RAID, 'xfs') == ['-d', f'su={512 * 1024},sw=4', '-K']
+
+
+def test_ssd_options():
+    assert mkfs_options(SSD, 'ext4') == ['-b', '4096']
+    assert mkfs_options(SSD, 'btrfs') == []
+    assert mount_options(SSD, 'btrfs') == ['noatime', 'compress=zstd:1', 'discard=async']
+    assert mount_options(SMR, 'ext4') == ['noatime', 'lazytime', 'commit=60']
+    assert mount_options(SSD, 'vfat') == []
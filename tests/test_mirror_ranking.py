@@ -0,0 +1,109 @@
+import functools
+import threading
+import time
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+
+import pytest
+
+import MirrorRanking
+from MirrorRanking import MirrorResult, candidate_urls, custom_urls, rank_mirrors, write_mirrorlist
+
+
+class QuietHandler(SimpleHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def mirror(tmp_path):
+    """A local mirror serving the start of core.db and its last sync time."""
+    root = tmp_path / 'mirror'
+    (root / 'core/os/x86_64').mkdir(parents=True)
+    (root / 'core/os/x86_64/core.db').write_bytes(b'\0' * MirrorRanking.PROBE_BYTES)
+    (root / 'lastsync').write_text(f"{int(time.time())}\n")
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), functools.partial(QuietHandler, directory=str(root)))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}/$repo/os/$arch", root
+    server.shutdown()
+    server.server_close()
+
+
+def test_candidates_from_regions_and_custom_servers(tmp_path):
+    config = SimpleNamespace(
+        mirror_regions=[SimpleNamespace(urls=['https://a.example/$repo/os/$arch', 'https://b.example/$repo/os/$arch'])],
+        custom_servers=[SimpleNamespace(url='http://lan.example/$repo/os/$arch')],
+    )
+    assert candidate_urls(config, tmp_path / 'missing') == [
+        'https://a.example/$repo/os/$arch', 'https://b.example/$repo/os/$arch', 'http://lan.example/$repo/os/$arch',
+    ]
+    assert custom_urls(config) == ['http://lan.example/$repo/os/$arch']
+
+
+def test_candidates_from_older_region_mapping(tmp_path):
+    config = SimpleNamespace(mirror_regions={'Germany': ['https://de.example/$repo/os/$arch']})
+    assert candidate_urls(config, tmp_path / 'missing') == ['https://de.example/$repo/os/$arch']
+
+
+def test_candidates_fall_back_to_the_mirrorlist(tmp_path):
+    mirrorlist = tmp_path / 'mirrorlist'
+    mirrorlist.write_text(
+        "## Germany\n"
+        "Server = https://de.example/$repo/os/$arch\n"
+        "#Server = https://commented.example/$repo/os/$arch\n"
+        "Server=https://de.example/$repo/os/$arch\n"
+    )
+    assert candidate_urls(None, mirrorlist) == ['https://de.example/$repo/os/$arch']
+
+
+def test_dechunk():
+    assert MirrorRanking._dechunk(b'4\r\nWiki\r\n6;ext=1\r\npedia \r\n0\r\n\r\n') == b'Wikipedia '
+
+
+def test_ranking_against_a_local_mirror(tmp_path, mirror):
+    url, _ = mirror
+    unreachable = 'http://127.0.0.1:1/$repo/os/$arch'
+
+    ranked = rank_mirrors([url, unreachable], cache_path=tmp_path / 'cache.json')
+
+    assert [result.url for result in ranked] == [url]
+    assert ranked[0].usable
+    assert ranked[0].last_sync is not None
+
+
+def test_stale_mirrors_are_dropped(tmp_path, mirror):
+    url, root = mirror
+    (root / 'lastsync').write_text(f"{int(time.time()) - MirrorRanking.MAX_SYNC_AGE - 60}\n")
+
+    assert rank_mirrors([url], cache_path=tmp_path / 'cache.json') == []
+
+
+def test_custom_mirrors_are_kept(tmp_path):
+    unreachable = 'http://127.0.0.1:1/$repo/os/$arch'
+
+    ranked = rank_mirrors([unreachable], cache_path=tmp_path / 'cache.json', keep=[unreachable])
+
+    assert [result.url for result in ranked] == [unreachable]
+    write_mirrorlist(ranked, tmp_path / 'mirrorlist')
+    assert f"Server = {unreachable}" in (tmp_path / 'mirrorlist').read_text()
+
+
+def test_rankings_are_cached(tmp_path, monkeypatch, mirror):
+    url, _ = mirror
+    cache = tmp_path / 'cache.json'
+    rank_mirrors([url], cache_path=cache)
+
+    async def no_probing(urls):
+        raise AssertionError('probed again')
+
+    monkeypatch.setattr(MirrorRanking, '_probe_all', no_probing)
+    assert [result.url for result in rank_mirrors([url], cache_path=cache)] == [url]
+
+
+def test_write_mirrorlist(tmp_path):
+    path = tmp_path / 'mirrorlist'
+    write_mirrorlist([MirrorResult('https://a.example/$repo/os/$arch', latency=0.02, throughput=2 * 1024 ** 2)], path)
+    lines = path.read_text().splitlines()
+    assert lines[1:] == ['# 20 ms, 2048 KiB/s', 'Server = https://a.example/$repo/os/$arch']
@@ -0,0 +1,60 @@
+import threading
+
+from PacmanTuning import MAX_PARALLEL_DOWNLOADS, choose_parallel_downloads, set_parallel_downloads
+
+PACMAN_CONF = """\
+[options]
+HoldPkg     = pacman glibc
+#ParallelDownloads = 5
+
+[core]
+Include = /etc/pacman.d/mirrorlist
+"""
+
+
+def test_uncomments_the_option(tmp_path):
+    conf = tmp_path / 'pacman.conf'
+    conf.write_text(PACMAN_CONF)
+    conf.chmod(0o644)
+
+    set_parallel_downloads(8, conf, tmp_path / 'run')
+
+    assert 'ParallelDownloads = 8\n' in conf.read_text()
+    assert '#ParallelDownloads' not in conf.read_text()
+    assert conf.stat().st_mode & 0o777 == 0o644
+
+
+def test_adds_the_option(tmp_path):
+    conf = tmp_path / 'pacman.conf'
+    conf.write_text('[options]\nHoldPkg = pacman\n')
+
+    set_parallel_downloads(3, conf, tmp_path / 'run')
+
+    assert conf.read_text().startswith('[options]\nParallelDownloads = 3\n')
+
+
+def test_concurrent_updates_leave_one_valid_file(tmp_path):
+    etc = tmp_path / 'etc'
+    etc.mkdir()
+    conf = etc / 'pacman.conf'
+    conf.write_text(PACMAN_CONF)
+
+    threads = [threading.Thread(target=set_parallel_downloads, args=(value, conf, tmp_path / 'run'))
+               for value in range(1, 17)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    text = conf.read_text()
+    assert text.count('ParallelDownloads') == 1
+    assert '[core]' in text
+    # Neither the lock nor a temporary file is left next to the configuration
+    assert [path.name for path in etc.iterdir()] == ['pacman.conf']
+
+
+def test_choose_parallel_downloads():
+    assert choose_parallel_downloads(150, cpu_count=4) == 5  # Unknown bandwidth
+    assert choose_parallel_downloads(150, 1024 * 1024, cpu_count=64) == MAX_PARALLEL_DOWNLOADS
+    assert choose_parallel_downloads(150, 1024 * 1024, cpu_count=1) == 2
+    assert choose_parallel_downloads(3, 1024, cpu_count=8) == 3
@@ -0,0 +1,60 @@
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+from PostInstall import PostInstall, PostInstallError
+
+
+class RecordingPostInstall(PostInstall):
+    """Records the commands instead of running them, and how many pacman users overlap."""
+
+    def __init__(self, *args, fail=(), **kwargs):
+        super().__init__(*args, **kwargs)
+        self.commands = []
+        self.fail = fail
+        self.pacman_users = 0
+        self.max_pacman_users = 0
+        self._lock = threading.Lock()
+
+    def _run(self, command, cwd=None):
+        line = ' '.join(command)
+        uses_pacman = 'git clone' not in line and 'pull' not in line
+        with self._lock:
+            self.commands.append(line)
+            if uses_pacman:
+                self.pacman_users += 1
+                self.max_pacman_users = max(self.max_pacman_users, self.pacman_users)
+        time.sleep(0.02)
+        with self._lock:
+            if uses_pacman:
+                self.pacman_users -= 1
+        if any(text in line for text in self.fail):
+            raise PostInstallError(f"{line} failed")
+
+
+def test_pacman_users_never_overlap(tmp_path):
+    post_install = RecordingPostInstall(tmp_path, max_workers=8)
+    post_install.run()
+
+    assert post_install.max_pacman_users == 1
+    assert post_install.commands.index(
+        next(line for line in post_install.commands if 'pacman -Sy --needed --noconfirm git' in line)
+    ) < post_install.commands.index(next(line for line in post_install.commands if 'TuxTalkInstall.sh' in line))
+    assert 'omnipkg install' in post_install.commands[-1]
+
+
+def test_clones_on_the_current_system_wait_for_git():
+    steps = {step.name: step for step in PostInstall(Path('/')).steps()}
+    assert steps['clone TuxTalk'].requires == ('prerequisites',)
+
+
+def test_failed_prerequisites_skip_the_installers(tmp_path):
+    post_install = RecordingPostInstall(tmp_path, fail=('pacman -Sy',))
+    with pytest.raises(PostInstallError):
+        post_install.run()
+
+    assert post_install.errors['install TuxTalk'] == 'skipped, prerequisites failed'
+    assert post_install.errors['apps'] == 'skipped, install OmniPkg failed'
+    assert not any('TuxTalkInstall.sh' in line for line in post_install.commands)
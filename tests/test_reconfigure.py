@@ -0,0 +1,87 @@
+import pytest
+
+from Reconfigure import DEFAULT_HOSTNAME, Reconfigure, ReconfigureError, diff, load_stored
+
+
+def disk_config(fs_type='ext4', obj_id='a', dev_path=None, config_type='default_layout'):
+    return {
+        'config_type': config_type,
+        'device_modifications': [{
+            'device': '/dev/sda',
+            'wipe': True,
+            'partitions': [{
+                'obj_id': obj_id,
+                'dev_path': dev_path,
+                'status': 'create',
+                'fs_type': fs_type,
+                'mountpoint': '/',
+                'size': {'value': 20, 'unit': 'GiB'},
+            }],
+        }],
+    }
+
+
+class RecordingReconfigure(Reconfigure):
+    """Records the commands instead of running them."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.commands = []
+
+    def _run(self, *command):
+        self.commands.append(' '.join(command))
+
+
+def test_install_time_disk_fields_are_not_a_change():
+    old = {'disk_config': disk_config(obj_id='a', dev_path='/dev/sda2')}
+    new = {'disk_config': disk_config(obj_id='b')}
+    assert not diff(old, new)
+
+
+def test_changed_layout_needs_a_new_installation(tmp_path):
+    old = {'disk_config': disk_config('ext4')}
+    new = {'disk_config': disk_config('btrfs')}
+    assert diff(old, new).unsupported == ['disk_config']
+    with pytest.raises(ReconfigureError, match='disk_config'):
+        Reconfigure(tmp_path, old, new).run()
+
+
+@pytest.mark.parametrize('new_disks', [None, disk_config('btrfs', config_type='pre_mounted_config')])
+def test_no_layout_or_mounted_layout_keeps_the_installed_one(new_disks):
+    assert not diff({'disk_config': disk_config('ext4')}, {'disk_config': new_disks})
+
+
+def test_removed_hostname_falls_back_to_the_default(tmp_path):
+    (tmp_path / 'etc').mkdir()
+    ran = Reconfigure(tmp_path, {'hostname': 'box'}, {}).run()
+    assert ran == ['hostname']
+    assert (tmp_path / 'etc/hostname').read_text() == DEFAULT_HOSTNAME + '\n'
+
+
+def test_only_changes_run_and_config_is_stored(tmp_path):
+    old = {'packages': ['vim'], 'services': ['sshd'], 'locale_config': {'sys_lang': 'en_US.UTF-8'}}
+    new = {'packages': ['nano'], 'services': []}
+    reconfigure = RecordingReconfigure(tmp_path, old, new)
+    assert reconfigure.run() == ['install_packages', 'disable_services', 'remove_packages']
+    assert sorted(reconfigure.commands[:2]) == ['pacman -Syu --needed --noconfirm nano', 'systemctl disable sshd']
+    assert reconfigure.commands[2] == 'pacman -Rs --noconfirm vim'
+    assert load_stored(tmp_path) == new
+
+
+@pytest.mark.parametrize('sys_lang, sys_enc, entry', [
+    ('en_US', 'UTF-8', 'en_US.UTF-8 UTF-8'),
+    ('en_US.UTF-8', 'UTF-8', 'en_US.UTF-8 UTF-8'),
+    ('de_DE@euro', 'ISO-8859-15', 'de_DE@euro ISO-8859-15'),
+])
+def test_locale_is_written_like_a_fresh_installation(tmp_path, sys_lang, sys_enc, entry):
+    (tmp_path / 'etc').mkdir()
+    (tmp_path / 'etc/locale.gen').write_text('#de_DE@euro ISO-8859-15\n#en_US.UTF-8 UTF-8\n#en_US ISO-8859-1\n')
+    (tmp_path / 'etc/vconsole.conf').write_text('KEYMAP=us\nFONT=ter-132n\n')
+    locale = {'sys_lang': sys_lang, 'sys_enc': sys_enc, 'kb_layout': 'de-latin1'}
+
+    reconfigure = RecordingReconfigure(tmp_path, {}, {'locale_config': locale})
+    assert reconfigure.run() == ['locale']
+    assert reconfigure.commands == ['locale-gen']
+    assert entry in (tmp_path / 'etc/locale.gen').read_text().splitlines()
+    assert (tmp_path / 'etc/locale.conf').read_text() == f"LANG={entry.split()[0]}\n"
+    assert (tmp_path / 'etc/vconsole.conf').read_text() == 'KEYMAP=de-latin1\nFONT=ter-132n\n'
@@ -0,0 +1,133 @@
+import threading
+import time
+
+import pytest
+
+from StepScheduler import DEFAULT_MAX_WORKERS, Step, StepError, StepScheduler, current_step
+
+
+def _scheduler(*steps: Step, **kwargs) -> StepScheduler:
+    scheduler = StepScheduler(**kwargs)
+    for step in steps:
+        scheduler.add(step)
+    return scheduler
+
+
+def test_default_workers_do_not_depend_on_cpu_count(monkeypatch):
+    monkeypatch.setattr('os.cpu_count', lambda: 1)
+    assert StepScheduler().max_workers == DEFAULT_MAX_WORKERS > 1
+
+
+def test_order_respects_dependencies_and_declaration_order():
+    scheduler = _scheduler(
+        Step('c', lambda: None, ('b',)),
+        Step('a', lambda: None),
+        Step('b', lambda: None, ('a',)),
+        Step('d', lambda: None),
+    )
+    assert scheduler.order() == ['a', 'b', 'c', 'd']
+
+
+def test_dependencies_finish_before_dependents_start():
+    events = []
+    lock = threading.Lock()
+
+    def step(name: str):
+        def action():
+            with lock:
+                events.append(('start', name))
+            time.sleep(0.01)
+            with lock:
+                events.append(('end', name))
+        return action
+
+    _scheduler(
+        Step('base', step('base')),
+        Step('left', step('left'), ('base',)),
+        Step('right', step('right'), ('base',)),
+        Step('last', step('last'), ('left', 'right')),
+    ).run()
+
+    assert events.index(('end', 'base')) < events.index(('start', 'left'))
+    assert events.index(('end', 'base')) < events.index(('start', 'right'))
+    assert events.index(('end', 'left')) < events.index(('start', 'last'))
+    assert events.index(('end', 'right')) < events.index(('start', 'last'))
+
+
+def test_independent_steps_run_concurrently():
+    barrier = threading.Barrier(2, timeout=5)
+    _scheduler(Step('a', barrier.wait), Step('b', barrier.wait), max_workers=2).run()
+
+
+def test_exclusive_resource_is_never_held_twice():
+    holders = []
+    overlaps = []
+    lock = threading.Lock()
+
+    def pacman():
+        with lock:
+            holders.append(1)
+            if len(holders) > 1:
+                overlaps.append(True)
+        time.sleep(0.01)
+        with lock:
+            holders.pop()
+
+    pacman_lock = frozenset({'pacman'})
+    _scheduler(*(Step(f'step{i}', pacman, resources=pacman_lock) for i in range(5)), max_workers=5).run()
+    assert not overlaps
+
+
+def test_skip_counts_as_finished():
+    ran = []
+    _scheduler(
+        Step('a', lambda: ran.append('a')),
+        Step('b', lambda: ran.append('b'), ('a',)),
+    ).run(skip={'a'})
+    assert ran == ['b']
+
+
+def test_failure_is_raised_as_step_error_and_stops_scheduling():
+    ran = []
+
+    def fail():
+        raise RuntimeError('boom')
+
+    scheduler = _scheduler(
+        Step('a', fail),
+        Step('b', lambda: ran.append('b'), ('a',)),
+    )
+    with pytest.raises(StepError) as raised:
+        scheduler.run()
+
+    assert raised.value.step == 'a'
+    assert isinstance(raised.value.__cause__, RuntimeError)
+    assert ran == []
+
+
+def test_on_complete_is_called_for_finished_steps_only():
+    completed = []
+
+    def fail():
+        raise RuntimeError('boom')
+
+    scheduler = _scheduler(Step('ok', lambda: None), Step('bad', fail, ('ok',)), on_complete=completed.append)
+    with pytest.raises(StepError):
+        scheduler.run()
+    assert completed == ['ok']
+
+
+def test_invalid_graphs_are_rejected():
+    with pytest.raises(StepError, match='unknown step'):
+        _scheduler(Step('a', lambda: None, ('missing',))).run()
+    with pytest.raises(StepError, match='cycle'):
+        _scheduler(Step('a', lambda: None, ('b',)), Step('b', lambda: None, ('a',))).run()
+    with pytest.raises(StepError, match='Duplicate'):
+        _scheduler(Step('a', lambda: None), Step('a', lambda: None))
+
+
+def test_current_step_is_set_while_a_step_runs():
+    seen = []
+    _scheduler(Step('named', lambda: seen.append(current_step.get()))).run()
+    assert seen == ['named']
+    assert current_step.get() is None
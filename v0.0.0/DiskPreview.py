@@ -1,56 +1,241 @@
+import json
+import os
+import re
+import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
 from pathlib import Path
+from typing import Optional
 import psutil  # This library can be used to monitor disk health and status
 
+SYS_BLOCK = Path('/sys/block')
+MOUNTINFO = Path('/proc/self/mountinfo')
+SECTOR_SIZE = 512  # /sys/block/*/size is always in 512-byte sectors
+
+SMART_TIMEOUT = 15  # Seconds a single smartctl call may take
+SMART_CACHE_TTL = 300  # Seconds a SMART result is reused for
+SMART_WORKERS = 8
+
+# Virtual devices smartctl has nothing to report for
+NO_SMART_PREFIXES = ('loop', 'dm-', 'zram', 'ram')
+
+# Wear_Leveling_Count, SSD_Life_Left, Media_Wearout_Indicator
+ATA_WEAR_ATTRIBUTES = (177, 231, 233)
+
+# device -> (timestamp, health), shared across handlers so a refreshed report doesn't probe again
+_smart_cache: dict[str, tuple[float, 'SmartHealth']] = {}
+_smart_cache_lock = threading.Lock()
+
+
+@dataclass(frozen=True, slots=True)
+class SmartHealth:
+    """
+    The SMART fields we care about, parsed from `smartctl --json`.
+    Fields the drive doesn't report are left as None.
+    """
+    device: str
+    passed: Optional[bool] = None
+    temperature: Optional[int] = None  # Celsius
+    reallocated_sectors: Optional[int] = None
+    pending_sectors: Optional[int] = None
+    wear_level: Optional[int] = None  # Percentage of the rated endurance used
+    power_on_hours: Optional[int] = None
+    error: Optional[str] = None
+
+    @classmethod
+    def from_report(cls, device: str, report: dict) -> 'SmartHealth':
+        """
+        Build a record from a parsed `smartctl --json` report (ATA or NVMe).
+        """
+        attributes = {
+            attribute['id']: attribute
+            for attribute in report.get('ata_smart_attributes', {}).get('table', [])
+        }
+        nvme = report.get('nvme_smart_health_information_log', {})
+
+        def raw(attribute_id: int) -> Optional[int]:
+            if attribute_id in attributes:
+                return attributes[attribute_id]['raw']['value']
+            return None
+
+        wear_level = nvme.get('percentage_used')
+        if wear_level is None:
+            for attribute_id in ATA_WEAR_ATTRIBUTES:
+                if attribute_id in attributes:
+                    # The normalized value counts down from 100 as the flash wears out
+                    wear_level = 100 - attributes[attribute_id]['value']
+                    break
+
+        return cls(
+            device=device,
+            passed=report.get('smart_status', {}).get('passed'),
+            temperature=report.get('temperature', {}).get('current', nvme.get('temperature')),
+            reallocated_sectors=raw(5),
+            pending_sectors=raw(197),
+            wear_level=wear_level,
+            power_on_hours=report.get('power_on_time', {}).get('hours', nvme.get('power_on_hours')),
+        )
+
+    def __str__(self) -> str:
+        if self.error:
+            return f"Failed to fetch SMART data for {self.device}: {self.error}"
+
+        fields = [{True: 'PASSED', False: 'FAILED'}.get(self.passed, 'UNKNOWN')]
+        if self.temperature is not None:
+            fields.append(f"Temperature: {self.temperature} C")
+        if self.reallocated_sectors is not None:
+            fields.append(f"Reallocated sectors: {self.reallocated_sectors}")
+        if self.pending_sectors is not None:
+            fields.append(f"Pending sectors: {self.pending_sectors}")
+        if self.wear_level is not None:
+            fields.append(f"Wear: {self.wear_level}%")
+        if self.power_on_hours is not None:
+            fields.append(f"Power on: {self.power_on_hours} h")
+        return ', '.join(fields)
+
+
+def _unescape(field: str) -> str:
+    """
+    Undo the octal escaping mountinfo applies to spaces and other special characters (e.g. \\040).
+    """
+    return re.sub(r'\\([0-7]{3})', lambda match: chr(int(match.group(1), 8)), field)
+
+
+def _read_mountinfo(path: Path = MOUNTINFO) -> dict[str, dict]:
+    """
+    Parse mountinfo once and index the mounts by 'major:minor' device number and by
+    the resolved mount source (e.g. /dev/sda1). btrfs mounts report an anonymous
+    0:NN device number, so for them only the source finds the partition.
+    The mount of the filesystem root wins over bind mounts of subdirectories, and
+    of several btrfs subvolume mounts the one at / wins.
+    """
+    mounts = {}
+    for line in path.read_text().splitlines():
+        fields = line.split()
+        separator = fields.index('-')
+        devno, root, mountpoint, opts = fields[2], fields[3], fields[4], fields[5]
+        fstype, source = fields[separator + 1], _unescape(fields[separator + 2])
+        mount = {
+            'root': root,
+            'mountpoint': _unescape(mountpoint),
+            'fstype': fstype,
+            'opts': opts,
+        }
+
+        keys = [devno]
+        if source.startswith('/dev/'):
+            keys.append(os.path.realpath(source))
+        for key in keys:
+            current = mounts.get(key)
+            if current is None or _mount_rank(mount) > _mount_rank(current):
+                mounts[key] = mount
+    return mounts
+
+
+def _mount_rank(mount: dict) -> tuple[bool, bool]:
+    return mount['root'] == '/', mount['mountpoint'] == '/'
+
+
+def _read_attr(path: Path, default: str = '') -> str:
+    try:
+        return path.read_text().strip()
+    except OSError:
+        return default
+
+
 class DiskStatusHandler:
     def __init__(self):
         self.disks = self._get_all_disks()
 
     def _get_all_disks(self) -> list[dict]:
         """
-        Collect and return all disk information (health, partitions, etc.).
+        Collect and return all disk information (usage, partitions, etc.)
+        from a single pass over /sys/block and /proc/self/mountinfo.
+        Unmounted disks and partitions are included.
         """
+        mounts = _read_mountinfo(MOUNTINFO)
         disks = []
-        for partition in psutil.disk_partitions(all=False):  # 'all=False' excludes unmounted partitions
-            disk_info = {
-                'device': partition.device,
-                'mountpoint': partition.mountpoint,
-                'fstype': partition.fstype,
-                'opts': partition.opts,
-                'partitions': self._get_disk_partitions(partition.device),  # Get partitions of the disk
-                'usage': self._convert_bytes_to_gb(psutil.disk_usage(partition.mountpoint)._asdict())  # Disk usage stats
-            }
+        for block in sorted(SYS_BLOCK.iterdir()):
+            disk_info = self._get_block_info(block, mounts)
+            if disk_info['size'] == 0:  # Unused loop and ram devices
+                continue
+            disk_info['partitions'] = self._get_disk_partitions(block, mounts)
             disks.append(disk_info)
         return disks
 
-    def _get_disk_partitions(self, device: str) -> list[dict]:
+    def _get_disk_partitions(self, block: Path, mounts: dict[str, dict]) -> list[dict]:
         """
         Retrieve partition details for a specific device.
         """
         partitions = []
-        for partition in psutil.disk_partitions(all=False):  # 'all=False' excludes unmounted partitions
-            if partition.device == device:
-                partition_info = {
-                    'device': partition.device,
-                    'mountpoint': partition.mountpoint,
-                    'fstype': partition.fstype,
-                    'opts': partition.opts,
-                    'usage': self._convert_bytes_to_gb(psutil.disk_usage(partition.mountpoint)._asdict())  # Disk usage stats
-                }
-                partitions.append(partition_info)
-        return partitions
-
-    def _get_disk_health(self, device: str) -> str:
+        for entry in block.iterdir():
+            if number := _read_attr(entry / 'partition'):
+                partitions.append((int(number), self._get_block_info(entry, mounts)))
+        return [partition for _, partition in sorted(partitions, key=lambda item: item[0])]
+
+    def _get_block_info(self, block: Path, mounts: dict[str, dict]) -> dict:
+        """
+        Describe a disk or partition from its sysfs entry and the mount it backs, if any.
+        """
+        # Names like cciss!c0d0 map to /dev/cciss/c0d0
+        device = f"/dev/{block.name.replace('!', '/')}"
+        mount = mounts.get(_read_attr(block / 'dev')) or mounts.get(device, {})
+        mountpoint = mount.get('mountpoint')
+        return {
+            'name': block.name,
+            'device': device,
+            'size': int(_read_attr(block / 'size', '0')) * SECTOR_SIZE / (1024 ** 3),  # In GB
+            'mountpoint': mountpoint,
+            'fstype': mount.get('fstype'),
+            'opts': mount.get('opts'),
+            'usage': self._convert_bytes_to_gb(psutil.disk_usage(mountpoint)._asdict()) if mountpoint else None
+        }
+
+    def _get_disk_health(self, device: str) -> SmartHealth:
         """
         Use SMART (Self-Monitoring, Analysis, and Reporting Technology) to check the disk health.
+        Successful results are cached per device for SMART_CACHE_TTL seconds,
+        failures and timeouts are retried on the next call.
         """
+        now = time.monotonic()
+        with _smart_cache_lock:
+            cached = _smart_cache.get(device)
+        if cached and now - cached[0] < SMART_CACHE_TTL:
+            return cached[1]
+
         try:
-            import subprocess
+            # '-n standby' keeps smartctl from spinning up sleeping drives
             result = subprocess.run(
-                ['smartctl', '-a', device], stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True
+                ['smartctl', '--json', '-a', '-n', 'standby', device],
+                stdout=subprocess.PIPE, stderr=subprocess.PIPE, timeout=SMART_TIMEOUT
             )
-            return result.stdout.decode('utf-8')
+            report = json.loads(result.stdout)
+            if result.returncode & 0b11:  # Bits 0-1: command line, device open failure or standby
+                messages = report.get('smartctl', {}).get('messages') or [{'string': f"exit status {result.returncode}"}]
+                health = SmartHealth(device, error=messages[0]['string'])
+            else:
+                health = SmartHealth.from_report(device, report)
+        except subprocess.TimeoutExpired:
+            health = SmartHealth(device, error=f"smartctl timed out after {SMART_TIMEOUT}s")
         except Exception as e:
-            return f"Failed to fetch SMART data for {device}: {str(e)}"
+            health = SmartHealth(device, error=str(e))
+
+        if not health.error:
+            with _smart_cache_lock:
+                _smart_cache[device] = (now, health)
+        return health
+
+    def _collect_disk_health(self, devices: list[str]) -> dict[str, SmartHealth]:
+        """
+        Query SMART data for every physical device once, in parallel on a bounded pool.
+        """
+        unique = list(dict.fromkeys(devices))
+        if not unique:
+            return {}
+        with ThreadPoolExecutor(max_workers=min(SMART_WORKERS, len(unique))) as pool:
+            return dict(zip(unique, pool.map(self._get_disk_health, unique)))
 
     def _convert_bytes_to_gb(self, usage: dict) -> dict:
         """
@@ -67,31 +252,41 @@ class DiskStatusHandler:
         """
         Print the status of all detected disks including their health, usage, and partitions.
         """
+        # Get the health status using SMART data, all physical disks at once
+        health = self._collect_disk_health([disk['device'] for disk in self.disks
+                                            if not disk['name'].startswith(NO_SMART_PREFIXES)])
+        for disk in self.disks:
+            disk['health'] = health.get(disk['device'], 'Not applicable (virtual device)')
+
         print("Disk Status Report")
         print("====================")
 
         for disk in self.disks:
-            print(f"Disk: {disk['device']}")
-            print(f"  - Filesystem: {disk['fstype']}")
-            print(f"  - Mountpoint: {disk['mountpoint']}")
-            print(f"  - Options: {disk['opts']}")
-            print(f"  - Usage: Total: {disk['usage']['total']:.2f} GB, "
-                  f"Used: {disk['usage']['used']:.2f} GB, Free: {disk['usage']['free']:.2f} GB, "
-                  f"Percent: {disk['usage']['percent']}%")
-
-            # Get the health status using SMART data
-            health_info = self._get_disk_health(disk['device'])
-            print(f"  - Health Status: {health_info}")
+            print(f"Disk: {disk['device']} ({disk['size']:.2f} GB)")
+            self._print_mount(disk, indent="  ")
+
+            print(f"  - Health Status: {disk['health']}")
 
             for partition in disk['partitions']:
-                print(f"    - Partition: {partition['device']}")
-                print(f"      - Filesystem: {partition['fstype']}")
-                print(f"      - Mountpoint: {partition['mountpoint']}")
-                print(f"      - Usage: Total: {partition['usage']['total']:.2f} GB, "
-                      f"Used: {partition['usage']['used']:.2f} GB, Free: {partition['usage']['free']:.2f} GB, "
-                      f"Percent: {partition['usage']['percent']}%")
+                print(f"    - Partition: {partition['device']} ({partition['size']:.2f} GB)")
+                self._print_mount(partition, indent="      ")
 
             print("\n")
+
+    def _print_mount(self, block: dict, indent: str) -> None:
+        """
+        Print the mount details of a disk or partition.
+        """
+        if not block['mountpoint']:
+            print(f"{indent}- Not mounted")
+            return
+
+        print(f"{indent}- Filesystem: {block['fstype']}")
+        print(f"{indent}- Mountpoint: {block['mountpoint']}")
+        print(f"{indent}- Options: {block['opts']}")
+        print(f"{indent}- Usage: Total: {block['usage']['total']:.2f} GB, "
+              f"Used: {block['usage']['used']:.2f} GB, Free: {block['usage']['free']:.2f} GB, "
+              f"Percent: {block['usage']['percent']}%")
             
             
 def showDiskStatus():
@@ -1,26 +1,163 @@
 import json
+import os
+import tempfile
 
-# Define the path to the JSON file
-file_path = 'configs.json'
+# Define the path to the JSON file, next to this module rather than the working directory
+file_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'configs.json')
+
+
+class ConfigStore:
+    """
+    A JSON config file that is loaded lazily on first access and cached.
+    The cached tree is reloaded only when the file's mtime or size changes.
+    Keys can be read and written with 'dot notation' for nested fields.
+    """
+
+    def __init__(self, path=file_path):
+        self.path = path
+        self._data = None
+        self._stamp = None  # (mtime_ns, size) of the file the cache was read from
+        self._transaction = None  # The open transaction, if any
+
+    @property
+    def data(self):
+        """The parsed config tree, (re)loaded from disk if needed."""
+        stat = os.stat(self.path)
+        stamp = (stat.st_mtime_ns, stat.st_size)
+        if self._data is None or stamp != self._stamp:
+            with open(self.path, 'r') as file:
+                self._data = json.load(file)
+            self._stamp = stamp
+        return self._data
+
+    def get(self, name, default=None):
+        """Read a field, e.g. get('network_config.type')."""
+        d = self.data
+        for key in name.split("."):
+            if not isinstance(d, dict) or key not in d:
+                return default
+            d = d[key]
+        return d
+
+    def set(self, name, value):
+        """
+        Update a field and save it.
+        Inside a transaction the change is only written on commit.
+        """
+        if self._transaction is not None:
+            self._transaction.update(name, value)
+            return
+
+        self._set(name, value)
+        self.save()
+
+    def _set(self, name, value):
+        keys = name.split(".")
+        d = self.data
+        for key in keys[:-1]:
+            d = d.setdefault(key, {})
+        d[keys[-1]] = value
+
+    def save(self):
+        """
+        Save the cached data back to the JSON file.
+        The data is written to a temporary file, fsync'd and renamed over the
+        original, so a crash never leaves a half-written config behind.
+        """
+        data = self.data
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.configs-', suffix='.json')
+        try:
+            with os.fdopen(fd, 'w') as file:
+                json.dump(data, file, indent=4)
+                file.flush()
+                os.fsync(file.fileno())
+            # mkstemp creates the file as 0600, keep the config's own mode
+            try:
+                mode = os.stat(self.path).st_mode & 0o7777
+            except FileNotFoundError:
+                mode = 0o644
+            os.chmod(tmp_path, mode)
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+        # Persist the rename itself
+        dir_fd = os.open(directory, os.O_RDONLY)
+        try:
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
+
+        stat = os.stat(self.path)
+        self._stamp = (stat.st_mtime_ns, stat.st_size)
+
+    def transaction(self):
+        return ConfigTransaction(self)
+
+
+class ConfigTransaction:
+    """
+    Collects config updates in memory and writes them with a single save.
+
+    Use it as a context manager: the updates are committed on a clean exit
+    and discarded if the block raises.
+
+        with ConfigTransaction():
+            for name, value in configs_dict.items():
+                updateConfig(name, value)
+    """
+
+    def __init__(self, store=None):
+        self.store = store or _store
+        self.pending = {}
+
+    def update(self, name, value):
+        self.pending[name] = value
+
+    def commit(self):
+        for name, value in self.pending.items():
+            self.store._set(name, value)
+        self.pending = {}
+        self.store.save()
+
+    def rollback(self):
+        self.pending = {}
+
+    def __enter__(self):
+        if self.store._transaction is not None:
+            raise RuntimeError("A config transaction is already open")
+        self.store._transaction = self
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.store._transaction = None
+        if exc_type is None:
+            self.commit()
+        else:
+            self.rollback()
+
+
+# The default store; nothing is read until it's first used
+_store = ConfigStore()
+
+
+def __getattr__(name):
+    # Keeps `JsonAccess.data` working without loading the file at import time
+    if name == 'data':
+        return _store.data
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
-# Load JSON data from the file
-with open(file_path, 'r') as file:
-    data = json.load(file)
 
 def saveConfig():
     """Save the modified data back to the JSON file."""
-    with open(file_path, 'w') as file:
-        json.dump(data, file, indent=4)
+    _store.save()
+
 
 def updateConfig(name, value):
     """
-    Update a specific field in the config. 
+    Update a specific field in the config.
     Supports both top-level and nested fields.
     """
-    keys = name.split(".")  # Allow 'dot notation' for nested keys
-    d = data
-    for key in keys[:-1]:
-        d = d.get(key, {})
-    d[keys[-1]] = value
-
-    saveConfig()  # Save changes immediately
+    _store.set(name, value)
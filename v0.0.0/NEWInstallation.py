@@ -1,5 +1,5 @@
 import os
-from JsonAccess import updateConfig
+from JsonAccess import ConfigTransaction, file_path, updateConfig
 from DiskPreview import showDiskStatus
 # Function to clear the screen for better readability
 def clear_screen():
@@ -147,10 +147,12 @@ configs_dict["mirror-region"] = VAL_MIRROR
 configs_dict["sys-language"] = VAL_SYSLANG
 configs_dict["timezone"] = VAL_TIMEZONE
 
-for (i, j) in configs_dict.items():
-    updateConfig(i, j)
+# Write all selections to configs.json in one go
+with ConfigTransaction():
+    for (i, j) in configs_dict.items():
+        updateConfig(i, j)
     
 
 VAL_START = SingleChoiceOptionWindow("Ready to process the installation?", ["Yes", "No"])
 if VAL_START == "Yes":
-    os.system("archinstall --config configs.json")
\ No newline at end of file
+    os.system(f"archinstall --config {file_path}")
\ No newline at end of file
@@ -1,10 +1,14 @@
 #!/bin/bash
 
 LOG_FILE="/var/log/arch_install.log"
+LAYOUT_OPTIMIZER="$(dirname "$0")/../LayoutOptimizer.py"
+FORMAT_ENGINE="$(dirname "$0")/../FormatEngine.py"
 
 # Log function for consistent output
 log() {
-    echo "$1" | tee -a "$LOG_FILE"
+    # Builtins only, no tee process per message
+    echo "$1" >> "$LOG_FILE"
+    echo "$1"
 }
 
 # Install dialog if not already installed
@@ -80,11 +84,15 @@ partition_formatting_process() {
                 exit 1
             fi
 
-            # Format the partitions
-            mkfs.ext4 "${disk_choice}1" &>> "$LOG_FILE"
-            mkswap "${disk_choice}2" &>> "$LOG_FILE"
+            # Format both partitions at once, with options suited to the disk (SSD, HDD, RAID stripe)
+            python3 "$FORMAT_ENGINE" "${disk_choice}1:ext4" "${disk_choice}2:linux-swap" &>> "$LOG_FILE"
+            if [ $? -ne 0 ]; then
+                log "Formatting failed for $disk_choice."
+                exit 1
+            fi
+            mount_options=$(python3 "$LAYOUT_OPTIMIZER" mount ext4 "$disk_choice" 2>> "$LOG_FILE")
             swapon "${disk_choice}2" &>> "$LOG_FILE"
-            mount "${disk_choice}1" /mnt &>> "$LOG_FILE"
+            mount -o "${mount_options:-defaults}" "${disk_choice}1" /mnt &>> "$LOG_FILE"
             if [ $? -ne 0 ]; then
                 log "Failed to mount ${disk_choice}1."
                 exit 1